@@ -0,0 +1,678 @@
+import email.utils
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+import httpx
+from dotenv import load_dotenv
+from google import genai
+from google.genai import errors, types
+
+from config import (
+    CHARS_PER_TOKEN,
+    CONTEXT_CACHE_MIN_TOKENS,
+    CONTEXT_CACHE_TTL_SECONDS,
+    MODEL_MAX_RETRIES,
+    MODEL_REQUESTS_PER_MINUTE,
+    MODEL_RETRY_BASE_DELAY,
+    MODEL_RETRY_MAX_DELAY,
+)
+
+# Status codes worth retrying: timeouts, rate limits and transient server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class ModelBackend:
+    """The model the agent loop talks to
+
+    process_user_message only needs these two calls, so anything implementing them can
+    stand in for the Gemini API: a recording wrapper, a replay of a recorded session or
+    a scripted fake for offline benchmarks and CI.
+    """
+
+    def generate_content(self, *, model: str, contents: list, config) -> types.GenerateContentResponse:
+        raise NotImplementedError
+
+    def generate_content_stream(self, *, model: str, contents: list, config):
+        """Yield the response in chunks, backends that cannot stream yield a single chunk"""
+        yield self.generate_content(model=model, contents=contents, config=config)
+
+
+class GeminiBackend(ModelBackend):
+    """The real Gemini API through a genai.Client"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def generate_content(self, *, model, contents, config):
+        return self.client.models.generate_content(model=model, contents=contents, config=config)
+
+    def generate_content_stream(self, *, model, contents, config):
+        return self.client.models.generate_content_stream(model=model, contents=contents, config=config)
+
+
+class RecordingBackend(ModelBackend):
+    """Passes calls through to another backend and appends every response to a JSONL file"""
+
+    def __init__(self, backend: ModelBackend, path: str):
+        self.backend = backend
+        self.path = path
+        self._lock = threading.Lock()
+
+    def generate_content(self, *, model, contents, config):
+        response = self.backend.generate_content(model=model, contents=contents, config=config)
+        self._write({"type": "response", "response": _dump(response)})
+        return response
+
+    def generate_content_stream(self, *, model, contents, config):
+        chunks = []
+        try:
+            for chunk in self.backend.generate_content_stream(model=model, contents=contents, config=config):
+                chunks.append(_dump(chunk))
+                yield chunk
+        finally:
+            self._write({"type": "stream", "chunks": chunks})
+
+    def _write(self, record: dict):
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+class ReplayBackend(ModelBackend):
+    """Plays back responses saved by RecordingBackend, in order, without any network access"""
+
+    def __init__(self, path: str, latency: float = 0.0):
+        with open(path, "r") as f:
+            self.records = [json.loads(line) for line in f if line.strip()]
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _next(self) -> dict:
+        with self._lock:
+            if self.calls >= len(self.records):
+                raise RuntimeError(f"Replay exhausted after {self.calls} responses")
+            record = self.records[self.calls]
+            self.calls += 1
+        return record
+
+    def generate_content(self, *, model, contents, config):
+        serialize_request(contents, config)
+        record = self._next()
+        if self.latency:
+            time.sleep(self.latency)
+        if record["type"] == "stream":
+            return _merge_chunks([_load(chunk) for chunk in record["chunks"]])
+        return _load(record["response"])
+
+    def generate_content_stream(self, *, model, contents, config):
+        serialize_request(contents, config)
+        record = self._next()
+        chunks = record["chunks"] if record["type"] == "stream" else [record["response"]]
+        for chunk in chunks:
+            if self.latency:
+                time.sleep(self.latency / len(chunks))
+            yield _load(chunk)
+
+
+class ScriptedBackend(ModelBackend):
+    """Emits a fixed sequence of responses, e.g. a tool-call pattern for benchmarks
+
+    Each step is either a GenerateContentResponse, a list of parts (see `text_part` and
+    `function_call_part`) or a callable taking the contents and returning one of those.
+    After the last step the script starts over, so one script can drive many tasks.
+    """
+
+    def __init__(self, steps: list, latency: float = 0.0, chunk_size: int = 0):
+        self.steps = list(steps)
+        self.latency = latency
+        # Split text into chunks of this many characters when streaming, 0 streams whole parts
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _next(self, contents) -> types.GenerateContentResponse:
+        with self._lock:
+            step = self.steps[self.calls % len(self.steps)]
+            self.calls += 1
+        if callable(step):
+            step = step(contents)
+        if isinstance(step, types.GenerateContentResponse):
+            return step
+        return response_from_parts(step)
+
+    def generate_content(self, *, model, contents, config):
+        serialize_request(contents, config)
+        response = self._next(contents)
+        if self.latency:
+            time.sleep(self.latency)
+        return response
+
+    def generate_content_stream(self, *, model, contents, config):
+        serialize_request(contents, config)
+        response = self._next(contents)
+        parts = response.candidates[0].content.parts if response.candidates else []
+        chunks = []
+        for part in parts:
+            if part.text and self.chunk_size:
+                chunks.extend(
+                    types.Part(text=part.text[start : start + self.chunk_size])
+                    for start in range(0, len(part.text), self.chunk_size)
+                )
+            else:
+                chunks.append(part)
+        for index, part in enumerate(chunks):
+            if self.latency:
+                time.sleep(self.latency / len(chunks))
+            yield response_from_parts([part], response.usage_metadata if index == len(chunks) - 1 else None)
+
+
+class GeminiContextStore:
+    """Keeps prompt prefixes server-side with the Gemini context caching API"""
+
+    def __init__(self, client, ttl_seconds: int = CONTEXT_CACHE_TTL_SECONDS):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+
+    def create(self, model: str, system_instruction, tools) -> str:
+        cached_content = self.client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                system_instruction=system_instruction,
+                tools=tools,
+                ttl=f"{self.ttl_seconds}s",
+            ),
+        )
+        return cached_content.name
+
+
+class LocalContextStore:
+    """Offline stand-in for GeminiContextStore, remembers each prefix under a fake cache name"""
+
+    def __init__(self, ttl_seconds: int = CONTEXT_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.prefixes = {}
+
+    def create(self, model: str, system_instruction, tools) -> str:
+        name = f"cachedContents/local-{len(self.prefixes) + 1}"
+        self.prefixes[name] = (model, system_instruction, tools)
+        return name
+
+
+class ContextCachingBackend(ModelBackend):
+    """Sends the system instruction and tool declarations once, as cached content
+
+    The first request with a given prefix stores it through `store` (the Gemini context
+    caching API, or a local stand-in offline). Later requests only reference the cache
+    by name, so the stable prefix is not resent and is billed at the cached rate. Caches
+    are recreated shortly before their TTL runs out. If the API refuses to cache a
+    prefix, e.g. because it is below the minimum size, requests go out unchanged.
+    """
+
+    def __init__(self, backend: ModelBackend, store, min_tokens: int = CONTEXT_CACHE_MIN_TOKENS):
+        self.backend = backend
+        self.store = store
+        self.min_tokens = min_tokens
+        self.hits = 0
+        self.created = 0
+        self.failures = 0
+        self.tokens_saved = 0
+        # prefix hash -> (cache name, estimated prefix tokens, expiry), or None if it cannot be cached
+        self._caches = {}
+        self._lock = threading.Lock()
+
+    def _apply(self, model: str, config):
+        """Return the config to send and the estimated size of the cached prefix in tokens"""
+        if config is None or config.cached_content or not (config.system_instruction or config.tools):
+            return config, 0
+        prefix = json.dumps(
+            [
+                model,
+                _dump_value(config.system_instruction),
+                [tool.model_dump(mode="json", exclude_none=True) for tool in config.tools or []],
+            ]
+        )
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        tokens = len(prefix) // CHARS_PER_TOKEN
+
+        with self._lock:
+            entry = self._caches.get(key, False)
+            if entry is False or (entry and entry[2] <= time.monotonic()):
+                entry = None
+                if tokens >= self.min_tokens:
+                    try:
+                        name = self.store.create(model, config.system_instruction, config.tools)
+                        # Leave a margin so a request never references a cache that just expired
+                        entry = (name, tokens, time.monotonic() + self.store.ttl_seconds * 0.9)
+                        self.created += 1
+                    except Exception:
+                        self.failures += 1
+                self._caches[key] = entry
+            elif entry is not None:
+                self.hits += 1
+        if entry is None:
+            return config, 0
+        return config.model_copy(update={"cached_content": entry[0], "system_instruction": None, "tools": None}), entry[1]
+
+    def _record_saving(self, usage_metadata, estimate: int):
+        if not estimate:
+            return
+        cached = usage_metadata.cached_content_token_count if usage_metadata else None
+        with self._lock:
+            self.tokens_saved += cached or estimate
+
+    def generate_content(self, *, model, contents, config):
+        config, estimate = self._apply(model, config)
+        response = self.backend.generate_content(model=model, contents=contents, config=config)
+        self._record_saving(response.usage_metadata, estimate)
+        return response
+
+    def generate_content_stream(self, *, model, contents, config):
+        config, estimate = self._apply(model, config)
+        usage_metadata = None
+        for chunk in self.backend.generate_content_stream(model=model, contents=contents, config=config):
+            usage_metadata = chunk.usage_metadata or usage_metadata
+            yield chunk
+        self._record_saving(usage_metadata, estimate)
+
+    def stats(self) -> dict:
+        return {
+            "name": "context_cache",
+            "hits": self.hits,
+            "created": self.created,
+            "failures": self.failures,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+class ResponseCachingBackend(ModelBackend):
+    """Returns a stored response when the exact same request was made before
+
+    Requests are keyed on a hash of (model, contents, config) and responses are appended
+    to a JSONL file, so deterministic replays and repeated benchmark runs skip the model
+    entirely. Only useful when the same conversation is expected to get the same answer.
+    """
+
+    def __init__(self, backend: ModelBackend, path: str):
+        self.backend = backend
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self._responses = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._responses[record["key"]] = record["response"]
+
+    @staticmethod
+    def key(model: str, contents: list, config) -> str:
+        return hashlib.sha256(f"{model}\n{serialize_request(contents, config)}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str):
+        with self._lock:
+            data = self._responses.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            response = _load(data)
+            if response.usage_metadata:
+                self.tokens_saved += response.usage_metadata.prompt_token_count or 0
+            return response
+
+    def _store(self, key: str, response: types.GenerateContentResponse):
+        data = _dump(response)
+        with self._lock:
+            self._responses[key] = data
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"key": key, "response": data}) + "\n")
+
+    def generate_content(self, *, model, contents, config):
+        key = self.key(model, contents, config)
+        response = self._lookup(key)
+        if response is None:
+            response = self.backend.generate_content(model=model, contents=contents, config=config)
+            self._store(key, response)
+        return response
+
+    def generate_content_stream(self, *, model, contents, config):
+        key = self.key(model, contents, config)
+        response = self._lookup(key)
+        if response is not None:
+            yield response
+            return
+        chunks = []
+        for chunk in self.backend.generate_content_stream(model=model, contents=contents, config=config):
+            chunks.append(chunk)
+            yield chunk
+        self._store(key, _merge_chunks(chunks))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": "response_cache",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+class TokenBucket:
+    """Rate limiter shared by every session that talks to the model
+
+    Holds up to `capacity` tokens and refills `rate` tokens per second, each request
+    takes one. After a rate-limit error with a retry delay, `pause` holds back every
+    caller, not just the one that got the error.
+    """
+
+    def __init__(self, rate: float, capacity: float = None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.waited = 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = max(self._paused_until - now, (1 - self.tokens) / self.rate if self.tokens < 1 else 0)
+                self.waited += delay
+            self._sleep(delay)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+class RetryingBackend(ModelBackend):
+    """Retries rate-limited and transiently failing model calls with exponential backoff
+
+    The delay before retry n is drawn uniformly from [0, min(max_delay, base_delay * 2**n)]
+    ("full jitter"), so sessions that failed together do not retry together. A delay
+    requested by the API (a Retry-After header or a RetryInfo detail) is honored as a
+    minimum and pauses the shared `limiter` too. Streams are only retried if they fail
+    before the first chunk, later failures are raised as they are.
+    """
+
+    def __init__(
+        self,
+        backend: ModelBackend,
+        max_retries: int = MODEL_MAX_RETRIES,
+        base_delay: float = MODEL_RETRY_BASE_DELAY,
+        max_delay: float = MODEL_RETRY_MAX_DELAY,
+        limiter: TokenBucket = None,
+        sleep=time.sleep,
+    ):
+        self.backend = backend
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = limiter
+        self._sleep = sleep
+        self.retries = 0
+        self.gave_up = 0
+        self.backoff_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _call(self, call):
+        attempt = 0
+        while True:
+            if self.limiter:
+                self.limiter.acquire()
+            try:
+                return call()
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    if is_retryable(e):
+                        with self._lock:
+                            self.gave_up += 1
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+                requested = retry_after(e)
+                if requested is not None:
+                    delay = max(delay, requested)
+                    if self.limiter:
+                        self.limiter.pause(requested)
+                with self._lock:
+                    self.retries += 1
+                    self.backoff_seconds += delay
+                attempt += 1
+                self._sleep(delay)
+
+    def generate_content(self, *, model, contents, config):
+        return self._call(lambda: self.backend.generate_content(model=model, contents=contents, config=config))
+
+    def generate_content_stream(self, *, model, contents, config):
+        def start():
+            stream = iter(self.backend.generate_content_stream(model=model, contents=contents, config=config))
+            return stream, next(stream, None)
+
+        stream, first = self._call(start)
+        if first is None:
+            return
+        yield first
+        yield from stream
+
+    def stats(self) -> dict:
+        return {
+            "name": "retry",
+            "retries": self.retries,
+            "gave_up": self.gave_up,
+            "backoff_seconds": self.backoff_seconds,
+            "rate_limited_seconds": self.limiter.waited if self.limiter else 0.0,
+        }
+
+
+class FaultInjectingBackend(ModelBackend):
+    """Raises API errors in front of another backend, to exercise retries offline
+
+    `faults` lists what happens to the next calls in order: an HTTP status code to fail
+    with, or None to let the call through. After that, each call fails with `error_rate`
+    probability using a random code from `codes`. Rate-limit errors carry a Retry-After
+    header of `retry_after` seconds when it is set.
+    """
+
+    def __init__(self, backend: ModelBackend, faults=(), error_rate: float = 0.0, codes=(429, 500, 503), retry_after: float = None, seed: int = None):
+        self.backend = backend
+        self.faults = list(faults)
+        self.error_rate = error_rate
+        self.codes = list(codes)
+        self.retry_after = retry_after
+        self.injected = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _maybe_fail(self):
+        with self._lock:
+            if self.faults:
+                code = self.faults.pop(0)
+            elif self._random.random() < self.error_rate:
+                code = self._random.choice(self.codes)
+            else:
+                code = None
+            if code is None:
+                return
+            self.injected += 1
+        raise api_error(code, self.retry_after if code == 429 else None)
+
+    def generate_content(self, *, model, contents, config):
+        self._maybe_fail()
+        return self.backend.generate_content(model=model, contents=contents, config=config)
+
+    def generate_content_stream(self, *, model, contents, config):
+        self._maybe_fail()
+        yield from self.backend.generate_content_stream(model=model, contents=contents, config=config)
+
+
+def api_error(code: int, retry_after: float = None) -> errors.APIError:
+    """Build the error the SDK raises for an HTTP error response"""
+    headers = {"retry-after": f"{retry_after:g}"} if retry_after is not None else {}
+    status = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}.get(code, "UNKNOWN")
+    body = {"error": {"code": code, "message": f"Injected {code} error", "status": status}}
+    response = httpx.Response(code, headers=headers, json=body)
+    error_class = errors.ClientError if code < 500 else errors.ServerError
+    return error_class(code, body, response)
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    # Dropped connections and timeouts before a response arrived
+    return isinstance(error, httpx.TransportError)
+
+
+def retry_after(error: Exception):
+    """Seconds the API asked us to wait, from a Retry-After header or a RetryInfo detail"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            moment = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            # Malformed date, Python 3.10 raises TypeError and later versions ValueError
+            moment = None
+        if moment is not None:
+            return max(0.0, moment.timestamp() - time.time())
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        details = details.get("error", details).get("details", [])
+        for detail in details if isinstance(details, list) else []:
+            if isinstance(detail, dict) and "retryDelay" in detail:
+                match = re.fullmatch(r"([\d.]+)s", str(detail["retryDelay"]))
+                if match:
+                    return float(match.group(1))
+    return None
+
+
+def text_part(text: str) -> types.Part:
+    return types.Part(text=text)
+
+
+def function_call_part(name: str, **args) -> types.Part:
+    return types.Part(function_call=types.FunctionCall(name=name, args=args))
+
+
+def response_from_parts(parts: list, usage_metadata=None) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=list(parts)))],
+        usage_metadata=usage_metadata,
+    )
+
+
+def response_text(response: types.GenerateContentResponse) -> str:
+    """Text of a final response, without the SDK's warning about non-text parts"""
+    if not response or not response.candidates or not response.candidates[0].content:
+        return None
+    texts = [part.text for part in response.candidates[0].content.parts or [] if part.text]
+    return "".join(texts) if texts else None
+
+
+def create_backend(record_path: str = None, replay_path: str = None, context_cache: bool = False, response_cache_path: str = None, requests_per_minute: float = MODEL_REQUESTS_PER_MINUTE, fault_rate: float = 0.0) -> ModelBackend:
+    """Build the backend for the CLI: a replay file, or the Gemini API (optionally recorded)
+
+    With `context_cache` the stable prompt prefix is kept in a context cache (a local
+    stand-in when replaying), with `response_cache_path` identical requests are answered
+    from that file. API calls are retried with backoff and, with `requests_per_minute`,
+    rate limited. A replay can fail a `fault_rate` fraction of calls to test retries.
+    """
+    limiter = TokenBucket(requests_per_minute / 60) if requests_per_minute else None
+    if replay_path:
+        backend = ReplayBackend(replay_path)
+        if fault_rate:
+            backend = FaultInjectingBackend(backend, error_rate=fault_rate)
+        if fault_rate or limiter:
+            # Exercise the retry path and the rate limit offline, with short delays
+            backend = RetryingBackend(backend, base_delay=0.05, limiter=limiter)
+        if context_cache:
+            backend = ContextCachingBackend(backend, LocalContextStore())
+    else:
+        load_dotenv()
+        api_key: str = os.environ.get("GEMINI_API_KEY")
+
+        if not api_key:
+            raise Exception("No API key found")
+
+        client = genai.Client(api_key=api_key)
+        backend = RetryingBackend(GeminiBackend(client), limiter=limiter)
+        if context_cache:
+            backend = ContextCachingBackend(backend, GeminiContextStore(client))
+        if record_path:
+            backend = RecordingBackend(backend, record_path)
+
+    if response_cache_path:
+        backend = ResponseCachingBackend(backend, response_cache_path)
+    return backend
+
+
+def backend_stats(backend: ModelBackend) -> list:
+    """Stats of every layer wrapped around a backend (caches, retries), outermost first"""
+    stats = []
+    while backend is not None:
+        if hasattr(backend, "stats"):
+            stats.append(backend.stats())
+        backend = getattr(backend, "backend", None)
+    return stats
+
+
+def _dump(response: types.GenerateContentResponse) -> dict:
+    return response.model_dump(mode="json", exclude_none=True)
+
+
+def _dump_value(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return [_dump_value(item) for item in value]
+    return value.model_dump(mode="json", exclude_none=True)
+
+
+def _load(data: dict) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse.model_validate(data)
+
+
+def _merge_chunks(chunks: list) -> types.GenerateContentResponse:
+    parts = []
+    usage_metadata = None
+    for chunk in chunks:
+        usage_metadata = chunk.usage_metadata or usage_metadata
+        if not chunk.candidates or not chunk.candidates[0].content or not chunk.candidates[0].content.parts:
+            continue
+        for part in chunk.candidates[0].content.parts:
+            if part.text and parts and parts[-1].text:
+                parts[-1] = types.Part(text=parts[-1].text + part.text)
+            else:
+                parts.append(part)
+    return response_from_parts(parts, usage_metadata)
+
+
+def serialize_request(contents: list, config) -> str:
+    """Do the request-building work the real client would, so offline runs measure it too"""
+    payload = [content.model_dump(mode="json", exclude_none=True) for content in contents]
+    if config is not None:
+        payload.append(config.model_dump(mode="json", exclude_none=True))
+    return json.dumps(payload)
@@ -0,0 +1,162 @@
+import contextvars
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backends import response_text
+from config import WORKING_DIRECTORY
+from functions.code_index import code_indexes
+from functions.file_cache import file_cache, served_scope
+
+
+def load_prompts(path: str) -> list:
+    """Read prompts from a JSONL file, one {"prompt": ..., "id": ...} object per line
+
+    A line may also carry its own "working_directory". Prompts without an id are
+    numbered by their line. Ids must be unique, also once made safe for a directory
+    name, because a prompt's kept working directory is named after its id.
+    """
+    prompts = []
+    # Line of the first prompt with each directory name, to report duplicates
+    names = {}
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON: {e}")
+            if not isinstance(entry, dict) or not isinstance(entry.get("prompt"), str):
+                raise ValueError(f'{path}:{line_number}: expected an object with a "prompt" string')
+            entry.setdefault("id", str(line_number))
+            name = _safe_name(str(entry["id"]))
+            if name in names:
+                raise ValueError(
+                    f'{path}:{line_number}: id {entry["id"]!r} is already used by line {names[name]} '
+                    f'(ids must be unique, also after replacing characters other than letters, digits, "-", "_" and ".")'
+                )
+            names[name] = line_number
+            prompts.append(entry)
+    return prompts
+
+
+def run_batch(
+    prompts: list,
+    output_path: str,
+    backend,
+    tool,
+    system_prompt: str,
+    parallelism: int,
+    max_parallel_tools: int,
+    keep_workdirs: str = None,
+) -> list:
+    """Run every prompt to completion, `parallelism` at a time, in one process
+
+    All prompts share the backend (and so its API client). Each one runs in its own copy
+    of its working directory, kept under `keep_workdirs` when given so the changes can be
+    inspected, and deleted otherwise. A JSON line with the final text, token usage and
+    timings is appended to `output_path` as soon as a prompt finishes. Agent chatter is
+    suppressed, progress goes to stderr.
+    """
+    names = [_safe_name(str(entry["id"])) for entry in prompts]
+    if len(set(names)) != len(names):
+        raise ValueError("prompt ids must be unique, also once made safe for a directory name")
+    write_lock = threading.Lock()
+    results = []
+    started = time.perf_counter()
+
+    def run_one(entry: dict) -> dict:
+        result = contextvars.Context().run(
+            _run_prompt, entry, backend, tool, system_prompt, max_parallel_tools, keep_workdirs, devnull
+        )
+        with write_lock:
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            results.append(result)
+            status = "✅" if result["ok"] else "❌"
+            print(
+                f"{status} [{len(results)}/{len(prompts)}] {result['id']} in {result['seconds']:.1f}s",
+                file=sys.stderr,
+            )
+        return result
+
+    # Agent chatter goes to devnull through process_user_message's output argument, redirecting
+    # sys.stdout would affect every thread of the process
+    with open(output_path, "w") as output, open(os.devnull, "w") as devnull:
+        with ThreadPoolExecutor(max_workers=max(1, parallelism), thread_name_prefix="batch") as executor:
+            list(executor.map(run_one, prompts))
+
+    failed = sum(1 for result in results if not result["ok"])
+    print(
+        f"📦 {len(results)} prompts in {time.perf_counter() - started:.1f}s, {failed} failed, results in {output_path}",
+        file=sys.stderr,
+    )
+    return results
+
+
+def _run_prompt(entry: dict, backend, tool, system_prompt: str, max_parallel_tools: int, keep_workdirs: str, output=None) -> dict:
+    # Imported here, main imports this module for --batch
+    from main import process_user_message
+
+    prompt_id = str(entry["id"])
+    served_scope.set(f"batch:{prompt_id}")
+    source = entry.get("working_directory") or WORKING_DIRECTORY
+    if keep_workdirs:
+        scratch = None
+        working_directory = os.path.join(keep_workdirs, _safe_name(prompt_id))
+        shutil.rmtree(working_directory, ignore_errors=True)
+    else:
+        scratch = tempfile.mkdtemp(prefix="agent-batch-")
+        working_directory = os.path.join(scratch, os.path.basename(os.path.abspath(source)))
+
+    result = {"id": entry["id"], "prompt": entry["prompt"]}
+    stats = {}
+    started = time.perf_counter()
+    try:
+        shutil.copytree(source, working_directory, ignore=shutil.ignore_patterns("__pycache__"))
+        response = process_user_message(
+            entry["prompt"],
+            [],
+            backend,
+            tool,
+            system_prompt,
+            max_parallel_tools=max_parallel_tools,
+            stats=stats,
+            working_directory=working_directory,
+            output=output,
+        )
+        text = response_text(response)
+        error = stats.get("error") or (None if text else "No final response from the model")
+    except Exception as e:
+        text, error = None, str(e)
+    finally:
+        file_cache.forget_served()
+        code_indexes.forget(working_directory)
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    result.update(
+        {
+            "ok": error is None,
+            "text": text,
+            "error": error,
+            "model_calls": stats.get("model_calls", 0),
+            "tool_calls": stats.get("tool_calls", 0),
+            "prompt_tokens": stats.get("prompt_tokens", 0),
+            "response_tokens": stats.get("response_tokens", 0),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+    )
+    if keep_workdirs:
+        result["working_directory"] = working_directory
+    return result
+
+
+def _safe_name(prompt_id: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in prompt_id) or "prompt"
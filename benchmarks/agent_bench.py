@@ -0,0 +1,375 @@
+"""End-to-end agent benchmark with a deterministic model stand-in
+
+Runs scripted tasks against a scratch copy of calculator/ through process_user_message
+and reports per-phase latency (history build, model call, each tool, output writes),
+iterations per task and tool bytes returned, plus microbenchmarks for every tool in
+functions/. Results can be saved as JSON and compared with an earlier run:
+
+    python benchmarks/agent_bench.py --output after.json --compare before.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main
+from backends import ScriptedBackend, function_call_part, serialize_request, text_part
+from functions.code_index import code_indexes
+from functions.file_cache import file_cache
+from functions.get_file_content import get_file_content
+from functions.get_files_info import get_files_info
+from functions.get_files_content import get_files_content
+from functions.get_outline import get_outline
+from functions.run_cache import run_cache
+from functions.run_python_file import run_python_file
+from functions.search_code import search_code
+from functions.write_file import write_file
+from google.genai import types
+
+CALCULATOR = os.path.join(ROOT, "calculator")
+
+
+class PhaseTimer:
+    """Accumulates time per phase, safe to use from tool worker threads"""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.tool_bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float):
+        with self._lock:
+            self.seconds[phase] += seconds
+
+
+class BenchBackend(ScriptedBackend):
+    """ScriptedBackend that times request building and the model call separately"""
+
+    def __init__(self, steps: list, timer: PhaseTimer, latency: float = 0.0):
+        super().__init__(steps, latency=latency)
+        self.timer = timer
+
+    def generate_content(self, *, model, contents, config):
+        started = time.perf_counter()
+        serialize_request(contents, config)
+        built = time.perf_counter()
+        response = self._next(contents)
+        if self.latency:
+            time.sleep(self.latency)
+        self.timer.add("history_build", built - started)
+        self.timer.add("model_call", time.perf_counter() - built)
+        return response
+
+
+class TimedWriter(io.TextIOBase):
+    """Receives the agent's output and counts the time spent writing it
+
+    Formatting happens in the caller before write() and is part of agent_overhead.
+    """
+
+    def __init__(self, timer: PhaseTimer):
+        self.timer = timer
+        self.buffer = io.StringIO()
+
+    def write(self, text):
+        started = time.perf_counter()
+        written = self.buffer.write(text)
+        self.timer.add("output_write", time.perf_counter() - started)
+        return written
+
+
+def timed_tool(name: str, function, timer: PhaseTimer):
+    def wrapper(**kwargs):
+        started = time.perf_counter()
+        result = function(**kwargs)
+        timer.add(f"tool:{name}", time.perf_counter() - started)
+        with timer._lock:
+            timer.tool_bytes += len(str(result).encode("utf-8"))
+        return result
+
+    return wrapper
+
+
+def fixed_calculator_source() -> str:
+    with open(os.path.join(CALCULATOR, "pkg", "calculator.py"), "r") as f:
+        return f.read()
+
+
+def break_precedence(working_directory: str):
+    """Introduce the README's demo bug, + binding tighter than *"""
+    path = os.path.join(working_directory, "pkg", "calculator.py")
+    with open(path, "r") as f:
+        source = f.read()
+    with open(path, "w") as f:
+        f.write(source.replace('"+": 1,', '"+": 3,', 1))
+
+
+def build_tasks() -> dict:
+    """Scripted model turns for each task, the last step is always the final answer
+
+    Maps a task name to (steps, setup), setup prepares the scratch working directory.
+    """
+    return {
+        "explore": (
+            [
+                [function_call_part("get_files_info", recursive=True)],
+                [
+                    function_call_part("get_file_content", file_path="main.py"),
+                    function_call_part("get_file_content", file_path="pkg/calculator.py"),
+                    function_call_part("get_file_content", file_path="pkg/render.py"),
+                ],
+                [text_part("This is a small calculator with a CLI, an evaluator and a JSON renderer.")],
+            ],
+            None,
+        ),
+        "explore_batched": (
+            [
+                [function_call_part("get_files_content", pattern="*.py")],
+                [text_part("This is a small calculator with a CLI, an evaluator and a JSON renderer.")],
+            ],
+            None,
+        ),
+        "run_tests": (
+            [
+                [function_call_part("run_python_file", file_path="tests.py", use_cache=False)],
+                [text_part("All calculator tests pass.")],
+            ],
+            None,
+        ),
+        "evaluate": (
+            [
+                [function_call_part("run_python_file", file_path="main.py", args=["3 + 7 * 2"], use_cache=False)],
+                [text_part("3 + 7 * 2 = 17")],
+            ],
+            None,
+        ),
+        "fix_and_verify": (
+            [
+                [function_call_part("run_python_file", file_path="main.py", args=["3 + 7 * 2"], use_cache=False)],
+                [function_call_part("get_file_content", file_path="pkg/calculator.py")],
+                [function_call_part("write_file", file_path="pkg/calculator.py", content=fixed_calculator_source())],
+                [function_call_part("run_python_file", file_path="tests.py", use_cache=False)],
+                [text_part("Fixed the precedence of +, the tests pass again.")],
+            ],
+            break_precedence,
+        ),
+    }
+
+
+def run_task(name: str, steps: list, setup, model_latency: float, parallel_tools: int) -> dict:
+    timer = PhaseTimer()
+    backend = BenchBackend(steps, timer, latency=model_latency)
+    tool = types.Tool(function_declarations=[])
+    scratch = tempfile.mkdtemp(prefix="agent-bench-")
+    working_directory = os.path.join(scratch, "calculator")
+    shutil.copytree(CALCULATOR, working_directory, ignore=shutil.ignore_patterns("__pycache__"))
+    if setup:
+        setup(working_directory)
+
+    original_functions = dict(main.AVAILABLE_FUNCTIONS)
+    for function_name, function in original_functions.items():
+        main.AVAILABLE_FUNCTIONS[function_name] = timed_tool(function_name, function, timer)
+    file_cache.clear()
+
+    try:
+        started = time.perf_counter()
+        main.process_user_message(
+            f"benchmark task {name}",
+            [],
+            backend,
+            tool,
+            "You are a benchmark.",
+            max_parallel_tools=parallel_tools,
+            working_directory=working_directory,
+            output=TimedWriter(timer),
+        )
+        wall = time.perf_counter() - started
+    finally:
+        main.AVAILABLE_FUNCTIONS.update(original_functions)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    phases = dict(timer.seconds)
+    phases["agent_overhead"] = max(wall - sum(phases.values()), 0.0)
+    return {"wall": wall, "iterations": backend.calls, "tool_bytes": timer.tool_bytes, "phases": phases}
+
+
+def summarize_task(runs: list) -> dict:
+    phases = sorted({phase for run in runs for phase in run["phases"]})
+    return {
+        "wall_ms": statistics.median(run["wall"] for run in runs) * 1000,
+        "iterations": runs[0]["iterations"],
+        "tool_bytes": runs[0]["tool_bytes"],
+        "phases_ms": {
+            phase: statistics.median(run["phases"].get(phase, 0.0) for run in runs) * 1000 for phase in phases
+        },
+    }
+
+
+def micro(function, runs: int, setup=None) -> dict:
+    timings = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return {
+        "median_us": statistics.median(timings) * 1e6,
+        "mean_us": statistics.mean(timings) * 1e6,
+        "runs": runs,
+    }
+
+
+def run_microbenchmarks(runs: int) -> dict:
+    scratch = tempfile.mkdtemp(prefix="agent-bench-")
+    working_directory = os.path.join(scratch, "calculator")
+    shutil.copytree(CALCULATOR, working_directory, ignore=shutil.ignore_patterns("__pycache__"))
+    source = fixed_calculator_source()
+
+    cold = file_cache.clear
+    warm = file_cache.forget_served
+    try:
+        results = {
+            "get_files_info[flat,cold]": micro(lambda: get_files_info(working_directory), runs, cold),
+            "get_files_info[flat,cached]": micro(lambda: get_files_info(working_directory), runs, warm),
+            "get_files_info[recursive,cold]": micro(lambda: get_files_info(working_directory, recursive=True), runs, cold),
+            "get_file_content[head,cold]": micro(lambda: get_file_content(working_directory, "pkg/calculator.py"), runs, cold),
+            "get_file_content[head,cached]": micro(lambda: get_file_content(working_directory, "pkg/calculator.py"), runs, warm),
+            "get_file_content[window,cold]": micro(
+                lambda: get_file_content(working_directory, "pkg/calculator.py", offset=20, limit=10), runs, cold
+            ),
+            "get_files_content[glob,cold]": micro(lambda: get_files_content(working_directory, pattern="*.py"), runs, cold),
+            "get_files_content[glob,cached]": micro(lambda: get_files_content(working_directory, pattern="*.py"), runs),
+            "get_outline[directory,cold]": micro(lambda: get_outline(working_directory), runs, cold),
+            "get_outline[directory,cached]": micro(lambda: get_outline(working_directory), runs),
+            "write_file": micro(lambda: write_file(working_directory, "pkg/calculator.py", source), runs),
+            "search_code[literal]": micro(lambda: search_code(working_directory, "evaluate"), runs),
+            "search_code[regex]": micro(lambda: search_code(working_directory, r"def _?\w+\(self", regex=True), runs),
+            "run_python_file[main.py]": micro(
+                lambda: run_python_file(working_directory, "main.py", ["3 + 5"], use_cache=False), max(runs // 10, 3)
+            ),
+            "run_python_file[tests.py]": micro(
+                lambda: run_python_file(working_directory, "tests.py", use_cache=False), max(runs // 10, 3)
+            ),
+        }
+        # Cached runs need the cache on, with a scratch file so the real one is left alone
+        enabled, path, entries = run_cache.enabled, run_cache.path, run_cache._entries
+        run_cache.enabled, run_cache.path, run_cache._entries = True, os.path.join(scratch, "run_cache.json"), None
+        try:
+            run_python_file(working_directory, "tests.py")
+            results["run_python_file[tests.py,cached]"] = micro(lambda: run_python_file(working_directory, "tests.py"), runs)
+        finally:
+            run_cache.enabled, run_cache.path, run_cache._entries = enabled, path, entries
+        return results
+    finally:
+        code_indexes.forget(working_directory)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def print_report(results: dict):
+    print(f"Agent benchmark @ {results['meta']['commit'] or 'unknown commit'} ({results['meta']['python']})")
+    print()
+    for name, task in results["tasks"].items():
+        print(f"{name}: {task['wall_ms']:.1f} ms, {task['iterations']} iterations, {task['tool_bytes']} tool bytes")
+        for phase, milliseconds in sorted(task["phases_ms"].items(), key=lambda item: -item[1]):
+            print(f"    {phase:<28} {milliseconds:9.3f} ms")
+    print()
+    print("Tool microbenchmarks:")
+    for name, result in results["micro"].items():
+        print(f"    {name:<36} median {result['median_us']:10.1f} µs   mean {result['mean_us']:10.1f} µs")
+
+
+def flatten(results: dict) -> dict:
+    values = {}
+    for name, task in results["tasks"].items():
+        values[f"task:{name}:wall_ms"] = task["wall_ms"]
+        for phase, milliseconds in task["phases_ms"].items():
+            values[f"task:{name}:{phase}_ms"] = milliseconds
+    for name, result in results["micro"].items():
+        values[f"micro:{name}:median_us"] = result["median_us"]
+    return values
+
+
+def print_comparison(results: dict, baseline: dict, threshold: float):
+    current, previous = flatten(results), flatten(baseline)
+    print()
+    print(f"Compared with {baseline['meta'].get('commit') or 'baseline'} (changes over {threshold:.0%}):")
+    changed = False
+    for key in sorted(current.keys() & previous.keys()):
+        if previous[key] <= 0:
+            continue
+        ratio = current[key] / previous[key]
+        if abs(ratio - 1) >= threshold:
+            changed = True
+            marker = "slower" if ratio > 1 else "faster"
+            print(f"    {key:<56} {previous[key]:10.2f} → {current[key]:10.2f} ({ratio:.2f}x, {marker})")
+    if not changed:
+        print("    no significant changes")
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark the agent loop and its tools offline")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per scripted task (default: 5)")
+    parser.add_argument("--micro-runs", type=int, default=200, help="runs per tool microbenchmark (default: 200)")
+    parser.add_argument("--model-latency", type=float, default=0.0, help="simulated seconds per model call")
+    parser.add_argument("--parallel-tools", type=int, default=1, help="concurrent read-only tool calls (default: 1)")
+    parser.add_argument("--output", metavar="PATH", help="write results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="compare with results from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change reported by --compare")
+    args = parser.parse_args()
+
+    # Every repeat must do the real work, not return a result cached by an earlier one
+    run_cache.enabled = False
+
+    tasks = {}
+    for name, (steps, setup) in build_tasks().items():
+        runs = [run_task(name, steps, setup, args.model_latency, args.parallel_tools) for _ in range(args.repeat)]
+        tasks[name] = summarize_task(runs)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "repeat": args.repeat,
+            "model_latency": args.model_latency,
+            "parallel_tools": args.parallel_tools,
+        },
+        "tasks": tasks,
+        "micro": run_microbenchmarks(args.micro_runs),
+    }
+
+    print_report(results)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            print_comparison(results, json.load(f), args.threshold)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_benchmark()
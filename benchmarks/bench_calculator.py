@@ -0,0 +1,81 @@
+"""Evaluations per second of calculator/pkg/calculator.py
+
+"repeated" cycles through a small set of expressions, as when the same shapes come
+back over and over, "unique" never evaluates the same string twice. Run it before and
+after a change to the calculator to compare. With NumPy installed it also compares one
+expression over a million rows, evaluated row by row and with evaluate_batch.
+
+Usage: python benchmarks/bench_calculator.py [evaluations] [rows]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "calculator"))
+
+from pkg.calculator import Calculator  # noqa: E402
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BATCH_EXPRESSION = "x * 2 + y / 3 - 1"
+
+
+def make_expressions(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    expressions = []
+    for _ in range(count):
+        terms = [str(rng.randint(1, 999)) for _ in range(rng.randint(2, 8))]
+        expression = terms[0]
+        for term in terms[1:]:
+            expression += f" {rng.choice('+-*/')} {term}"
+        expressions.append(expression)
+    return expressions
+
+
+def evaluations_per_second(calculator: Calculator, expressions: list, evaluations: int) -> float:
+    count = len(expressions)
+    started = time.perf_counter()
+    for index in range(evaluations):
+        calculator.evaluate(expressions[index % count])
+    return evaluations / (time.perf_counter() - started)
+
+
+def main():
+    evaluations = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    workloads = {
+        "repeated (100 shapes)": make_expressions(100),
+        "unique": make_expressions(evaluations, seed=1),
+    }
+    print(f"{evaluations} evaluations per workload")
+    for name, expressions in workloads.items():
+        rate = evaluations_per_second(Calculator(), expressions, evaluations)
+        print(f"  {name:<24} {rate:12,.0f} evaluations/s")
+
+    if numpy is None:
+        print("\nNumPy is not installed, skipping evaluate_batch")
+        return
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+    rng = numpy.random.default_rng(0)
+    variables = {"x": rng.random(rows), "y": rng.random(rows) + 1}
+    calculator = Calculator()
+    print(f"\n{BATCH_EXPRESSION!r} over {rows} rows")
+
+    started = time.perf_counter()
+    for x, y in zip(variables["x"].tolist(), variables["y"].tolist()):
+        calculator.evaluate(BATCH_EXPRESSION, {"x": x, "y": y})
+    row_seconds = time.perf_counter() - started
+    print(f"  {'evaluate per row':<24} {rows / row_seconds:12,.0f} rows/s")
+
+    started = time.perf_counter()
+    calculator.evaluate_batch(BATCH_EXPRESSION, variables)
+    batch_seconds = time.perf_counter() - started
+    print(f"  {'evaluate_batch':<24} {rows / batch_seconds:12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
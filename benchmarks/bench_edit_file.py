@@ -0,0 +1,83 @@
+"""Compare a one-line fix made with write_file (whole file) against edit_file (edits or a patch)
+
+For each file size it reports the output tokens the model has to generate for the tool
+call, the tool's own latency, and the estimated total at a given generation speed.
+
+Usage: python benchmarks/bench_edit_file.py [runs] [output tokens per second]
+"""
+
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CHARS_PER_TOKEN  # noqa: E402
+from functions.edit_file import edit_file  # noqa: E402
+from functions.write_file import write_file  # noqa: E402
+
+
+def make_source(lines: int) -> str:
+    """A Python file of roughly `lines` lines made of small functions"""
+    body = []
+    for index in range(lines // 4):
+        body.append(f"def function_{index}(value):\n    result = value * {index} + 1\n    return result\n\n")
+    return "".join(body)
+
+
+def tool_calls(source: str) -> dict:
+    """The arguments the model would send for the same one-line change, per approach"""
+    target = len(source.splitlines()) // 2 // 4 * 4
+    old = source.splitlines()[target + 1]
+    new = old.replace("+ 1", "+ 2")
+    patch = (
+        f"@@ -{target + 1},3 +{target + 1},3 @@\n"
+        f" {source.splitlines()[target]}\n-{old}\n+{new}\n {source.splitlines()[target + 2]}\n"
+    )
+    return {
+        "write_file": {"file_path": "module.py", "content": source.replace(old, new, 1)},
+        "edit_file (edits)": {"file_path": "module.py", "edits": [{"search": old, "replace": new}]},
+        "edit_file (patch)": {"file_path": "module.py", "patch": patch},
+    }
+
+
+def measure(function, arguments: dict, directory: str, source: str, runs: int) -> list:
+    timings = []
+    path = os.path.join(directory, "module.py")
+    for _ in range(runs):
+        with open(path, "w") as f:
+            f.write(source)
+        started = time.perf_counter()
+        result = function(directory, **arguments)
+        timings.append(time.perf_counter() - started)
+        if not result.startswith("Success"):
+            raise RuntimeError(result)
+    return timings
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    tokens_per_second = float(sys.argv[2]) if len(sys.argv) > 2 else 150.0
+    directory = tempfile.mkdtemp(prefix="bench-edit-")
+
+    print(f"One-line change, {runs} runs per tool, generation at {tokens_per_second:g} output tokens/s")
+    try:
+        for lines in (100, 500, 2000):
+            source = make_source(lines)
+            print(f"\n{lines} line file ({len(source)} chars)")
+            for name, arguments in tool_calls(source).items():
+                function = write_file if name == "write_file" else edit_file
+                tokens = len(json.dumps(arguments)) // CHARS_PER_TOKEN
+                tool_ms = statistics.median(measure(function, arguments, directory, source, runs)) * 1000
+                total_ms = tokens / tokens_per_second * 1000 + tool_ms
+                print(f"  {name:<18} ~{tokens:6} output tokens  tool {tool_ms:6.3f} ms  estimated total {total_ms:9.1f} ms")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
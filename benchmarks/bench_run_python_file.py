@@ -0,0 +1,58 @@
+"""Compare cold and warm run_python_file latency on calculator/tests.py, with the run cache bypassed
+
+Usage: python benchmarks/bench_run_python_file.py [runs]
+"""
+
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import WARM_PRELOAD_MODULES  # noqa: E402
+from functions import python_worker  # noqa: E402
+from functions.run_python_file import run_python_file  # noqa: E402
+
+WORKING_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "calculator")
+
+
+def measure(runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = run_python_file(WORKING_DIRECTORY, "tests.py", use_cache=False)
+        timings.append(time.perf_counter() - started)
+        if "OK" not in output:
+            raise RuntimeError(f"unexpected output:\n{output}")
+    return timings
+
+
+def report(name: str, timings: list):
+    timings = sorted(timings)
+    print(
+        f"{name:<6} mean={statistics.mean(timings) * 1000:7.1f} ms  "
+        f"median={statistics.median(timings) * 1000:7.1f} ms  "
+        f"p90={timings[int(len(timings) * 0.9) - 1] * 1000:7.1f} ms"
+    )
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    cold = measure(runs)
+
+    pool = python_worker.start_pool(1, preload=WARM_PRELOAD_MODULES)
+    # The first warm call pays for starting the worker, like the first call of a session would
+    measure(1)
+    warm = measure(runs)
+    pool.close()
+
+    print(f"run_python_file('calculator', 'tests.py'), {runs} runs")
+    report("cold", cold)
+    report("warm", warm)
+    print(f"speedup: {statistics.median(cold) / statistics.median(warm):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
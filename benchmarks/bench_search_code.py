@@ -0,0 +1,89 @@
+"""Time search_code on a generated tree, against a plain scan that reads every file
+
+Reports the one-off index build, warm literal and regex queries, and a query right after
+a write_file, which only reindexes the written file.
+
+Usage: python benchmarks/bench_search_code.py [files] [runs]
+"""
+
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.code_index import code_indexes  # noqa: E402
+from functions.search_code import search_code  # noqa: E402
+from functions.write_file import write_file  # noqa: E402
+
+QUERIES = [
+    ("rare literal", "handler_4242_marker", False),
+    ("common literal", "return result", False),
+    ("regex", r"def compute_\d+_77\(", True),
+]
+
+
+def make_tree(directory: str, files: int):
+    """`files` small Python modules spread over 100 packages"""
+    for index in range(files):
+        package = os.path.join(directory, f"package_{index % 100}")
+        os.makedirs(package, exist_ok=True)
+        with open(os.path.join(package, f"module_{index}.py"), "w") as f:
+            f.write(f"import os\n\n\ndef compute_{index}_{index % 97}(value):\n    result = value * {index}\n    return result\n")
+            if index == 4242:
+                f.write("\n# handler_4242_marker\n")
+
+
+def plain_scan(directory: str, query: str, is_regex: bool) -> int:
+    matcher = re.compile(query if is_regex else re.escape(query))
+    matches = 0
+    for path, _, names in os.walk(directory):
+        for name in names:
+            with open(os.path.join(path, name), "r") as f:
+                matches += sum(1 for line in f if matcher.search(line))
+    return matches
+
+
+def median_ms(function, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    directory = tempfile.mkdtemp(prefix="bench-search-")
+
+    try:
+        make_tree(directory, files)
+        print(f"{files} files, median of {runs} runs")
+
+        started = time.perf_counter()
+        search_code(directory, "warm up")
+        print(f"  index build (first query)  {(time.perf_counter() - started) * 1000:9.1f} ms")
+
+        for name, query, is_regex in QUERIES:
+            indexed = median_ms(lambda: search_code(directory, query, regex=is_regex), runs)
+            scanned = median_ms(lambda: plain_scan(directory, query, is_regex), max(1, runs // 10))
+            print(f"  {name:<15} search_code {indexed:8.2f} ms   plain scan {scanned:9.1f} ms")
+
+        def write_then_search():
+            write_file(directory, "package_1/module_1.py", f"# handler_4242_marker {time.perf_counter()}\n")
+            search_code(directory, "handler_4242_marker")
+
+        print(f"  write_file + search        {median_ms(write_then_search, runs):9.2f} ms")
+    finally:
+        code_indexes.forget(directory)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
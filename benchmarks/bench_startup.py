@@ -0,0 +1,67 @@
+"""Measure CLI startup: wall time of short-lived commands and where import time goes
+
+Each command runs in a fresh interpreter. The breakdown comes from `python -X importtime`
+and groups the self time of every imported module by its top-level package, so a heavy
+import that slipped back into the startup path shows up at the top.
+
+Usage: python benchmarks/bench_startup.py [runs] [top packages]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = [
+    ("python -c pass", ["-c", "pass"], None),
+    ("main.py --help", ["main.py", "--help"], None),
+    ("REPL, exit", ["main.py"], "exit\n"),
+    ("import main", ["-c", "import main"], None),
+    ("import google.genai", ["-c", "import google.genai"], None),
+]
+
+
+def wall_ms(arguments: list, stdin: str, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *arguments], cwd=ROOT, input=stdin, capture_output=True, text=True, check=True)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def import_breakdown(arguments: list, stdin: str) -> dict:
+    """Microseconds of import self time per top-level package"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *arguments], cwd=ROOT, input=stdin, capture_output=True, text=True, check=True
+    )
+    packages = defaultdict(int)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, module = line[len("import time:") :].split("|")
+        packages[module.strip().split(".")[0]] += int(self_us)
+    return packages
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    print(f"Median wall time of {runs} runs, {sys.executable}")
+    for name, arguments, stdin in COMMANDS:
+        print(f"  {name:<22} {wall_ms(arguments, stdin, runs):8.1f} ms")
+
+    for name, arguments, stdin in COMMANDS[1:3]:
+        packages = import_breakdown(arguments, stdin)
+        print(f"\nImport time of {name}: {sum(packages.values()) / 1000:.1f} ms")
+        for package, microseconds in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            print(f"  {package:<22} {microseconds / 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
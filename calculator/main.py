@@ -2,7 +2,10 @@
 
 import sys
 from pkg.calculator import Calculator
-from pkg.render import format_json_output
+from pkg.render import format_json_line, format_json_output
+
+# Input is read in blocks of up to this many bytes, the results of each block are written at once
+STREAM_BLOCK_BYTES = 65536
 
 
 def main():
@@ -10,9 +13,14 @@ def main():
     if len(sys.argv) <= 1:
         print("Calculator App")
         print('Usage: python main.py "<expression>"')
+        print('       python main.py --stream < expressions.txt')
         print('Example: python main.py "3 + 5"')
         return
 
+    if sys.argv[1:] == ["--stream"]:
+        run_stream(calculator, sys.stdin.buffer, sys.stdout.buffer)
+        return
+
     expression = " ".join(sys.argv[1:])
     try:
         result = calculator.evaluate(expression)
@@ -25,5 +33,39 @@ def main():
         print(f"Error: {e}")
 
 
+def run_stream(calculator, input_stream, output_stream):
+    """Evaluate one expression per input line, writing one JSON Lines record per line
+
+    Records come out in input order, with "result" or "error", so they can be zipped
+    with the input. Input is read with read1, which returns whatever is available, so
+    output is flushed once per block. A piped file is processed in large blocks, and
+    an interactive producer still gets each answer as soon as its line is complete.
+    Memory use stays at about one block plus the longest line.
+    """
+    pending = b""
+    while True:
+        block = input_stream.read1(STREAM_BLOCK_BYTES)
+        if not block:
+            break
+        lines = (pending + block).split(b"\n")
+        pending = lines.pop()
+        output_stream.write("".join([_evaluate_line(calculator, line) for line in lines]).encode("utf-8"))
+        output_stream.flush()
+    if pending:
+        output_stream.write(_evaluate_line(calculator, pending).encode("utf-8"))
+        output_stream.flush()
+
+
+def _evaluate_line(calculator, line: bytes) -> str:
+    expression = line.decode("utf-8", errors="replace").strip()
+    try:
+        result = calculator.evaluate(expression)
+        if result is None:
+            return format_json_line(expression, error="Expression is empty or contains only whitespace.")
+        return format_json_line(expression, result)
+    except Exception as e:
+        return format_json_line(expression, error=str(e))
+
+
 if __name__ == "__main__":
     main()
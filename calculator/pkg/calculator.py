@@ -1,8 +1,21 @@
 # calculator.py
 
+import functools
+import re
+
+try:
+    import numpy as np
+except ImportError:
+    # Only evaluate_batch needs NumPy
+    np = None
+
+# A token and the whitespace before it: an operator, or anything up to the next whitespace or operator. A
+# number's exponent sign ("1e-5") does not end it.
+_TOKEN = re.compile(r"(\s*)([-+*/]|(?:[\d.][\d_.]*[eE][-+])?[^\s+\-*/]+)")
+
 
 class Calculator:
-    def __init__(self):
+    def __init__(self, cache_size=1024):
         self.operators = {
             "+": lambda a, b: a + b,
             "-": lambda a, b: a - b,
@@ -15,12 +28,88 @@ class Calculator:
             "*": 2,
             "/": 2,
         }
+        # Compiled programs by expression string, the least recently used are dropped first
+        self._compiled = functools.lru_cache(maxsize=cache_size)(self._compile)
+
+    def evaluate(self, expression, variables=None):
+        if not expression or expression.isspace():
+            return None
+        return self._compiled(expression)(variables)
 
-    def evaluate(self, expression):
+    def evaluate_batch(self, expression, variables):
+        """Evaluate `expression` once for many inputs with NumPy
+
+        Each variable is a scalar or an array, they are broadcast against each other and
+        the result is a float64 array of their common shape. Every operator runs once over
+        whole arrays instead of once per row. As with evaluate, dividing by zero raises
+        ZeroDivisionError.
+        """
+        if np is None:
+            raise ImportError("evaluate_batch requires NumPy, install it with: pip install numpy")
         if not expression or expression.isspace():
             return None
-        tokens = expression.strip().split()
-        return self._evaluate_infix(tokens)
+        arrays = {name: np.asarray(value, dtype=np.float64) for name, value in variables.items()}
+        shape = np.broadcast_shapes(*(array.shape for array in arrays.values()))
+        # Overflow and inf - inf give inf and nan silently, like Python floats
+        with np.errstate(all="ignore"):
+            result = np.asarray(self._compiled(expression)(arrays, _ARRAY_OPERATORS), dtype=np.float64)
+        if result.shape != shape:
+            result = np.broadcast_to(result, shape).copy()
+        return result
+
+    def compile(self, expression):
+        """Return a function that evaluates `expression`, called with a dict of variable values
+
+        Tokenizing and the shunting-yard pass run once per distinct expression string, the
+        last `cache_size` programs are kept. Parts without variables are computed while
+        compiling, an expression without any compiles to its value. Failures are not
+        cached, an invalid expression or a division by zero raises again on every call.
+        """
+        return self._compiled(expression)
+
+    def _compile(self, expression):
+        try:
+            # Most expressions separate their tokens with spaces, str.split is much faster
+            root = self._evaluate_infix(expression.split())
+        except ValueError:
+            root = self._evaluate_infix(self._tokenize(expression))
+
+        if not callable(root):
+            return lambda variables=None, operators=None: root
+
+        scalar_operators = self.operators
+
+        def program(variables=None, operators=None):
+            return root(variables or {}, operators or scalar_operators)
+
+        return program
+
+    def _tokenize(self, expression):
+        """Split at whitespace and operators, a sign directly before a number is part of it: "3*-2" is 3, *, -2"""
+        tokens = []
+        sign = None
+        expect_operand = True
+        for space, token in _TOKEN.findall(expression):
+            if sign is not None:
+                if not space and token not in self.operators:
+                    tokens.append(sign + token)
+                    sign = None
+                    expect_operand = False
+                    continue
+                tokens.append(sign)
+                sign = None
+            if token in self.operators:
+                if expect_operand and token in ("+", "-"):
+                    sign = token
+                    continue
+                tokens.append(token)
+                expect_operand = True
+            else:
+                tokens.append(token)
+                expect_operand = False
+        if sign is not None:
+            tokens.append(sign)
+        return tokens
 
     def _evaluate_infix(self, tokens):
         values = []
@@ -39,7 +128,7 @@ class Calculator:
                 try:
                     values.append(float(token))
                 except ValueError:
-                    raise ValueError(f"invalid token: {token}")
+                    values.append(self._variable(token))
 
         while operators:
             self._apply_operator(operators, values)
@@ -59,4 +148,51 @@ class Calculator:
 
         b = values.pop()
         a = values.pop()
-        values.append(self.operators[operator](a, b))
+        if callable(a) or callable(b):
+            values.append(_operation(operator, a, b))
+        else:
+            # Both sides are known, compute it now
+            values.append(self.operators[operator](a, b))
+
+    def _variable(self, token):
+        name = token.lstrip("+-")
+        if len(token) - len(name) > 1 or not name.isidentifier():
+            raise ValueError(f"invalid token: {token}")
+        node = _load(name)
+        return _operation("*", -1.0, node) if token[0] == "-" else node
+
+
+# Compiled expressions are trees of these nodes, each called with (variables, operators).
+# Operators are looked up by symbol at run time, so the same tree runs on floats or arrays.
+
+
+def _load(name):
+    def load(variables, operators):
+        try:
+            return variables[name]
+        except KeyError:
+            raise ValueError(f"undefined variable: {name}") from None
+
+    return load
+
+
+def _operation(symbol, a, b):
+    if callable(a) and callable(b):
+        return lambda variables, operators: operators[symbol](a(variables, operators), b(variables, operators))
+    if callable(a):
+        return lambda variables, operators: operators[symbol](a(variables, operators), b)
+    return lambda variables, operators: operators[symbol](a, b(variables, operators))
+
+
+def _divide_arrays(a, b):
+    if np.any(np.equal(b, 0)):
+        raise ZeroDivisionError("float division by zero")
+    return np.divide(a, b)
+
+
+_ARRAY_OPERATORS = {
+    "+": np.add,
+    "-": np.subtract,
+    "*": np.multiply,
+    "/": _divide_arrays,
+} if np is not None else {}
@@ -2,15 +2,28 @@
 
 import json
 
+# Reused for every line of --stream output, json.dumps with options builds a new encoder per call
+_compact_encoder = json.JSONEncoder(separators=(",", ":"))
 
-def format_json_output(expression: str, result: float, indent: int = 2) -> str:
-    if isinstance(result, float) and result.is_integer():
-        result_to_dump = int(result)
-    else:
-        result_to_dump = result
 
+def format_json_output(expression: str, result: float, indent: int = 2) -> str:
     output_data = {
         "expression": expression,
-        "result": result_to_dump,
+        "result": _result_to_dump(result),
     }
     return json.dumps(output_data, indent=indent)
+
+
+def format_json_line(expression: str, result: float = None, error: str = None) -> str:
+    """One compact JSON Lines record with the result, or the error, of an expression"""
+    if error is not None:
+        output_data = {"expression": expression, "error": error}
+    else:
+        output_data = {"expression": expression, "result": _result_to_dump(result)}
+    return _compact_encoder.encode(output_data) + "\n"
+
+
+def _result_to_dump(result):
+    if isinstance(result, float) and result.is_integer():
+        return int(result)
+    return result
@@ -1,8 +1,18 @@
 # tests.py
 
+import io
+import json
 import unittest
+from unittest import mock
+
+import main
 from pkg.calculator import Calculator
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class TestCalculator(unittest.TestCase):
     def setUp(self):
@@ -44,6 +54,90 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.calculator.evaluate("+ 3")
 
+    def test_no_spaces(self):
+        result = self.calculator.evaluate("2*3-8/2+5")
+        self.assertEqual(result, 7)
+
+    def test_signed_numbers(self):
+        self.assertEqual(self.calculator.evaluate("3*-2"), -6)
+        self.assertEqual(self.calculator.evaluate("-3 - -2"), -1)
+        self.assertEqual(self.calculator.evaluate("1e-3 * 1000"), 1)
+
+    def test_compiled_program_is_cached(self):
+        program = self.calculator.compile("3 + 5")
+        self.assertIs(self.calculator.compile("3 + 5"), program)
+        self.assertEqual(program(), 8)
+
+    def test_division_by_zero_raises_every_time(self):
+        for _ in range(2):
+            with self.assertRaises(ZeroDivisionError):
+                self.calculator.evaluate("1 / 0")
+
+    def test_variables(self):
+        self.assertEqual(self.calculator.evaluate("x * 2 + y", {"x": 3, "y": 1}), 7)
+        self.assertEqual(self.calculator.evaluate("-x+1", {"x": 3}), -2)
+
+    def test_undefined_variable(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("x + 1")
+
+
+class TestStream(unittest.TestCase):
+    def stream(self, data):
+        output = io.BytesIO()
+        main.run_stream(Calculator(), io.BytesIO(data), output)
+        return [json.loads(line) for line in output.getvalue().decode().splitlines()]
+
+    def test_one_record_per_line_in_order(self):
+        records = self.stream(b"3 + 5\n7 / 2\n2*-3")
+        self.assertEqual(
+            records,
+            [
+                {"expression": "3 + 5", "result": 8},
+                {"expression": "7 / 2", "result": 3.5},
+                {"expression": "2*-3", "result": -6},
+            ],
+        )
+
+    def test_errors_are_records(self):
+        records = self.stream(b"1 / 0\n\n$ 3\n1 + 1\n")
+        self.assertEqual([sorted(record) for record in records[:3]], [["error", "expression"]] * 3)
+        self.assertEqual(records[3], {"expression": "1 + 1", "result": 2})
+
+    def test_lines_split_across_blocks(self):
+        with mock.patch.object(main, "STREAM_BLOCK_BYTES", 4):
+            records = self.stream(b"10 + 20\n300 * 2\n")
+        self.assertEqual([record["result"] for record in records], [30, 600])
+
+    def test_output_is_compact(self):
+        output = io.BytesIO()
+        main.run_stream(Calculator(), io.BytesIO(b"1 + 2\n"), output)
+        self.assertEqual(output.getvalue(), b'{"expression":"1 + 2","result":3}\n')
+
+
+@unittest.skipUnless(numpy, "NumPy is not installed")
+class TestBatchEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.calculator = Calculator()
+
+    def test_arrays_and_scalars(self):
+        result = self.calculator.evaluate_batch("x * 2 + y", {"x": numpy.arange(4), "y": 1})
+        self.assertEqual(result.tolist(), [1, 3, 5, 7])
+
+    def test_matches_scalar_evaluation(self):
+        x = numpy.linspace(-5, 5, 11)
+        result = self.calculator.evaluate_batch("x * x - 3 / 4 + x", {"x": x})
+        expected = [self.calculator.evaluate("x * x - 3 / 4 + x", {"x": value}) for value in x.tolist()]
+        self.assertEqual(result.tolist(), expected)
+
+    def test_constant_expression_is_broadcast(self):
+        result = self.calculator.evaluate_batch("3 + 5", {"x": numpy.zeros(3)})
+        self.assertEqual(result.tolist(), [8, 8, 8])
+
+    def test_division_by_zero(self):
+        with self.assertRaises(ZeroDivisionError):
+            self.calculator.evaluate_batch("x / y", {"x": [1, 2], "y": [1, 0]})
+
 
 if __name__ == "__main__":
     unittest.main()
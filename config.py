@@ -1,2 +1,104 @@
+import os
 
 MAX_CHARS = 10000
+# Files at least this large are memory-mapped by get_file_content instead of read into memory
+MMAP_THRESHOLD_BYTES = 1024 * 1024
+
+MODEL_NAME = "gemini-2.0-flash-001"
+
+# Directory the agent's tools operate in, every path the model provides is relative to it
+WORKING_DIRECTORY = "./calculator"
+
+# Maximum number of entries returned by one get_files_info call
+MAX_LIST_ENTRIES = 500
+
+# get_files_content: character budget shared by the files of one call, files read per call and threads reading them
+FILES_CONTENT_MAX_CHARS = 30000
+FILES_CONTENT_MAX_FILES = 20
+FILES_CONTENT_MAX_WORKERS = 8
+
+# search_code: files larger than this are not indexed, matches returned per call and lines of context around each
+SEARCH_MAX_FILE_BYTES = 1024 * 1024
+SEARCH_MAX_RESULTS = 50
+SEARCH_CONTEXT_LINES = 2
+# Seconds between full rescans of a search index, to pick up files changed outside the agent's tools
+SEARCH_RESCAN_SECONDS = 5
+
+# Tool calls from a single model turn that only read state and can safely run concurrently
+READ_ONLY_FUNCTIONS = {"get_files_info", "get_file_content", "get_files_content", "search_code", "get_outline"}
+# Maximum number of read-only tool calls executed at the same time
+MAX_PARALLEL_TOOL_CALLS = 4
+
+# Rough number of characters per token, used when the API has not reported real counts yet
+CHARS_PER_TOKEN = 4
+# Conversation size (in tokens) above which old tool outputs get compacted, 0 disables it
+HISTORY_TOKEN_BUDGET = 32000
+# Number of most recent user turns that are never compacted
+HISTORY_KEEP_RECENT_TURNS = 2
+# Tool outputs shorter than this are kept as they are
+HISTORY_STUB_MIN_CHARS = 1000
+
+# Size cap for cached file contents and directory listings
+FILE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Default and maximum time a Python file may run, the model can pick a timeout per call
+RUN_TIMEOUT_SECONDS = 30
+MAX_RUN_TIMEOUT_SECONDS = 300
+# Bytes of stdout and of stderr kept per run, split between the beginning and the end of the output
+RUN_OUTPUT_MAX_BYTES = 20000
+
+# Functions listed in a run_python_file profile, by own time
+PROFILE_TOP_FUNCTIONS = 15
+
+# Cache run_python_file results until the script or a local module it imports changes
+RUN_CACHE_ENABLED = True
+RUN_CACHE_MAX_ENTRIES = 500
+# Results older than this are run again, the key cannot see data files, the environment or the time
+RUN_CACHE_MAX_AGE_SECONDS = 24 * 3600
+# New results are written to RUN_CACHE_PATH at most this often, and when the process exits
+RUN_CACHE_SAVE_SECONDS = 5
+RUN_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "run_python_file.json")
+
+# Run Python files in pre-started, forking worker interpreters instead of a new process per call
+USE_WARM_WORKERS = False
+WARM_WORKER_POOL_SIZE = 2
+# Modules imported once by each warm worker, so forked runs get them for free
+WARM_PRELOAD_MODULES = [
+    "argparse",
+    "collections",
+    "dataclasses",
+    "json",
+    "pathlib",
+    "re",
+    "runpy",
+    "traceback",
+    "typing",
+    "unittest",
+]
+
+# Agent server (--serve): agent turns running at once across all sessions, each session runs one at a time
+SERVER_MAX_ACTIVE_TURNS = 8
+# Tool calls running at once across all sessions, and per session
+SERVER_TOOL_WORKERS = 8
+SERVER_SESSION_TOOL_LIMIT = MAX_PARALLEL_TOOL_CALLS
+# Messages a session may have waiting or in progress before new ones are rejected
+SERVER_MAX_QUEUED_MESSAGES = 4
+# Directories below which clients may open a session in a directory of their choice. Empty means every
+# session gets a private copy of WORKING_DIRECTORY, a client can never point the tools at other files
+SERVER_ALLOWED_ROOTS = []
+
+# Prompts of a --batch file that run at the same time
+BATCH_PARALLELISM = 4
+
+# Lifetime of a context cache holding the system prompt and tool declarations (--context-cache)
+CONTEXT_CACHE_TTL_SECONDS = 3600
+# Prefixes estimated below this many tokens are not cached. The API also rejects prefixes under its own
+# minimum size, those are then sent uncached.
+CONTEXT_CACHE_MIN_TOKENS = 0
+
+# Retries of a model call that hit a rate limit or a transient server error, with exponential backoff
+MODEL_MAX_RETRIES = 5
+MODEL_RETRY_BASE_DELAY = 1.0
+MODEL_RETRY_MAX_DELAY = 60.0
+# Requests per minute allowed to the model across all sessions, 0 means no limit
+MODEL_REQUESTS_PER_MINUTE = 0
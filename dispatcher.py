@@ -0,0 +1,67 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from config import MAX_PARALLEL_TOOL_CALLS, READ_ONLY_FUNCTIONS
+
+
+class ToolDispatcher:
+    """Runs the function calls of one model turn, read-only ones concurrently.
+
+    A call to a function outside READ_ONLY_FUNCTIONS is a barrier: it starts only after
+    every earlier call has finished, and every later call waits for it. Writes and script
+    runs therefore keep their original order, while reads between them run in parallel.
+    Results are always returned in the order the calls were submitted.
+    """
+
+    def __init__(self, call, max_workers: int = MAX_PARALLEL_TOOL_CALLS, executor=None):
+        self._call = call
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="tool"
+        )
+        self._futures = []
+        self._since_barrier = []
+        self._barrier = None
+
+    def submit(self, function_call_part, **kwargs):
+        """Schedule a function call and return its future"""
+        if function_call_part.name in READ_ONLY_FUNCTIONS:
+            dependencies = [self._barrier] if self._barrier else []
+        else:
+            dependencies = list(self._since_barrier)
+            if self._barrier:
+                dependencies.append(self._barrier)
+
+        # Dependencies were always submitted earlier, so with the executor's FIFO queue they
+        # are already running (or done) by the time this call is picked up by a worker.
+        # The call runs in a copy of the caller's context so tracing spans nest correctly.
+        future = self._executor.submit(
+            contextvars.copy_context().run, self._run, dependencies, function_call_part, kwargs
+        )
+
+        if function_call_part.name in READ_ONLY_FUNCTIONS:
+            self._since_barrier.append(future)
+        else:
+            self._barrier = future
+            self._since_barrier = []
+
+        self._futures.append(future)
+        return future
+
+    def _run(self, dependencies, function_call_part, kwargs):
+        wait(dependencies)
+        return self._call(function_call_part, **kwargs)
+
+    def results(self):
+        """Wait for every submitted call and return the results in submission order"""
+        return [future.result() for future in self._futures]
+
+    def close(self):
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
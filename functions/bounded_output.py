@@ -0,0 +1,54 @@
+"""Bounded capture of process output
+
+Only the standard library may be imported here, the warm Python workers use it too.
+"""
+
+import codecs
+
+
+class BoundedOutput:
+    """Keeps the first and last bytes of a stream, whatever its total size
+
+    Half of `max_bytes` goes to the head and half to a tail ring buffer. Everything in
+    between is counted but dropped, so memory use stays constant for chatty scripts.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.head_limit = max_bytes // 2
+        self.tail_limit = max_bytes - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, data: bytes):
+        self.total += len(data)
+        if len(self.head) < self.head_limit:
+            room = self.head_limit - len(self.head)
+            self.head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+        if len(data) >= self.tail_limit:
+            self.tail = bytearray(data[len(data) - self.tail_limit :])
+        else:
+            self.tail += data
+            if len(self.tail) > self.tail_limit:
+                del self.tail[: len(self.tail) - self.tail_limit]
+
+    @property
+    def omitted(self) -> int:
+        return self.total - len(self.head) - len(self.tail)
+
+    def getvalue(self) -> str:
+        head = self.head.decode("utf-8", errors="replace")
+        if not self.tail:
+            return head
+        tail = self.tail.decode("utf-8", errors="replace")
+        if not self.omitted:
+            return (self.head + self.tail).decode("utf-8", errors="replace")
+        return f"{head}\n[... {self.omitted} bytes of output omitted ...]\n{tail}"
+
+
+def incremental_decoder():
+    """Decoder for live output chunks that may split multi-byte characters"""
+    return codecs.getincrementaldecoder("utf-8")(errors="replace")
@@ -0,0 +1,191 @@
+import os
+import re
+import threading
+import time
+
+try:
+    # Python 3.11+, the top-level sre_* modules are deprecated there
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:
+    import sre_constants
+    import sre_parse
+
+from config import SEARCH_MAX_FILE_BYTES, SEARCH_RESCAN_SECONDS
+from functions.get_files_info import _GitIgnore, _walk
+
+
+class CodeIndex:
+    """Trigram index of the text files below one directory
+
+    Every indexed file is split into its lowercase three-character substrings, and each
+    trigram maps to the files that contain it. A query only reads the files that contain
+    all trigrams its literal text requires, so most files are never opened.
+
+    The index is updated incrementally. Files reported by `invalidate` are reindexed on
+    the next query. The whole tree is rescanned for changed (mtime, size) pairs when
+    `invalidate_all` was called, e.g. after a script ran, or every
+    SEARCH_RESCAN_SECONDS to pick up edits made outside the agent.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._files = {}
+        self._postings = {}
+        self._dirty = set()
+        self._needs_rescan = True
+        self._scanned_at = 0.0
+        self._lock = threading.RLock()
+
+    def invalidate(self, path: str):
+        with self._lock:
+            self._dirty.add(os.path.abspath(path))
+
+    def invalidate_all(self):
+        with self._lock:
+            self._needs_rescan = True
+
+    def refresh(self):
+        with self._lock:
+            if self._needs_rescan or time.monotonic() - self._scanned_at > SEARCH_RESCAN_SECONDS:
+                self._rescan()
+            else:
+                for path in self._dirty:
+                    self._update(path)
+            self._dirty.clear()
+
+    def candidates(self, required: list) -> list:
+        """Indexed paths that may contain every string in `required` (compared case-insensitively)"""
+        with self._lock:
+            trigrams = {text[i : i + 3] for text in required for i in range(len(text) - 2)}
+            if not trigrams:
+                return sorted(self._files)
+            postings = sorted((self._postings.get(trigram, set()) for trigram in trigrams), key=len)
+            paths = set(postings[0])
+            for posting in postings[1:]:
+                paths &= posting
+                if not paths:
+                    break
+            return sorted(paths)
+
+    def __len__(self):
+        return len(self._files)
+
+    def _rescan(self):
+        ignore = _GitIgnore()
+        seen = set()
+        for relative_path, is_dir, _ in _walk(self.root, None, None, ["__pycache__"], ignore):
+            if not is_dir:
+                path = os.path.join(self.root, relative_path)
+                seen.add(path)
+                self._update(path)
+        for path in [path for path in self._files if path not in seen]:
+            self._remove(path)
+        self._needs_rescan = False
+        self._scanned_at = time.monotonic()
+
+    def _update(self, path: str):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._remove(path)
+            return
+        signature = (stat.st_mtime_ns, stat.st_size)
+        entry = self._files.get(path)
+        if entry is not None and entry[0] == signature:
+            return
+
+        self._remove(path)
+        trigrams = _file_trigrams(path, stat.st_size)
+        if trigrams is None:
+            return
+        self._files[path] = (signature, trigrams)
+        for trigram in trigrams:
+            self._postings.setdefault(trigram, set()).add(path)
+
+    def _remove(self, path: str):
+        entry = self._files.pop(path, None)
+        if entry is None:
+            return
+        for trigram in entry[1]:
+            posting = self._postings.get(trigram)
+            if posting is not None:
+                posting.discard(path)
+                if not posting:
+                    del self._postings[trigram]
+
+
+def _file_trigrams(path: str, size: int):
+    """Lowercase trigrams of a text file, None for binary or oversized files"""
+    if size > SEARCH_MAX_FILE_BYTES:
+        return None
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if b"\0" in data[:8192]:
+        return None
+    text = data.decode("utf-8", errors="replace").lower()
+    return frozenset(text[i : i + 3] for i in range(len(text) - 2))
+
+
+def required_literals(pattern: str, is_regex: bool) -> list:
+    """Substrings every match of the query must contain, lowercased, for the trigram filter"""
+    if not is_regex:
+        return [pattern.lower()]
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return []
+    literals = []
+    current = []
+    for op, value in parsed:
+        if op is sre_constants.LITERAL:
+            current.append(chr(value))
+        else:
+            # Classes, groups, alternations and repeats may match anything, they end the current run
+            literals.append("".join(current))
+            current = []
+    literals.append("".join(current))
+    return [literal.lower() for literal in literals if len(literal) >= 3]
+
+
+class CodeIndexes:
+    """One CodeIndex per working directory, created on first use"""
+
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, root: str) -> CodeIndex:
+        root = os.path.abspath(root)
+        with self._lock:
+            index = self._indexes.get(root)
+            if index is None:
+                index = self._indexes[root] = CodeIndex(root)
+            return index
+
+    def invalidate(self, path: str):
+        """Reindex `path` in every index that covers it, e.g. after write_file"""
+        path = os.path.abspath(path)
+        with self._lock:
+            indexes = list(self._indexes.values())
+        for index in indexes:
+            if path.startswith(index.root + os.sep):
+                index.invalidate(path)
+
+    def forget(self, root: str):
+        """Drop the index of a working directory that is about to be deleted"""
+        with self._lock:
+            self._indexes.pop(os.path.abspath(root), None)
+
+    def invalidate_all(self):
+        """Rescan every index, e.g. after a script that may have changed any file ran"""
+        with self._lock:
+            indexes = list(self._indexes.values())
+        for index in indexes:
+            index.invalidate_all()
+
+
+# Shared by all tools in the process
+code_indexes = CodeIndexes()
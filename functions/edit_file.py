@@ -0,0 +1,239 @@
+import os
+import re
+
+from functions.code_index import code_indexes
+from functions.file_cache import file_cache
+from functions.run_cache import run_cache
+from functions.write_file import atomic_write
+
+_HUNK_HEADER = re.compile(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class EditError(Exception):
+    pass
+
+
+def edit_file(working_directory: str, file_path: str, edits=None, patch=None):
+    """A tool call function for an AI agent to use
+
+    Changes part of an existing file with search/replace `edits` or a unified diff
+    `patch`, so the model only sends what changes instead of the whole file. Every edit
+    is applied in memory first, the file is only replaced (atomically) if all of them
+    apply cleanly.
+    """
+    try:
+        full_path = os.path.abspath(os.path.join(working_directory, file_path))
+
+        # Security check: ensure the file is within the working directory
+        if not full_path.startswith(os.path.abspath(working_directory)):
+            return f'Error: Cannot edit "{file_path}" as it is outside the permitted working directory'
+
+        if not os.path.isfile(full_path):
+            return f'Error: File not found or is not a regular file: "{file_path}". Use write_file to create new files.'
+
+        if bool(edits) == bool(patch):
+            return "Error: Provide either edits or patch, not both or neither"
+
+        with open(full_path, "r", newline="") as f:
+            content = f.read()
+
+        if edits:
+            new_content, added, removed = _apply_edits(content, edits)
+            changes = f"{len(edits)} edit{'s' if len(edits) != 1 else ''}"
+        else:
+            new_content, added, removed, hunks = _apply_patch(content, patch)
+            changes = f"{hunks} hunk{'s' if hunks != 1 else ''}"
+
+        atomic_write(full_path, new_content)
+
+        # Make sure cached reads, listings, script results and the search index never serve the old content
+        file_cache.invalidate(full_path)
+        run_cache.invalidate(full_path)
+        code_indexes.invalidate(full_path)
+
+        total_lines = new_content.count("\n") + (1 if new_content and not new_content.endswith("\n") else 0)
+        return f'Successfully edited "{file_path}": {changes} applied, +{added}/-{removed} lines, {total_lines} lines total'
+
+    except EditError as e:
+        return f'Error: No changes made to "{file_path}": {e}'
+    except OSError as e:
+        return f"Error: An OSError has occurred: {e}"
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def _apply_edits(content: str, edits: list):
+    """Apply search/replace blocks in order, each search text must occur exactly once"""
+    added = removed = 0
+    for number, edit in enumerate(edits, start=1):
+        search = edit.get("search", "") if isinstance(edit, dict) else ""
+        replace = edit.get("replace", "") if isinstance(edit, dict) else ""
+        if not search:
+            raise EditError(f"edit {number} has an empty search text")
+        count = content.count(search)
+        if count == 0:
+            raise EditError(
+                f"edit {number}: search text not found. It must match the file exactly, including whitespace; "
+                "read the file again if it may have changed."
+            )
+        if count > 1:
+            raise EditError(f"edit {number}: search text occurs {count} times, include more surrounding lines to make it unique")
+        content = content.replace(search, replace, 1)
+        removed += search.count("\n") + (not search.endswith("\n"))
+        added += replace.count("\n") + (bool(replace) and not replace.endswith("\n"))
+    return content, added, removed
+
+
+def _apply_patch(content: str, patch: str):
+    """Apply the hunks of a unified diff, tolerating line numbers that are slightly off
+
+    Lines keep their own ending, so a file mixing CRLF and LF stays as it is. An added line
+    ends like the removed line it replaces, or else like the line before it.
+    """
+    newline = "\r\n" if "\r\n" in content else "\n"
+    lines, endings = _split_lines(content)
+    ends_with_newline = content.endswith("\n")
+    hunks = _parse_hunks(patch)
+    if not hunks:
+        raise EditError("the patch has no hunks (expected lines starting with @@ -start,count +start,count @@)")
+
+    added = removed = 0
+    offset = 0
+    for number, (old_start, old_lines, new_lines, hunk_added, hunk_removed, sources) in enumerate(hunks, start=1):
+        position = _find_block(lines, old_lines, max(old_start - 1 + offset, 0))
+        if position is None:
+            raise EditError(f"hunk {number} does not match the file, its context and removed lines must match exactly")
+        old_endings = endings[position : position + len(old_lines)]
+        ending = endings[position - 1] if position else newline
+        new_endings = []
+        for source in sources:
+            ending = old_endings[source] if source is not None else ending or newline
+            new_endings.append(ending)
+        lines[position : position + len(old_lines)] = new_lines
+        endings[position : position + len(old_lines)] = new_endings
+        offset = position - (old_start - 1) + len(new_lines) - len(old_lines)
+        added += hunk_added
+        removed += hunk_removed
+
+    # Only the last line may lack a line ending, and only if the file did
+    endings = [ending or newline for ending in endings]
+    if endings and not ends_with_newline:
+        endings[-1] = ""
+    return "".join(line + ending for line, ending in zip(lines, endings)), added, removed, len(hunks)
+
+
+def _split_lines(text: str):
+    """(lines, their endings), split at line feeds only
+
+    str.splitlines also splits at form feeds, some other control characters and Unicode
+    line separators, which can occur inside a line, e.g. in a string literal.
+    """
+    parts = text.split("\n")
+    # Text after the last newline, empty when the text ends with one
+    last = parts.pop()
+    lines = []
+    endings = []
+    for part in parts:
+        if part.endswith("\r"):
+            lines.append(part[:-1])
+            endings.append("\r\n")
+        else:
+            lines.append(part)
+            endings.append("\n")
+    if last:
+        lines.append(last)
+        endings.append("")
+    return lines, endings
+
+
+def _parse_hunks(patch: str) -> list:
+    """Return [old start line, old lines, new lines, added, removed, sources] for each hunk of a unified diff
+
+    Hunk line counts are ignored, models often get them wrong; a hunk runs until the next
+    hunk or file header. `sources` has, for each new line, the index of the old line whose
+    line ending it takes: the same line for context, the removed line it replaces for an
+    added line, or None.
+    """
+    hunks = []
+    current = None
+    # Old lines removed since the last context line, added lines replace them in order
+    replaced = []
+    patch_lines = _split_lines(patch)[0]
+    for index, line in enumerate(patch_lines):
+        header = _HUNK_HEADER.match(line)
+        next_line = patch_lines[index + 1] if index + 1 < len(patch_lines) else ""
+        if header:
+            # A hunk that removes nothing (",0") inserts after its start line instead of at it
+            current = [int(header.group(1)) + (header.group(2) == "0"), [], [], 0, 0, []]
+            hunks.append(current)
+            replaced = []
+        elif line.startswith("--- ") and next_line.startswith("+++ "):
+            # File header, the lines up to the next @@ belong to no hunk
+            current = None
+        elif current is None or line.startswith("\\"):
+            # Text outside hunks, or "\ No newline at end of file"
+            continue
+        elif line.startswith("-"):
+            current[1].append(line[1:])
+            current[4] += 1
+            replaced.append(len(current[1]) - 1)
+        elif line.startswith("+"):
+            current[2].append(line[1:])
+            current[3] += 1
+            current[5].append(replaced.pop(0) if replaced else None)
+        elif line.startswith(" ") or not line:
+            # Context line, some generators drop the leading space of empty lines
+            current[1].append(line[1:])
+            current[2].append(line[1:])
+            current[5].append(len(current[1]) - 1)
+            replaced = []
+        else:
+            raise EditError(f"unexpected patch line {index + 1}: lines inside a hunk must start with a space, - or +")
+    return hunks
+
+
+def _find_block(lines: list, block: list, expected: int):
+    """Index where `block` occurs in `lines`, the one closest to `expected` if there are several"""
+    if not block:
+        return min(expected, len(lines))
+    last = len(lines) - len(block)
+    for distance in range(0, max(expected, last - expected) + 1):
+        for candidate in (expected - distance, expected + distance):
+            if 0 <= candidate <= last and lines[candidate : candidate + len(block)] == block:
+                return candidate
+    return None
+
+
+def schema_edit_file():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="edit_file",
+        description="Changes part of an existing file, constrained to the working directory. Prefer it over write_file for changes to existing files: send only search/replace edits or a unified diff instead of the whole file. Nothing is changed unless every edit applies.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(
+                    type=types.Type.STRING,
+                    description="The path to the file to edit, relative to the working directory.",
+                ),
+                "edits": types.Schema(
+                    type=types.Type.ARRAY,
+                    description="Search/replace blocks applied in order. Each search text must match the file exactly, including indentation, and occur exactly once.",
+                    items=types.Schema(
+                        type=types.Type.OBJECT,
+                        properties={
+                            "search": types.Schema(type=types.Type.STRING, description="Exact text to find, with a few surrounding lines if needed to make it unique."),
+                            "replace": types.Schema(type=types.Type.STRING, description="Text to put in its place."),
+                        },
+                        required=["search", "replace"],
+                    ),
+                ),
+                "patch": types.Schema(
+                    type=types.Type.STRING,
+                    description="Alternatively, a unified diff of this file with @@ hunk headers, context lines starting with a space, removed lines with - and added lines with +.",
+                ),
+            },
+            required=["file_path"],
+        ),
+    )
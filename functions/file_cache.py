@@ -0,0 +1,138 @@
+import contextvars
+import os
+import threading
+from collections import OrderedDict
+
+from config import FILE_CACHE_MAX_BYTES
+
+# Whose conversation results are served to, the agent server sets one scope per session
+served_scope = contextvars.ContextVar("served_scope", default=None)
+
+
+class FileCache:
+    """LRU cache for tool results, keyed on (kind, path, mtime, size, extra)
+
+    Entries are evicted least recently used first once their total size goes over
+    `max_bytes`. The cache also remembers which results were already returned to the
+    model, so tools can answer repeated reads of unchanged content with a short note.
+    That record is kept per `served_scope`, so concurrent conversations do not share it.
+    """
+
+    def __init__(self, max_bytes: int = FILE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._served = {}
+        self._size = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.unchanged = 0
+
+    @staticmethod
+    def key(kind: str, path: str, extra=()):
+        """Build a cache key from the current (mtime, size) of `path`"""
+        stat = os.stat(path)
+        return (kind, path, stat.st_mtime_ns, stat.st_size, extra)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, value, size: int = None):
+        """Cache `value`, its size defaults to len(value) and counts towards the byte cap"""
+        size = len(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._size += size
+            while self._size > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                self._size -= self._sizes.pop(evicted)
+                self.evictions += 1
+
+    def _remove(self, key):
+        if key in self._entries:
+            del self._entries[key]
+            self._size -= self._sizes.pop(key)
+
+    def mark_served(self, key) -> bool:
+        """Record that `key` was returned to the model, returns True if it already was"""
+        with self._lock:
+            served = self._served.setdefault(served_scope.get(), set())
+            if key in served:
+                self.unchanged += 1
+                return True
+            served.add(key)
+            return False
+
+    def forget_served(self, scope=None):
+        """Forget what the model has seen, e.g. after the conversation was cleared or compacted
+
+        Only the current scope is forgotten, unless another one is given.
+        """
+        with self._lock:
+            self._served.pop(scope if scope is not None else served_scope.get(), None)
+
+    def invalidate(self, path: str):
+        """Drop everything cached for `path`, anything below it and the listings of its parent directories"""
+        path = os.path.abspath(path)
+        parents = set()
+        parent = os.path.dirname(path)
+        while parent and parent not in parents:
+            parents.add(parent)
+            parent = os.path.dirname(parent)
+
+        def affected(key):
+            kind, cached_path = key[0], key[1]
+            if cached_path == path or cached_path.startswith(path + os.sep):
+                return True
+            return kind == "listing" and cached_path in parents
+
+        with self._lock:
+            for key in [key for key in self._entries if affected(key)]:
+                self._remove(key)
+            for served in self._served.values():
+                served.difference_update([key for key in served if affected(key)])
+
+    def invalidate_kind(self, kind: str):
+        """Drop every entry of one kind, e.g. all directory listings"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == kind]:
+                self._remove(key)
+            for served in self._served.values():
+                served.difference_update([key for key in served if key[0] == kind])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._served.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "unchanged": self.unchanged,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+
+# Shared by all tools in the process
+file_cache = FileCache()
@@ -1,12 +1,19 @@
+import mmap
 import os
 
-from config import MAX_CHARS
-from google.genai.models import types
+from config import MAX_CHARS, MMAP_THRESHOLD_BYTES
+from functions.file_cache import file_cache
 
+# Size of the blocks scanned when counting or skipping lines, nothing is decoded while scanning
+SCAN_CHUNK_BYTES = 1024 * 1024
 
 
-def get_file_content(working_directory: str, file_path: str):
-    """A tool call function for an AI agent to use"""
+def get_file_content(working_directory: str, file_path: str, offset=None, limit=None, start_byte=None, end_byte=None):
+    """A tool call function for an AI agent to use
+
+    Reads a whole file (up to MAX_CHARS characters), a window of `limit` lines starting at
+    the 1-based line `offset`, or the byte range [start_byte, end_byte).
+    """
     try:
         full_path = os.path.abspath(os.path.join(working_directory, file_path))
 
@@ -15,11 +22,26 @@ def get_file_content(working_directory: str, file_path: str):
         if not full_path.startswith(os.path.abspath(working_directory)):
             return f'Error: Cannot read "{file_path}" as it is outside the permitted working directory'
 
-        with open(full_path, "r") as f:
-            file_content_string = f.read(MAX_CHARS)
+        offset, limit, start_byte, end_byte = (
+            None if value is None else int(value) for value in (offset, limit, start_byte, end_byte)
+        )
+        if (offset is not None or limit is not None) and (start_byte is not None or end_byte is not None):
+            return "Error: Use either offset/limit or start_byte/end_byte, not both"
+        if any(value is not None and value < 0 for value in (offset, limit, start_byte, end_byte)):
+            return "Error: offset, limit, start_byte and end_byte must not be negative"
+        if limit == 0:
+            return "Error: limit must be at least 1"
+
+        cache_key = file_cache.key("content", full_path, (offset, limit, start_byte, end_byte))
+        file_content_string = file_cache.get(cache_key)
 
-        if len(file_content_string) == MAX_CHARS:
-            file_content_string = file_content_string + f'\n[...File "{file_path}" truncated at 10000 characters]'
+        if file_content_string is None:
+            file_content_string = _read_file(full_path, file_path, offset, limit, start_byte, end_byte)
+            file_cache.put(cache_key, file_content_string)
+
+        # Don't fill the conversation with another copy of content the model already has
+        if file_cache.mark_served(cache_key):
+            return f'File "{file_path}" is unchanged since it was last read ({len(file_content_string)} characters), refer to the earlier result.'
 
         return file_content_string
     except OSError as e:
@@ -28,17 +50,141 @@ def get_file_content(working_directory: str, file_path: str):
         return f"Error: {e}"
 
 
-schema_get_file_content = types.FunctionDeclaration(
-    name="get_file_content",
-    description="Reads and returns the content of a specified file, constrained to the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="The path to the file to read, relative to the working directory.",
-            ),
-        },
-        required=["file_path"],
-    ),
-)
+def _read_file(full_path: str, file_path: str, offset, limit, start_byte, end_byte) -> str:
+    with open(full_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return ""
+
+        # Large files are mapped instead of read, so a window deep into the file only touches those pages
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size >= MMAP_THRESHOLD_BYTES else f.read()
+        try:
+            if start_byte is not None or end_byte is not None:
+                return _read_byte_range(data, size, start_byte or 0, size if end_byte is None else min(end_byte, size))
+            if offset is not None or limit is not None:
+                return _read_lines(data, size, offset or 1, limit)
+            return _read_head(data, size, file_path)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+
+def _read_head(data, size: int, file_path: str) -> str:
+    # A character is at most 4 bytes in UTF-8, so this prefix always holds MAX_CHARS characters if the file does
+    head = data[: MAX_CHARS * 4].decode("utf-8", errors="replace")
+    if len(head) <= MAX_CHARS and size <= MAX_CHARS * 4:
+        return head
+
+    total_lines = _count_lines(data, size)
+    return head[:MAX_CHARS] + (
+        f'\n[...File "{file_path}" truncated at {MAX_CHARS} characters. '
+        f"It has {total_lines} lines in total, use offset and limit to read a specific range.]"
+    )
+
+
+def _read_lines(data, size: int, offset: int, limit) -> str:
+    offset = max(offset, 1)
+    total_lines = _count_lines(data, size)
+    if offset > total_lines:
+        return f"[Line {offset} is past the end of the file, which has {total_lines} lines.]"
+
+    start = _line_start(data, size, offset)
+    end = size
+    if limit is not None:
+        end = _line_start(data, size, limit + 1, start)
+
+    text = data[start : min(end, start + MAX_CHARS * 4)].decode("utf-8", errors="replace")
+    truncated = len(text) > MAX_CHARS or end - start > MAX_CHARS * 4
+    text = text[:MAX_CHARS]
+
+    shown = text.count("\n") + (0 if text.endswith("\n") else 1)
+    last_line = min(offset + shown - 1, total_lines)
+    if truncated:
+        return _with_note(
+            text,
+            f"[...Lines {offset}-{last_line} of {total_lines} shown, output truncated at {MAX_CHARS} characters. "
+            f"Continue with offset={last_line + 1}.]",
+        )
+    if offset > 1 or last_line < total_lines:
+        return _with_note(text, f"[Lines {offset}-{last_line} of {total_lines}.]")
+    return text
+
+
+def _read_byte_range(data, size: int, start: int, end: int) -> str:
+    if start >= size:
+        return f"[Byte {start} is past the end of the file, which is {size} bytes.]"
+    if start >= end:
+        return f"[Empty byte range {start}-{end}.]"
+
+    text = data[start : min(end, start + MAX_CHARS * 4)].decode("utf-8", errors="replace")
+    if len(text) > MAX_CHARS or end - start > MAX_CHARS * 4:
+        text = text[:MAX_CHARS]
+        shown_end = start + len(text.encode("utf-8"))
+        return _with_note(text, f"[...Bytes {start}-{shown_end} of {size} shown, output truncated at {MAX_CHARS} characters.]")
+    if start > 0 or end < size:
+        return _with_note(text, f"[Bytes {start}-{end} of {size}.]")
+    return text
+
+
+def _with_note(text: str, note: str) -> str:
+    return text + ("" if text.endswith("\n") else "\n") + note
+
+
+def _count_lines(data, size: int) -> int:
+    newlines = 0
+    for position in range(0, size, SCAN_CHUNK_BYTES):
+        newlines += data[position : position + SCAN_CHUNK_BYTES].count(b"\n")
+    return newlines + (0 if data[size - 1 : size] == b"\n" else 1)
+
+
+def _line_start(data, size: int, line: int, position: int = 0) -> int:
+    """Byte offset where the `line`-th line after `position` starts (1-based), or `size` past the end"""
+    remaining = line - 1
+    while remaining and position < size:
+        chunk = data[position : position + SCAN_CHUNK_BYTES]
+        newlines = chunk.count(b"\n")
+        if newlines < remaining:
+            remaining -= newlines
+            position += len(chunk)
+            continue
+
+        index = -1
+        for _ in range(remaining):
+            index = chunk.index(b"\n", index + 1)
+        return position + index + 1
+    return min(position, size)
+
+
+def schema_get_file_content():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="get_file_content",
+        description=f"Reads and returns the content of a specified file, constrained to the working directory. Without a range, returns the first {MAX_CHARS} characters and the total line count. Use offset/limit to page through large files by line, or start_byte/end_byte for a byte range.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(
+                    type=types.Type.STRING,
+                    description="The path to the file to read, relative to the working directory.",
+                ),
+                "offset": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Optional 1-based line number to start reading from.",
+                ),
+                "limit": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Optional maximum number of lines to read, starting at offset (or the first line).",
+                ),
+                "start_byte": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Optional start of a byte range to read (inclusive). Cannot be combined with offset/limit.",
+                ),
+                "end_byte": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Optional end of a byte range to read (exclusive). Defaults to the end of the file.",
+                ),
+            },
+            required=["file_path"],
+        ),
+    )
@@ -0,0 +1,126 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from config import FILES_CONTENT_MAX_CHARS, FILES_CONTENT_MAX_FILES, FILES_CONTENT_MAX_WORKERS
+from functions.file_cache import file_cache
+from functions.get_files_info import _GitIgnore, _walk
+
+
+def get_files_content(working_directory: str, file_paths=None, pattern=None, max_chars=FILES_CONTENT_MAX_CHARS):
+    """A tool call function for an AI agent to use
+
+    Reads several files in one call: the listed `file_paths`, the files matching the glob
+    `pattern`, or both. Files are read concurrently and share a budget of `max_chars`
+    characters. Small files are returned whole and what they leave over is split between
+    the larger ones, each cut at a line boundary with a note where to continue.
+    """
+    try:
+        root = os.path.abspath(working_directory)
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+        requested = list(file_paths or [])
+        if pattern:
+            requested += [
+                relative_path
+                for relative_path, is_dir, _ in _walk(root, None, [pattern], ["__pycache__"], _GitIgnore())
+                if not is_dir
+            ]
+        if not requested:
+            return "Error: Provide file_paths, a pattern, or both"
+        # Keep the first occurrence of each file, in the order given
+        requested = list(dict.fromkeys(requested))
+        skipped = requested[FILES_CONTENT_MAX_FILES:]
+        requested = requested[:FILES_CONTENT_MAX_FILES]
+        max_chars = max(1, min(int(max_chars), FILES_CONTENT_MAX_CHARS))
+
+        full_paths = [os.path.abspath(os.path.join(root, file_path)) for file_path in requested]
+        if len(requested) > 1:
+            with ThreadPoolExecutor(max_workers=min(FILES_CONTENT_MAX_WORKERS, len(requested))) as executor:
+                results = list(executor.map(_read, full_paths, requested, [root] * len(requested), [max_chars] * len(requested)))
+        else:
+            results = [_read(full_paths[0], requested[0], root, max_chars)]
+
+        shares = _share_budget([len(text) for text, _ in results if text is not None], max_chars)
+        blocks = []
+        for file_path, (text, error) in zip(requested, results):
+            if text is None:
+                blocks.append(f"===== {file_path} =====\n{error}")
+                continue
+            blocks.append(f"===== {file_path} =====\n{_fit(text, shares.pop(0), file_path)}")
+        if skipped:
+            blocks.append(
+                f"[{len(skipped)} more files not read, at most {FILES_CONTENT_MAX_FILES} per call: {', '.join(skipped)}]"
+            )
+        return "\n\n".join(blocks)
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def _read(full_path: str, file_path: str, root: str, max_chars: int):
+    """(text, None) with up to `max_chars` + 1 characters of the file, or (None, error)"""
+    # Security check: ensure the path is within the working directory
+    if full_path != root and not full_path.startswith(root + os.sep):
+        return None, f'Error: Cannot read "{file_path}" as it is outside the permitted working directory'
+    if not os.path.isfile(full_path):
+        return None, f'Error: File not found or is not a regular file: "{file_path}"'
+    try:
+        cache_key = file_cache.key("files_content", full_path, max_chars)
+        text = file_cache.get(cache_key)
+        if text is None:
+            with open(full_path, "rb") as f:
+                # A character is at most 4 bytes in UTF-8, one more character tells that the file was cut
+                text = f.read((max_chars + 1) * 4).decode("utf-8", errors="replace")[: max_chars + 1]
+            file_cache.put(cache_key, text)
+        return text, None
+    except OSError as e:
+        return None, f"Error: An OSError has occurred: {e}"
+
+
+def _share_budget(lengths: list, budget: int) -> list:
+    """Characters allowed per file: an equal share each, files needing less pass the rest on"""
+    shares = [0] * len(lengths)
+    remaining = budget
+    for position, index in enumerate(sorted(range(len(lengths)), key=lengths.__getitem__)):
+        share = min(lengths[index], remaining // (len(lengths) - position))
+        shares[index] = share
+        remaining -= share
+    return shares
+
+
+def _fit(text: str, share: int, file_path: str) -> str:
+    if len(text) <= share:
+        return text
+    # Cut after the last complete line that fits, unless not even one line does
+    cut = text.rfind("\n", 0, share) + 1 or share
+    shown_lines = text.count("\n", 0, cut)
+    return text[:cut] + (
+        f"[...File \"{file_path}\" truncated after line {shown_lines} ({cut} characters), "
+        f"continue with get_file_content offset={shown_lines + 1}.]"
+    )
+
+
+def schema_get_files_content():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="get_files_content",
+        description=f"Reads several files in one call, constrained to the working directory: a list of paths, the files matching a glob pattern, or both (at most {FILES_CONTENT_MAX_FILES} files). The files share a budget of {FILES_CONTENT_MAX_CHARS} characters, small files are returned whole and larger ones are cut at a line with a note on where to continue. Prefer it over several get_file_content calls when exploring a module.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_paths": types.Schema(
+                    type=types.Type.ARRAY,
+                    items=types.Schema(type=types.Type.STRING),
+                    description="Paths of the files to read, relative to the working directory.",
+                ),
+                "pattern": types.Schema(
+                    type=types.Type.STRING,
+                    description='Optional glob selecting files to read, e.g. "*.py" (matched against file names) or "pkg/*.py" (matched against paths relative to the working directory).',
+                ),
+                "max_chars": types.Schema(
+                    type=types.Type.INTEGER,
+                    description=f"Optional total character budget shared by all files, at most {FILES_CONTENT_MAX_CHARS}.",
+                ),
+            },
+        ),
+    )
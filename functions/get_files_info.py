@@ -1,10 +1,28 @@
+import fnmatch
 import os
+import re
 
-from google.genai.models import types
+from config import MAX_LIST_ENTRIES
+from functions.file_cache import file_cache
 
 
-def get_files_info(working_directory: str, directory="."):
-    """A tool call function for an AI agent to use"""
+def get_files_info(
+    working_directory: str,
+    directory=".",
+    recursive=False,
+    max_depth=None,
+    include=None,
+    exclude=None,
+    respect_gitignore=True,
+    offset=0,
+    limit=None,
+):
+    """A tool call function for an AI agent to use
+
+    Lists a directory, optionally descending up to `max_depth` levels (unlimited when
+    `recursive` is set without a depth). Entries can be filtered with include/exclude
+    glob patterns and by .gitignore files, and the result is paginated with offset/limit.
+    """
     try:
         full_path = os.path.abspath(os.path.join(working_directory, directory))
 
@@ -13,12 +31,49 @@ def get_files_info(working_directory: str, directory="."):
         if not full_path.startswith(os.path.abspath(working_directory)):
             return f'Error: Cannot list "{directory}" as it is outside the permitted working directory'
 
-        file_infos_string = "\n".join(
-            [
-                f"- {file}: file_size={os.path.getsize(os.path.join(full_path, file))} bytes, is_dir={os.path.isdir(os.path.join(full_path, file))}"
-                for file in os.listdir(full_path)
-            ]
-        )
+        if max_depth is None:
+            max_depth = None if recursive else 0
+        max_depth = None if max_depth is None else int(max_depth)
+        offset = int(offset or 0)
+        limit = MAX_LIST_ENTRIES if limit is None else min(int(limit), MAX_LIST_ENTRIES)
+        if offset < 0:
+            return "Error: offset must not be negative"
+        if limit < 1:
+            return "Error: limit must be at least 1"
+        include = _as_patterns(include)
+        exclude = _as_patterns(exclude)
+
+        ignore = None
+        if respect_gitignore:
+            # Rules from the working directory down to the listed directory also apply
+            ignore = _GitIgnore()
+            path = os.path.abspath(working_directory)
+            ignore.load(path)
+            for part in os.path.relpath(full_path, path).split(os.sep):
+                if part != ".":
+                    path = os.path.join(path, part)
+                    ignore.load(path)
+
+        lines = []
+        total = 0
+        for relative_path, is_dir, path in _walk(full_path, max_depth, include, exclude, ignore):
+            # Only the entries on this page are stat'ed for their size
+            if offset <= total < offset + limit:
+                lines.append(f"- {relative_path}: file_size={_size(path)} bytes, is_dir={is_dir}")
+            total += 1
+
+        file_infos_string = "\n".join(lines)
+        if offset or total > offset + limit:
+            shown_end = min(offset + limit, total)
+            note = f"[Showing entries {offset + 1}-{shown_end} of {total}."
+            if shown_end < total:
+                note += f" Use offset={shown_end} to see more."
+            file_infos_string = (file_infos_string + "\n" if file_infos_string else "") + note + "]"
+
+        # Don't fill the conversation with another copy of a listing the model already has
+        served_key = ("listing", full_path, 0, 0, ("result", hash(file_infos_string)))
+        if file_cache.mark_served(served_key):
+            return f'Directory "{directory}" is unchanged since it was last listed, refer to the earlier result.'
     except OSError as e:
         return f"Error: An OSError has occured: {e}"
     except Exception as e:
@@ -26,16 +81,211 @@ def get_files_info(working_directory: str, directory="."):
 
     return file_infos_string
 
-schema_get_files_info = types.FunctionDeclaration(
-    name="get_files_info",
-    description="Lists files in the specified directory along with their sizes, constrained to the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "directory": types.Schema(
-                type=types.Type.STRING,
-                description="The directory to list files from, relative to the working directory. If not provided, lists files in the working directory itself.",
-            ),
-        },
-    ),
-)
+
+def _as_patterns(patterns):
+    if not patterns:
+        return []
+    if isinstance(patterns, str):
+        return [patterns]
+    return list(patterns)
+
+
+def _scan(path: str):
+    """Return the sorted (name, is_dir, is_symlink) entries of one directory
+
+    A single os.scandir pass is enough: is_dir() comes from the directory entry itself.
+    Results are cached per (path, mtime, size) of the directory. Rewriting a file in place
+    does not change those, so sizes are not part of the cached entries, see `_size`.
+    """
+    cache_key = file_cache.key("listing", path)
+    entries = file_cache.get(cache_key)
+    if entries is None:
+        entries = []
+        with os.scandir(path) as iterator:
+            for entry in iterator:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                entries.append((entry.name, is_dir, entry.is_symlink()))
+        entries.sort()
+        file_cache.put(cache_key, entries, size=sum(len(name) + 32 for name, *_ in entries))
+    return entries
+
+
+def _size(path: str) -> int:
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        # Broken symlinks and entries removed since the scan
+        return 0
+
+
+def _walk(top: str, max_depth, include, exclude, ignore):
+    """Yield (relative path, is_dir, full path) for entries below `top`, depth first"""
+    stack = [(top, "", 0)]
+    while stack:
+        path, prefix, depth = stack.pop()
+        if ignore is not None:
+            ignore.load(path)
+
+        children = []
+        for name, is_dir, is_symlink in _scan(path):
+            relative_path = prefix + name
+            if name == ".git" and is_dir:
+                continue
+            if exclude and _matches(relative_path, name, exclude):
+                continue
+            if ignore is not None and ignore.ignored(os.path.join(path, name), is_dir):
+                continue
+
+            if not include or _matches(relative_path, name, include):
+                yield relative_path, is_dir, os.path.join(path, name)
+
+            # Symlinked directories are listed but not followed, to avoid cycles
+            if is_dir and not is_symlink and (max_depth is None or depth < max_depth):
+                children.append((os.path.join(path, name), relative_path + "/", depth + 1))
+
+        # Subdirectories are walked after all entries of their parent, in name order
+        stack.extend(reversed(children))
+
+
+def _matches(relative_path: str, name: str, patterns) -> bool:
+    """Patterns containing a slash match the relative path, others match the name"""
+    for pattern in patterns:
+        if fnmatch.fnmatch(relative_path if "/" in pattern else name, pattern):
+            return True
+    return False
+
+
+class _GitIgnore:
+    """Minimal .gitignore matcher, the last matching rule wins"""
+
+    def __init__(self):
+        self._rules = []
+        self._loaded = set()
+
+    def load(self, directory: str):
+        """Read the .gitignore of `directory` (once), its rules are relative to that directory"""
+        if directory in self._loaded:
+            return
+        self._loaded.add(directory)
+
+        try:
+            with open(os.path.join(directory, ".gitignore"), "r") as f:
+                lines = f.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            return
+
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            # A slash anywhere but the end anchors the pattern to the .gitignore's directory
+            anchored = "/" in line
+            regex = _gitignore_regex(line.lstrip("/"), anchored)
+            self._rules.append((directory, regex, negate, dir_only))
+
+    def ignored(self, path: str, is_dir: bool) -> bool:
+        result = False
+        for base, regex, negate, dir_only in self._rules:
+            if dir_only and not is_dir:
+                continue
+            if not path.startswith(base + os.sep):
+                continue
+            relative_path = path[len(base) + 1 :].replace(os.sep, "/")
+            if regex.fullmatch(relative_path):
+                result = not negate
+        return result
+
+
+def _gitignore_regex(pattern: str, anchored: bool):
+    regex = ""
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if pattern.startswith("**/", index):
+            regex += "(?:.*/)?"
+            index += 3
+            continue
+        if pattern.startswith("**", index):
+            regex += ".*"
+            index += 2
+            continue
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = pattern.find("]", index + 1)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                body = pattern[index + 1 : end]
+                # Only a leading "!" negates the class, elsewhere it is a literal "!"
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                regex += "[" + body + "]"
+                index = end
+        else:
+            regex += re.escape(char)
+        index += 1
+
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return re.compile(regex)
+
+
+def schema_get_files_info():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="get_files_info",
+        description=f"Lists files in the specified directory along with their sizes, constrained to the working directory. Can walk a whole tree in one call with recursive/max_depth, filter with glob patterns, and skips files ignored by .gitignore. Returns at most {MAX_LIST_ENTRIES} entries per call, use offset to page.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "directory": types.Schema(
+                    type=types.Type.STRING,
+                    description="The directory to list files from, relative to the working directory. If not provided, lists files in the working directory itself.",
+                ),
+                "recursive": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="List subdirectories too. Defaults to false.",
+                ),
+                "max_depth": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="How many directory levels to descend into, 0 lists only the directory itself. Unlimited when recursive is set and this is omitted.",
+                ),
+                "include": types.Schema(
+                    type=types.Type.ARRAY,
+                    description="Optional glob patterns, only matching entries are listed (e.g. '*.py'). Patterns containing '/' match the relative path.",
+                    items=types.Schema(type=types.Type.STRING),
+                ),
+                "exclude": types.Schema(
+                    type=types.Type.ARRAY,
+                    description="Optional glob patterns for entries to skip, excluded directories are not descended into.",
+                    items=types.Schema(type=types.Type.STRING),
+                ),
+                "respect_gitignore": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="Skip entries ignored by .gitignore files. Defaults to true.",
+                ),
+                "offset": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Number of entries to skip, for paging through large listings.",
+                ),
+                "limit": types.Schema(
+                    type=types.Type.INTEGER,
+                    description=f"Maximum number of entries to return, at most {MAX_LIST_ENTRIES}.",
+                ),
+            },
+        ),
+    )
@@ -0,0 +1,120 @@
+import ast
+import os
+
+from config import MAX_CHARS
+from functions.file_cache import file_cache
+from functions.get_files_info import _GitIgnore, _walk
+
+
+def get_outline(working_directory: str, file_path="."):
+    """A tool call function for an AI agent to use
+
+    Lists the classes and functions of a Python file, or of every Python file below a
+    directory, with their line ranges and signatures, so the model can read just the
+    lines it needs with get_file_content. Each file's outline is cached per (path,
+    mtime, size), only files that changed are parsed again.
+    """
+    try:
+        root = os.path.abspath(working_directory)
+        full_path = os.path.abspath(os.path.join(working_directory, file_path))
+
+        # Security check: ensure the path is within the working directory
+        if full_path != root and not full_path.startswith(root + os.sep):
+            return f'Error: Cannot outline "{file_path}" as it is outside the permitted working directory'
+
+        if os.path.isfile(full_path):
+            if not full_path.endswith(".py"):
+                return f'Error: "{file_path}" is not a Python file.'
+            return _file_outline(full_path, os.path.relpath(full_path, root))
+        if not os.path.isdir(full_path):
+            return f'Error: "{file_path}" not found.'
+
+        paths = [
+            relative_path
+            for relative_path, is_dir, _ in _walk(full_path, None, ["*.py"], ["__pycache__"], _GitIgnore())
+            if not is_dir
+        ]
+        if not paths:
+            return f'No Python files found in "{file_path}"'
+
+        blocks = []
+        size = 0
+        for relative_path in paths:
+            path = os.path.join(full_path, relative_path)
+            block = _file_outline(path, os.path.relpath(path, root))
+            if blocks and size + len(block) > MAX_CHARS:
+                blocks.append(
+                    f"[Outline cut off after {len(blocks)} of {len(paths)} files, outline a subdirectory or a single file to see the rest]"
+                )
+                break
+            blocks.append(block)
+            size += len(block)
+        return "\n\n".join(blocks)
+    except OSError as e:
+        return f"Error: An OSError has occurred: {e}"
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def _file_outline(full_path: str, relative_path: str) -> str:
+    cache_key = file_cache.key("outline", full_path)
+    outline = file_cache.get(cache_key)
+    if outline is None:
+        outline = _build_outline(full_path, relative_path.replace(os.sep, "/"))
+        file_cache.put(cache_key, outline)
+    return outline
+
+
+def _build_outline(full_path: str, relative_path: str) -> str:
+    with open(full_path, "rb") as f:
+        source = f.read()
+    line_count = source.count(b"\n") + (1 if source and not source.endswith(b"\n") else 0)
+    header = f"{relative_path} ({line_count} lines)"
+    try:
+        tree = ast.parse(source, filename=relative_path)
+    except SyntaxError as e:
+        return f"{header}\n  SyntaxError at line {e.lineno}: {e.msg}"
+
+    lines = [header]
+    _outline_body(tree.body, "", lines)
+    if len(lines) == 1:
+        lines.append("  (no classes or functions)")
+    return "\n".join(lines)
+
+
+def _outline_body(body: list, prefix: str, lines: list):
+    """Append "start-end  def Class.method(args)" for every class and function, nested ones included"""
+    for node in body:
+        if not isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        name = prefix + node.name
+        # Decorators belong to the definition, include them in its range
+        start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+        decorators = "".join(f"@{ast.unparse(decorator)} " for decorator in node.decorator_list)
+        if isinstance(node, ast.ClassDef):
+            bases = [ast.unparse(base) for base in node.bases] + [ast.unparse(keyword) for keyword in node.keywords]
+            signature = f"class {name}({', '.join(bases)})" if bases else f"class {name}"
+        else:
+            keyword = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+            returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+            signature = f"{keyword} {name}({ast.unparse(node.args)}){returns}"
+        lines.append(f"  {start}-{node.end_lineno}  {decorators}{signature}")
+        _outline_body(node.body, name + ".", lines)
+
+
+def schema_get_outline():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="get_outline",
+        description="Lists the classes and functions of a Python file, or of every Python file below a directory, with their line ranges and signatures, constrained to the working directory. Use it to find a definition, then read only its lines with get_file_content offset/limit instead of the whole file.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(
+                    type=types.Type.STRING,
+                    description="A Python file or a directory, relative to the working directory. Defaults to the working directory itself.",
+                ),
+            },
+        ),
+    )
@@ -0,0 +1,127 @@
+"""Run a Python file under cProfile, and optionally tracemalloc, for run_python_file
+
+Started as `python functions/profile_runner.py REPORT TOP MEMORY FILE [ARGS...]`. FILE
+runs as __main__ with ARGS like `python FILE ARGS` would run it, its output is left
+alone. Afterwards a short report is written to the file REPORT: wall and CPU time, the
+peak traced memory when MEMORY is 1, and the TOP functions by own time.
+
+This module must only import the standard library, it runs in the script's interpreter.
+"""
+
+import os
+import sys
+import time
+
+if not __package__:
+    # Started as a script, sibling modules are importable without the package prefix
+    from python_worker import _run_main
+else:
+    from functions.python_worker import _run_main
+
+# Functions of files in the working directory listed below the table when it does not show them,
+# in short scripts imports tend to fill the table
+TOP_LOCAL_FUNCTIONS = 5
+# Longest function location shown in the report, longer ones keep their end
+MAX_LOCATION_CHARS = 100
+
+# Marks locations in the working directory
+_LOCAL_PREFIX = "./"
+
+# Frames of this runner and of runpy, they are not part of the script
+_OWN_FILES = (os.path.abspath(__file__), os.path.abspath(_run_main.__code__.co_filename))
+
+
+def _main():
+    report_path, top, memory, file_path, *args = sys.argv[1:]
+    file_path = os.path.abspath(file_path)
+    sys.argv = [file_path] + args
+    sys.path[0] = os.path.dirname(file_path)
+
+    import cProfile
+    import tracemalloc
+
+    if memory == "1":
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    profiler.enable()
+    try:
+        code = _run_main(file_path)
+    finally:
+        profiler.disable()
+        wall = time.perf_counter() - wall_started
+        cpu = time.process_time() - cpu_started
+        peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+        tracemalloc.stop()
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+    with open(report_path, "w") as f:
+        f.write(_report(profiler, int(top), wall, cpu, peak))
+    return code
+
+
+def _report(profiler, top: int, wall: float, cpu: float, peak) -> str:
+    import pstats
+
+    summary = f"Wall time {wall:.3f} s, CPU time {cpu:.3f} s"
+    if peak is not None:
+        summary += f", peak traced memory {_format_bytes(peak)}"
+    lines = [summary + " (the profiler slows the script down, compare times between profiled runs only)"]
+
+    stats = pstats.Stats(profiler).stats
+    rows = [
+        (own_time, total_time, calls, _location(key))
+        for key, (_, calls, own_time, total_time, _) in stats.items()
+        if not _is_own(key[0])
+    ]
+    rows.sort(key=lambda row: -row[0])
+    lines.append(f"Top {min(top, len(rows))} of {len(rows)} functions by own time, {sum(row[2] for row in rows)} calls in total:")
+    lines.append(f"{'calls':>10} {'own s':>9} {'total s':>9}  function")
+    for own_time, total_time, calls, location in rows[:top]:
+        lines.append(f"{calls:>10} {own_time:9.4f} {total_time:9.4f}  {location}")
+
+    local_rows = [row for row in rows[top:] if row[3].startswith(_LOCAL_PREFIX)][:TOP_LOCAL_FUNCTIONS]
+    if local_rows:
+        lines.append("Functions in the working directory further down:")
+        for own_time, total_time, calls, location in local_rows:
+            lines.append(f"{calls:>10} {own_time:9.4f} {total_time:9.4f}  {location}")
+    return "\n".join(lines)
+
+
+def _is_own(filename: str) -> bool:
+    return os.path.abspath(filename) in _OWN_FILES or os.path.basename(filename) == "runpy.py"
+
+
+def _location(key: tuple) -> str:
+    filename, line, name = key
+    if filename == "~":
+        # Built-in functions have no file, pstats names them like "<built-in method time.sleep>"
+        return name
+    if filename.startswith("<"):
+        # Code without a file, e.g. "<frozen importlib._bootstrap>" or "<string>"
+        return f"{filename}:{line}({name})"
+    path = os.path.abspath(filename)
+    if path.startswith(os.getcwd() + os.sep):
+        path = _LOCAL_PREFIX + os.path.relpath(path)
+    else:
+        # Outside the working directory, e.g. the standard library: the last two path components are enough
+        path = os.path.join(*path.split(os.sep)[-2:])
+    location = f"{path}:{line}({name})"
+    if len(location) > MAX_LOCATION_CHARS:
+        location = "..." + location[-(MAX_LOCATION_CHARS - 3) :]
+    return location
+
+
+def _format_bytes(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    for unit in ("KB", "MB", "GB"):
+        size /= 1024
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
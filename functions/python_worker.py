@@ -0,0 +1,338 @@
+"""Warm Python interpreters for run_python_file
+
+A worker is a long-lived `python functions/python_worker.py` process that has already
+paid interpreter startup and imported WARM_PRELOAD_MODULES. For every request it forks
+a child, which runs the target file in a fresh __main__ with its own working directory,
+argv and stdio, so nothing leaks between runs. The agent side talks to workers through
+WarmWorkerPool using one JSON object per line on the worker's stdin/stdout.
+
+This module must only import the standard library, it is also the worker's entry point.
+"""
+
+import json
+import os
+import queue
+import selectors
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+if not __package__:
+    # Started as a script, or imported by one such as profile_runner.py: sibling modules are
+    # importable without the package prefix
+    from bounded_output import BoundedOutput, incremental_decoder
+else:
+    from functions.bounded_output import BoundedOutput, incremental_decoder
+
+# How long the agent waits for a worker on top of the script timeout before giving up on it
+WORKER_GRACE_SECONDS = 5
+
+
+class WorkerError(Exception):
+    """The worker process died or stopped responding
+
+    Unless `script_started` is set the request never reached the worker and the caller may
+    fall back to a cold run. Otherwise the script may already have run, or still be running.
+    """
+
+    def __init__(self, message: str, script_started: bool = False):
+        super().__init__(message)
+        self.script_started = script_started
+
+
+class WarmWorker:
+    def __init__(self, python: str = "python", preload=()):
+        self.process = subprocess.Popen(
+            [python, os.path.abspath(__file__), *preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0,
+        )
+        # Bytes read from the worker's stdout that do not form a complete line yet
+        self._pending = b""
+        # The worker reports ready once preloading is done
+        self._read_line(timeout=60)
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(self, file_path: str, args: list, cwd: str, timeout: float, max_output_bytes: int, on_output=None) -> dict:
+        request = {
+            "file": file_path,
+            "args": list(args),
+            "cwd": cwd,
+            "timeout": timeout,
+            "max_output_bytes": max_output_bytes,
+            "live": on_output is not None,
+        }
+        try:
+            self.process.stdin.write((json.dumps(request) + "\n").encode("utf-8"))
+        except OSError as e:
+            raise WorkerError(f"worker is not accepting requests: {e}")
+
+        # Live output arrives as {"stream", "data"} messages before the final result
+        deadline = time.monotonic() + timeout + WORKER_GRACE_SECONDS
+        while True:
+            message = json.loads(self._read_line(deadline - time.monotonic(), script_started=True))
+            if "stream" not in message:
+                return message
+            on_output(message["stream"], message["data"])
+
+    def _read_line(self, timeout: float, script_started: bool = False) -> str:
+        # Read the raw pipe and split lines here: several messages often arrive in one chunk, a
+        # buffered reader would keep the later ones where select() cannot see them
+        deadline = time.monotonic() + timeout
+        fd = self.process.stdout.fileno()
+        with selectors.DefaultSelector() as selector:
+            selector.register(fd, selectors.EVENT_READ)
+            while b"\n" not in self._pending:
+                if not selector.select(max(deadline - time.monotonic(), 0)):
+                    self.close()
+                    raise WorkerError("worker did not respond in time", script_started)
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    self.close()
+                    raise WorkerError("worker exited unexpectedly", script_started)
+                self._pending += chunk
+        line, self._pending = self._pending.split(b"\n", 1)
+        return line.decode("utf-8")
+
+    def close(self):
+        if self.alive():
+            self.process.kill()
+        self.process.wait()
+
+
+class WarmWorkerPool:
+    """A fixed number of warm workers, started lazily and replaced when they die"""
+
+    def __init__(self, size: int, python: str = "python", preload=()):
+        self.size = max(1, size)
+        self.python = python
+        self.preload = list(preload)
+        self._idle = queue.LifoQueue()
+        self._started = 0
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def run(self, file_path: str, args: list, cwd: str, timeout: float, max_output_bytes: int, on_output=None) -> dict:
+        worker = self._acquire()
+        try:
+            return worker.run(file_path, args, cwd, timeout, max_output_bytes, on_output)
+        except WorkerError:
+            worker.close()
+            raise
+        finally:
+            self._release(worker)
+
+    def _acquire(self) -> WarmWorker:
+        with self._lock:
+            if self._idle.empty() and self._started < self.size:
+                self._started += 1
+                spawn = True
+            else:
+                spawn = False
+        if spawn:
+            try:
+                worker = WarmWorker(self.python, self.preload)
+            except Exception:
+                with self._lock:
+                    self._started -= 1
+                raise
+            self._workers.append(worker)
+            return worker
+        return self._idle.get()
+
+    def _release(self, worker: WarmWorker):
+        if worker.alive():
+            self._idle.put(worker)
+            return
+        # Replace dead workers lazily on the next acquire
+        with self._lock:
+            self._started -= 1
+            self._workers.remove(worker)
+
+    def close(self):
+        for worker in list(self._workers):
+            worker.close()
+        self._workers.clear()
+        self._started = 0
+        self._idle = queue.LifoQueue()
+
+
+# The pool used by run_python_file, None means every call starts a cold interpreter
+pool = None
+
+
+def start_pool(size: int, python: str = "python", preload=()) -> WarmWorkerPool:
+    global pool
+    if pool is None:
+        import atexit
+
+        pool = WarmWorkerPool(size, python, preload)
+        atexit.register(pool.close)
+    return pool
+
+
+# File descriptor of the worker's response channel, closed in forked children
+_protocol_fd = None
+
+
+def _serve():
+    """Worker main loop, one JSON request per stdin line and one JSON response per stdout line"""
+    global _protocol_fd
+
+    # Keep the real stdout for responses, anything else printed by the worker goes nowhere
+    _protocol_fd = os.dup(1)
+    protocol = os.fdopen(_protocol_fd, "w", buffering=1)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    for module in sys.argv[1:]:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+    protocol.write(json.dumps({"ready": True}) + "\n")
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        protocol.write(json.dumps(_run_request(request, protocol)) + "\n")
+
+
+def _run_request(request: dict, protocol) -> dict:
+    stdout_read, stdout_write = os.pipe()
+    stderr_read, stderr_write = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    pid = os.fork()
+    if pid == 0:
+        os.close(stdout_read)
+        os.close(stderr_read)
+        _run_child(request, stdout_write, stderr_write)
+
+    os.close(stdout_write)
+    os.close(stderr_write)
+
+    output = {
+        stdout_read: BoundedOutput(request["max_output_bytes"]),
+        stderr_read: BoundedOutput(request["max_output_bytes"]),
+    }
+    names = {stdout_read: "stdout", stderr_read: "stderr"}
+    decoders = {stdout_read: incremental_decoder(), stderr_read: incremental_decoder()}
+    deadline = time.monotonic() + request["timeout"]
+    timed_out = False
+    with selectors.DefaultSelector() as selector:
+        for fd in output:
+            selector.register(fd, selectors.EVENT_READ)
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            for key, _ in selector.select(remaining):
+                data = os.read(key.fd, 65536)
+                if data:
+                    output[key.fd].write(data)
+                    if request["live"]:
+                        text = decoders[key.fd].decode(data)
+                        if text:
+                            protocol.write(json.dumps({"stream": names[key.fd], "data": text}) + "\n")
+                else:
+                    selector.unregister(key.fd)
+
+    # The child may keep running after closing its output, the deadline still applies
+    status = None
+    while not timed_out:
+        waited, status = os.waitpid(pid, os.WNOHANG)
+        if waited:
+            break
+        if time.monotonic() >= deadline:
+            timed_out = True
+        else:
+            time.sleep(0.001)
+
+    if timed_out:
+        # The child leads its own process group, take down anything it started too
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            pass
+        _, status = os.waitpid(pid, 0)
+    os.close(stdout_read)
+    os.close(stderr_read)
+
+    return {
+        "stdout": output[stdout_read].getvalue(),
+        "stderr": output[stderr_read].getvalue(),
+        "returncode": os.waitstatus_to_exitcode(status),
+        "timed_out": timed_out,
+    }
+
+
+def _run_child(request: dict, stdout_fd: int, stderr_fd: int):
+    """Runs in the forked child and never returns"""
+    code = 1
+    try:
+        os.setsid()
+        if _protocol_fd is not None:
+            os.close(_protocol_fd)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        for fd in (devnull, stdout_fd, stderr_fd):
+            os.close(fd)
+
+        sys.stdin = open(0, "r", closefd=False)
+        sys.stdout = open(1, "w", closefd=False)
+        sys.stderr = open(2, "w", closefd=False, buffering=1)
+
+        file_path = request["file"]
+        os.chdir(request["cwd"])
+        sys.argv = [file_path] + request["args"]
+        sys.path[0] = os.path.dirname(file_path)
+        code = _run_main(file_path)
+    except BaseException:
+        import traceback
+
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def _run_main(file_path: str) -> int:
+    """Run `file_path` as __main__ and return its exit code, like `python file_path` would"""
+    import runpy
+    import traceback
+
+    try:
+        runpy.run_path(file_path, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException as e:
+        # Hide the worker and runpy frames so the traceback looks like a normal run
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != file_path:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb or e.__traceback__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    _serve()
@@ -0,0 +1,233 @@
+import ast
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+from config import (
+    RUN_CACHE_ENABLED,
+    RUN_CACHE_MAX_AGE_SECONDS,
+    RUN_CACHE_MAX_ENTRIES,
+    RUN_CACHE_PATH,
+    RUN_CACHE_SAVE_SECONDS,
+)
+
+
+class RunCache:
+    """Persistent cache of run_python_file results
+
+    A result is keyed on the content hash of the target file and of every local module
+    it imports (found by following import statements with ast), plus the arguments.
+    As long as none of those files change, running the same command again returns the
+    stored output immediately. Entries are saved to RUN_CACHE_PATH so they survive
+    across sessions, and expire after `max_age` seconds: a script may also depend on data
+    files, the environment or the time, which the key does not cover. Only successful runs
+    should be stored, a failure may be flaky.
+    """
+
+    def __init__(
+        self,
+        path: str = RUN_CACHE_PATH,
+        max_entries: int = RUN_CACHE_MAX_ENTRIES,
+        enabled: bool = RUN_CACHE_ENABLED,
+        max_age: float = RUN_CACHE_MAX_AGE_SECONDS,
+        save_interval: float = RUN_CACHE_SAVE_SECONDS,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.max_age = max_age
+        self.save_interval = save_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        # Unsaved changes and when they were last written, see _save_soon
+        self._dirty = False
+        self._saved_at = 0.0
+        self._flush_registered = False
+        self._lock = threading.RLock()
+        # (path, mtime, size) -> content hash / imported module names, to avoid rereading unchanged files
+        self._hashes = {}
+        self._imports = {}
+
+    def key(self, full_path: str, args: list, working_directory: str, extra=()):
+        """Return (cache key, dependency paths) for running `full_path` with `args`"""
+        root = os.path.abspath(working_directory)
+        dependencies = sorted(self._dependencies(full_path, root))
+        digest = hashlib.sha256()
+        digest.update(json.dumps([sys.version, os.path.relpath(full_path, root), list(args), list(extra)]).encode())
+        for path in dependencies:
+            digest.update(os.path.relpath(path, root).encode())
+            digest.update(self._hash(path).encode())
+        return digest.hexdigest(), dependencies
+
+    def get(self, key: str):
+        with self._lock:
+            entries = self._load()
+            entry = entries.pop(key, None)
+            if entry is None or time.time() - entry.get("time", 0) > self.max_age:
+                if entry is not None:
+                    self._dirty = True
+                self.misses += 1
+                return None
+            # Re-insert to keep the dict in least recently used order
+            entries[key] = entry
+            self.hits += 1
+            return entry["result"]
+
+    def put(self, key: str, result: str, dependencies: list):
+        with self._lock:
+            entries = self._load()
+            entries.pop(key, None)
+            entries[key] = {"result": result, "dependencies": dependencies, "time": time.time()}
+            while len(entries) > self.max_entries:
+                del entries[next(iter(entries))]
+            self._save_soon()
+
+    def invalidate(self, path: str):
+        """Drop every result that depends on `path`"""
+        path = os.path.abspath(path)
+        with self._lock:
+            entries = self._load()
+            stale = [key for key, entry in entries.items() if path in entry["dependencies"]]
+            for key in stale:
+                del entries[key]
+            if stale:
+                self._save_soon()
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._save()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._load()),
+        }
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            try:
+                with open(self.path, "r") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def flush(self):
+        """Write unsaved changes to RUN_CACHE_PATH"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _save_soon(self):
+        # Rewriting the whole file for every result is wasteful, save at most every save_interval
+        # seconds and once more when the process exits
+        self._dirty = True
+        if not self._flush_registered:
+            import atexit
+
+            atexit.register(self.flush)
+            self._flush_registered = True
+        if time.monotonic() - self._saved_at >= self.save_interval:
+            self._save()
+
+    def _save(self):
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Written next to the file and renamed over it, readers never see a partial file
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self._entries, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            # The cache still works in memory if it cannot be persisted
+            pass
+
+    def _stat_key(self, path: str):
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    def _hash(self, path: str) -> str:
+        stat_key = self._stat_key(path)
+        content_hash = self._hashes.get(stat_key)
+        if content_hash is None:
+            with open(path, "rb") as f:
+                content_hash = hashlib.sha256(f.read()).hexdigest()
+            self._hashes[stat_key] = content_hash
+        return content_hash
+
+    def _dependencies(self, full_path: str, root: str) -> set:
+        """The target file plus every module inside `root` it imports, directly or not"""
+        # Scripts run with their own directory as sys.path[0], that is where absolute imports resolve
+        search_root = os.path.dirname(full_path)
+        found = set()
+        pending = [full_path]
+        while pending:
+            path = pending.pop()
+            if path in found:
+                continue
+            found.add(path)
+            for module, level in self._module_imports(path):
+                base = search_root if level == 0 else _parent_package(path, level)
+                for candidate in _module_files(base, module):
+                    if candidate.startswith(root + os.sep) and candidate not in found:
+                        pending.append(candidate)
+        return found
+
+    def _module_imports(self, path: str) -> list:
+        stat_key = self._stat_key(path)
+        imports = self._imports.get(stat_key)
+        if imports is None:
+            imports = []
+            try:
+                with open(path, "rb") as f:
+                    tree = ast.parse(f.read(), filename=path)
+            except (SyntaxError, ValueError):
+                tree = None
+            for node in ast.walk(tree) if tree else ():
+                if isinstance(node, ast.Import):
+                    imports.extend((alias.name, 0) for alias in node.names)
+                elif isinstance(node, ast.ImportFrom):
+                    module = node.module or ""
+                    imports.append((module, node.level))
+                    # `from pkg import name` may import the submodule pkg/name.py
+                    imports.extend((f"{module}.{alias.name}" if module else alias.name, node.level) for alias in node.names)
+            self._imports[stat_key] = imports
+        return imports
+
+
+def _parent_package(path: str, level: int) -> str:
+    directory = os.path.dirname(path)
+    for _ in range(level - 1):
+        directory = os.path.dirname(directory)
+    return directory
+
+
+def _module_files(base: str, module: str) -> list:
+    """Files that importing `module` relative to `base` would execute"""
+    files = []
+    directory = base
+    parts = [part for part in module.split(".") if part]
+    for index, part in enumerate(parts):
+        package_init = os.path.join(directory, part, "__init__.py")
+        if os.path.isfile(package_init):
+            files.append(package_init)
+        if index == len(parts) - 1:
+            module_file = os.path.join(directory, part + ".py")
+            if os.path.isfile(module_file):
+                files.append(module_file)
+        directory = os.path.join(directory, part)
+    return files
+
+
+# Shared by all run_python_file calls in the process
+run_cache = RunCache()
@@ -1,75 +1,230 @@
+import asyncio
 import os
+import signal
 import subprocess
+import tempfile
 
-from google.genai.models import types
+from config import MAX_RUN_TIMEOUT_SECONDS, PROFILE_TOP_FUNCTIONS, RUN_OUTPUT_MAX_BYTES, RUN_TIMEOUT_SECONDS
+from functions import python_worker
+from functions.bounded_output import BoundedOutput, incremental_decoder
+from functions.code_index import code_indexes
+from functions.file_cache import file_cache
+from functions.run_cache import run_cache
 
-def run_python_file(working_directory: str, file_path: str, args=[]):
-    """A tool call function for an AI agent to use"""
+# Runs a script under cProfile and writes a report, see functions/profile_runner.py
+PROFILE_RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profile_runner.py")
+
+# Called with (stream name, text) while a script runs, e.g. to show its output live in the REPL
+output_listener = None
+
+
+def run_python_file(working_directory: str, file_path: str, args=[], timeout=None, max_output_bytes=RUN_OUTPUT_MAX_BYTES, on_output=None, use_cache=True, profile=False, profile_memory=False):
+    """A tool call function for an AI agent to use
+
+    Only the first and last `max_output_bytes` / 2 bytes of each stream are kept. Unless
+    `use_cache` is false, the result of a previous identical run is returned when neither
+    the file nor the local modules it imports have changed. With `profile` the script runs
+    under cProfile, `profile_memory` adds tracemalloc, and a report of the time, the peak
+    memory and the PROFILE_TOP_FUNCTIONS hottest functions follows the output. Profiled
+    runs are never cached.
+    """
     try:
         # Get the absolute path of the file
         full_path = os.path.abspath(os.path.join(working_directory, file_path))
-        
+
         # Check if file is outside working directory
         if not full_path.startswith(os.path.abspath(working_directory)):
             return f'Error: Cannot execute "{file_path}" as it is outside the permitted working directory'
-        
+
         # Check if file exists
         if not os.path.exists(full_path):
             return f'Error: File "{file_path}" not found.'
-        
+
         # Check if file is a Python file
         if not full_path.endswith(".py"):
             return f'Error: "{file_path}" is not a Python file.'
-        
-        # Execute the Python file
-        completed_process = subprocess.run(
-            ["python", full_path] + args,
-            cwd=working_directory,
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        
-        # Format the output
-        output_parts = []
-        
-        if completed_process.stdout:
-            output_parts.append(f"STDOUT:\n{completed_process.stdout}")
-        
-        if completed_process.stderr:
-            output_parts.append(f"STDERR:\n{completed_process.stderr}")
-        
-        if completed_process.returncode != 0:
-            output_parts.append(f"Process exited with code {completed_process.returncode}")
-        
-        # Return formatted output or default message
-        if output_parts:
-            return "\n".join(output_parts)
+
+        timeout = RUN_TIMEOUT_SECONDS if timeout is None else min(max(float(timeout), 1), MAX_RUN_TIMEOUT_SECONDS)
+        on_output = on_output or output_listener
+        profile = bool(profile or profile_memory)
+
+        # Reuse the previous result when nothing the script depends on has changed
+        cache_key = None
+        if use_cache and run_cache.enabled and not profile:
+            cache_key, dependencies = run_cache.key(full_path, args, working_directory, (max_output_bytes,))
+            cached_output = run_cache.get(cache_key)
+            if cached_output is not None:
+                return (
+                    "[Cached result: neither this file nor the local modules it imports changed since it last ran "
+                    "with these arguments. Call again with use_cache=false to force a new run.]\n" + cached_output
+                )
+
+        # Execute the Python file, in a warm worker when the pool is enabled
+        report = None
+        if profile:
+            stdout, stderr, returncode, report = _run_profiled(
+                full_path, args, working_directory, timeout, max_output_bytes, bool(profile_memory), on_output
+            )
+        elif python_worker.pool is not None:
+            stdout, stderr, returncode = _run_warm(full_path, args, working_directory, timeout, max_output_bytes, on_output)
         else:
-            return "No output produced."
-    
-    except subprocess.TimeoutExpired:
-        return "Error: executing Python file: Process timed out after 30 seconds"
+            stdout, stderr, returncode = _run_cold(full_path, args, working_directory, timeout, max_output_bytes, on_output)
+
+        # The script may have created, changed or resized files, cached listings and search indexes could be stale
+        file_cache.invalidate_kind("listing")
+        code_indexes.invalidate_all()
+
+        output = _format_output(stdout, stderr, returncode) or "No output produced."
+        if report:
+            output += f"\nPROFILE:\n{report}"
+        # A failure may be flaky or depend on something outside the key, always run it again
+        if cache_key and returncode == 0:
+            run_cache.put(cache_key, output, dependencies)
+        return output
+
+    except subprocess.TimeoutExpired as e:
+        file_cache.invalidate_kind("listing")
+        code_indexes.invalidate_all()
+        message = f"Error: executing Python file: Process timed out after {e.timeout:g} seconds"
+        partial_output = _format_output(e.output, e.stderr, 0)
+        if partial_output:
+            message += f"\nOutput before the timeout:\n{partial_output}"
+        return message
+    except python_worker.WorkerError as e:
+        # Only raised once the script may have run, it could have changed files
+        file_cache.invalidate_kind("listing")
+        code_indexes.invalidate_all()
+        return f"Error: executing Python file: the warm worker failed while running it ({e}), it was not run again"
     except Exception as e:
         return f"Error: executing Python file: {e}"
 
 
-schema_run_python_file = types.FunctionDeclaration(
-    name="run_python_file",
-    description="Executes a Python file with optional command-line arguments, constrained to the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="The path to the Python file to execute, relative to the working directory.",
-            ),
-            "args": types.Schema(
-                type=types.Type.ARRAY,
-                description="Optional command-line arguments to pass to the Python file.",
-                items=types.Schema(type=types.Type.STRING),
-            ),
-        },
-        required=["file_path"],
-    ),
-)
+def _format_output(stdout: str, stderr: str, returncode: int) -> str:
+    output_parts = []
+
+    if stdout:
+        output_parts.append(f"STDOUT:\n{stdout}")
+
+    if stderr:
+        output_parts.append(f"STDERR:\n{stderr}")
+
+    if returncode != 0:
+        output_parts.append(f"Process exited with code {returncode}")
+
+    return "\n".join(output_parts)
+
+
+def _run_cold(full_path: str, args: list, working_directory: str, timeout: float, max_output_bytes: int, on_output=None):
+    return asyncio.run(_run_subprocess(["python", full_path] + list(args), working_directory, timeout, max_output_bytes, on_output))
+
+
+async def _run_subprocess(command: list, cwd: str, timeout: float, max_output_bytes: int, on_output=None):
+    """Run `command`, streaming its output into bounded buffers, and return (stdout, stderr, returncode)"""
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    stdout = BoundedOutput(max_output_bytes)
+    stderr = BoundedOutput(max_output_bytes)
+
+    async def pump(stream, buffer, name):
+        decoder = incremental_decoder()
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                break
+            buffer.write(chunk)
+            if on_output:
+                text = decoder.decode(chunk)
+                if text:
+                    on_output(name, text)
+
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(pump(process.stdout, stdout, "stdout"), pump(process.stderr, stderr, "stderr"), process.wait()),
+            timeout,
+        )
+    except asyncio.TimeoutError:
+        # The script leads its own process group, take down anything it started too
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await process.wait()
+        raise subprocess.TimeoutExpired(command, timeout, output=stdout.getvalue(), stderr=stderr.getvalue())
+
+    return stdout.getvalue(), stderr.getvalue(), process.returncode
+
+
+def _run_profiled(full_path: str, args: list, working_directory: str, timeout: float, max_output_bytes: int, memory: bool, on_output=None):
+    """Like _run_cold under profile_runner.py, returns (stdout, stderr, returncode, report or None)"""
+    descriptor, report_path = tempfile.mkstemp(prefix="run-profile-", suffix=".txt")
+    os.close(descriptor)
+    try:
+        command = ["python", PROFILE_RUNNER, report_path, str(PROFILE_TOP_FUNCTIONS), "1" if memory else "0", full_path] + list(args)
+        stdout, stderr, returncode = asyncio.run(_run_subprocess(command, working_directory, timeout, max_output_bytes, on_output))
+        with open(report_path, "r") as f:
+            # Empty if the script ended the interpreter without unwinding, e.g. with os._exit
+            report = f.read()
+        return stdout, stderr, returncode, report or None
+    finally:
+        os.remove(report_path)
+
+
+def _run_warm(full_path: str, args: list, working_directory: str, timeout: float, max_output_bytes: int, on_output=None):
+    try:
+        result = python_worker.pool.run(full_path, args, os.path.abspath(working_directory), timeout, max_output_bytes, on_output)
+    except python_worker.WorkerError as e:
+        if e.script_started:
+            # The script may already have run, running it again could repeat its side effects
+            raise
+        # A worker that never got the request should not fail the call, a cold interpreter still works
+        return _run_cold(full_path, args, working_directory, timeout, max_output_bytes, on_output)
+
+    if result["timed_out"]:
+        raise subprocess.TimeoutExpired(full_path, timeout, output=result["stdout"], stderr=result["stderr"])
+    return result["stdout"], result["stderr"], result["returncode"]
+
+
+def schema_run_python_file():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="run_python_file",
+        description="Executes a Python file with optional command-line arguments, constrained to the working directory. Long output is cut in the middle, keeping its beginning and end.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(
+                    type=types.Type.STRING,
+                    description="The path to the Python file to execute, relative to the working directory.",
+                ),
+                "args": types.Schema(
+                    type=types.Type.ARRAY,
+                    description="Optional command-line arguments to pass to the Python file.",
+                    items=types.Schema(type=types.Type.STRING),
+                ),
+                "timeout": types.Schema(
+                    type=types.Type.INTEGER,
+                    description=f"Optional timeout in seconds, defaults to {RUN_TIMEOUT_SECONDS} and is capped at {MAX_RUN_TIMEOUT_SECONDS}.",
+                ),
+                "use_cache": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="Return the previous result if the file, the local modules it imports and the arguments are unchanged. Defaults to true, set to false when the script depends on other state such as data files or time.",
+                ),
+                "profile": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description=f"Run under cProfile and append wall and CPU time and the {PROFILE_TOP_FUNCTIONS} functions with the most own time. Use it before and after optimizing code. Profiled runs are not cached.",
+                ),
+                "profile_memory": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="Also trace memory allocations with tracemalloc and report the peak. Implies profile, and slows the script down further.",
+                ),
+            },
+            required=["file_path"],
+        ),
+    )
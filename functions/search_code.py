@@ -0,0 +1,162 @@
+import os
+import re
+
+from config import MAX_CHARS, SEARCH_CONTEXT_LINES, SEARCH_MAX_RESULTS
+from functions.code_index import code_indexes, required_literals
+from functions.get_files_info import _as_patterns, _matches
+
+# Matching lines longer than this are cut, e.g. minified files
+MAX_LINE_CHARS = 200
+
+
+def search_code(
+    working_directory: str,
+    query: str,
+    regex=False,
+    ignore_case=False,
+    directory=None,
+    include=None,
+    context_lines=SEARCH_CONTEXT_LINES,
+    max_results=SEARCH_MAX_RESULTS,
+):
+    """A tool call function for an AI agent to use
+
+    Finds the lines matching a literal string or regular expression in the text files
+    below the working directory. A trigram index of the tree (see functions.code_index)
+    narrows the search down to the files that can contain a match, only those are read.
+    """
+    try:
+        root = os.path.abspath(working_directory)
+        search_root = os.path.abspath(os.path.join(working_directory, directory or "."))
+
+        # Security check: ensure the directory is within the working directory
+        if search_root != root and not search_root.startswith(root + os.sep):
+            return f'Error: Cannot search "{directory}" as it is outside the permitted working directory'
+        if not os.path.isdir(search_root):
+            return f'Error: "{directory}" is not a directory'
+        if not query:
+            return "Error: query must not be empty"
+
+        try:
+            # MULTILINE so ^ and $ in the whole-file check below match at every line, as they do per line
+            flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+            matcher = re.compile(query if regex else re.escape(query), flags)
+        except re.error as e:
+            return f"Error: Invalid regular expression: {e}"
+        context_lines = min(max(int(context_lines), 0), 10)
+        max_results = min(max(int(max_results), 1), SEARCH_MAX_RESULTS)
+        include = _as_patterns(include)
+
+        index = code_indexes.get(root)
+        index.refresh()
+        prefix = search_root + os.sep
+
+        blocks = []
+        matches = 0
+        size = 0
+        truncated = False
+        for full_path in index.candidates(required_literals(query, regex)):
+            if not full_path.startswith(prefix):
+                continue
+            relative_path = os.path.relpath(full_path, root).replace(os.sep, "/")
+            if include and not _matches(relative_path, os.path.basename(full_path), include):
+                continue
+            try:
+                with open(full_path, "r", encoding="utf-8", errors="replace") as f:
+                    text = f.read()
+            except OSError:
+                continue
+            # The index only rules files out, most candidates of a rare query do match
+            if not matcher.search(text):
+                continue
+
+            lines = text.splitlines()
+            hits = [number for number, line in enumerate(lines) if matcher.search(line)]
+            if not hits:
+                # The pattern only matches across lines
+                continue
+            if matches + len(hits) > max_results:
+                hits = hits[: max_results - matches]
+                truncated = True
+            block = _format_hits(relative_path, lines, hits, context_lines)
+            if blocks and size + len(block) > MAX_CHARS:
+                truncated = True
+                break
+            blocks.append(block)
+            matches += len(hits)
+            size += len(block)
+            if truncated:
+                break
+
+        if not blocks:
+            return f'No matches for "{query}" ({len(index)} files indexed)'
+        summary = f'Found {matches} matches for "{query}" in {len(blocks)} files ({len(index)} files indexed)'
+        if truncated:
+            summary += ". Results were cut off, narrow the query or use directory/include to see the rest"
+        return summary + ":\n\n" + "\n\n".join(blocks)
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def _format_hits(relative_path: str, lines: list, hits: list, context_lines: int) -> str:
+    """grep-style block: "12: match" for matching lines, "11- text" for context, "--" between gaps"""
+    hit_set = set(hits)
+    output = [relative_path]
+    last = None
+    for hit in hits:
+        start = max(hit - context_lines, 0 if last is None else last + 1)
+        if last is not None and start > last + 1:
+            output.append("--")
+        for number in range(start, min(hit + context_lines, len(lines) - 1) + 1):
+            if last is not None and number <= last:
+                continue
+            line = lines[number]
+            if len(line) > MAX_LINE_CHARS:
+                line = line[:MAX_LINE_CHARS] + "..."
+            output.append(f"{number + 1}{':' if number in hit_set else '-'} {line}")
+            last = number
+    return "\n".join(output)
+
+
+def schema_search_code():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="search_code",
+        description=f"Searches the text files below the working directory for a literal string or a regular expression and returns the matching lines as file, line number and text, with surrounding lines. Much faster than listing and reading files to find where something is defined or used. Skips files ignored by .gitignore and returns at most {SEARCH_MAX_RESULTS} matches per call.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "query": types.Schema(
+                    type=types.Type.STRING,
+                    description="The text to find, or a Python regular expression when regex is true. Matched against one line at a time.",
+                ),
+                "regex": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="Treat the query as a regular expression. Defaults to false.",
+                ),
+                "ignore_case": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="Match regardless of case. Defaults to false.",
+                ),
+                "directory": types.Schema(
+                    type=types.Type.STRING,
+                    description="Only search below this directory, relative to the working directory.",
+                ),
+                "include": types.Schema(
+                    type=types.Type.ARRAY,
+                    description="Optional glob patterns, only matching files are searched (e.g. '*.py'). Patterns containing '/' match the relative path.",
+                    items=types.Schema(type=types.Type.STRING),
+                ),
+                "context_lines": types.Schema(
+                    type=types.Type.INTEGER,
+                    description=f"Lines shown before and after each match, defaults to {SEARCH_CONTEXT_LINES}.",
+                ),
+                "max_results": types.Schema(
+                    type=types.Type.INTEGER,
+                    description=f"Maximum number of matching lines returned, defaults to and is capped at {SEARCH_MAX_RESULTS}.",
+                ),
+            },
+            required=["query"],
+        ),
+    )
@@ -1,6 +1,13 @@
 import os
+import tempfile
 
-from google.genai.models import types
+from functions.code_index import code_indexes
+from functions.file_cache import file_cache
+from functions.run_cache import run_cache
+
+# Read once at import, os.umask can only be read by setting it, which is not thread-safe later on
+_UMASK = os.umask(0)
+os.umask(_UMASK)
 
 def write_file(working_directory: str, file_path: str, content: str):
     """A tool call function for an AI agent to use"""
@@ -18,8 +25,12 @@ def write_file(working_directory: str, file_path: str, content: str):
                 os.makedirs(dir_name, exist_ok=True)
         
         # Write the content to the file
-        with open(full_path, "w") as f:
-            f.write(content)
+        atomic_write(full_path, content)
+        
+        # Make sure cached reads, listings, script results and the search index never serve the old content
+        file_cache.invalidate(full_path)
+        run_cache.invalidate(full_path)
+        code_indexes.invalidate(full_path)
         
         return f'Successfully wrote to "{file_path}" ({len(content)} characters written)'
         
@@ -29,21 +40,45 @@ def write_file(working_directory: str, file_path: str, content: str):
         return f"Error: {e}"
 
 
-schema_write_file = types.FunctionDeclaration(
-    name="write_file",
-    description="Writes or overwrites content to a specified file, constrained to the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="The path to the file to write, relative to the working directory.",
-            ),
-            "content": types.Schema(
-                type=types.Type.STRING,
-                description="The content to write to the file.",
-            ),
-        },
-        required=["file_path", "content"],
-    ),
-)
+def atomic_write(full_path: str, content: str):
+    """Replace the file in one step, readers see either the old or the new content, never a partial write"""
+    directory = os.path.dirname(full_path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(full_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        if os.path.exists(full_path):
+            os.chmod(temp_path, os.stat(full_path).st_mode & 0o7777)
+        else:
+            # mkstemp creates files readable by the owner only, use the usual umask-based mode instead
+            os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, full_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def schema_write_file():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="write_file",
+        description="Writes or overwrites content to a specified file, constrained to the working directory.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(
+                    type=types.Type.STRING,
+                    description="The path to the file to write, relative to the working directory.",
+                ),
+                "content": types.Schema(
+                    type=types.Type.STRING,
+                    description="The content to write to the file.",
+                ),
+            },
+            required=["file_path", "content"],
+        ),
+    )
@@ -0,0 +1,210 @@
+import json
+from typing import TYPE_CHECKING
+
+from config import (
+    CHARS_PER_TOKEN,
+    HISTORY_KEEP_RECENT_TURNS,
+    HISTORY_STUB_MIN_CHARS,
+    HISTORY_TOKEN_BUDGET,
+)
+from functions.file_cache import file_cache
+
+# Messages only exist once the genai SDK is loaded, importing it here would slow down CLI startup
+if TYPE_CHECKING:
+    from google.genai import types
+
+# Range the calibrated ratio between real and estimated tokens is kept in
+MIN_TOKEN_SCALE = 0.25
+MAX_TOKEN_SCALE = 4.0
+# Smallest change of the estimated history size between two requests that is used for calibration
+MIN_CALIBRATION_TOKENS = 50
+
+# Tools whose output can simply be fetched again after it has been compacted away
+REFETCHABLE_FUNCTIONS = {"get_files_info", "get_file_content", "get_files_content", "search_code", "get_outline"}
+
+
+class HistoryManager:
+    """Keeps a conversation within a token budget by compacting old tool outputs.
+
+    Token counts are estimated locally per message and calibrated against the
+    `prompt_token_count` reported by the API whenever `record_usage` is called. The
+    reported count also includes the system prompt and the tool declarations, so the
+    scale is learned from how much it changes between two requests, not from its size.
+    When the budget is exceeded, large function responses outside the most recent
+    turns are replaced with short stubs, and if that is not enough, the oldest
+    turns are dropped entirely.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        keep_recent_turns: int = HISTORY_KEEP_RECENT_TURNS,
+        stub_min_chars: int = HISTORY_STUB_MIN_CHARS,
+    ):
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.stub_min_chars = stub_min_chars
+        # Ratio between real prompt tokens and the local estimate, learned from usage_metadata
+        self.scale = 1.0
+        # (unscaled estimate of the history, prompt_token_count) of the last recorded request
+        self._last_usage = None
+        self._estimates = {}
+
+    def estimate_tokens(self, content: "types.Content") -> int:
+        """Estimate the number of tokens in one message"""
+        return round(self._unscaled_tokens(content) * self.scale)
+
+    def _unscaled_tokens(self, content: "types.Content") -> int:
+        cached = self._estimates.get(id(content))
+        if cached is not None and cached[0] is content:
+            return cached[1]
+
+        chars = 0
+        for part in content.parts or []:
+            if part.text:
+                chars += len(part.text)
+            elif part.function_call:
+                chars += len(part.function_call.name or "") + len(_to_json(part.function_call.args))
+            elif part.function_response:
+                chars += len(part.function_response.name or "") + len(_to_json(part.function_response.response))
+        tokens = max(1, chars // CHARS_PER_TOKEN)
+
+        # Keep a reference to the message so a recycled id() never matches a stale entry
+        self._estimates[id(content)] = (content, tokens)
+        return tokens
+
+    def token_counts(self, messages: list) -> list:
+        """Return the estimated token count of each message"""
+        return [self.estimate_tokens(content) for content in messages]
+
+    def total_tokens(self, messages: list) -> int:
+        return sum(self.token_counts(messages))
+
+    def record_usage(self, messages: list, usage_metadata):
+        """Calibrate the estimator with the prompt token count of a request that sent `messages`"""
+        if not usage_metadata or not usage_metadata.prompt_token_count or not messages:
+            return
+        estimated = sum(self._unscaled_tokens(content) for content in messages)
+        prompt_tokens = usage_metadata.prompt_token_count
+        if self._last_usage is not None:
+            # The system prompt and tool declarations are in both counts and cancel out
+            last_estimated, last_prompt_tokens = self._last_usage
+            if abs(estimated - last_estimated) >= MIN_CALIBRATION_TOKENS:
+                scale = (prompt_tokens - last_prompt_tokens) / (estimated - last_estimated)
+                self.scale = min(max(scale, MIN_TOKEN_SCALE), MAX_TOKEN_SCALE)
+        self._last_usage = (estimated, prompt_tokens)
+
+    def compact(self, messages: list, force: bool = False) -> dict:
+        """Compact `messages` in place when over budget (or always when `force` is set)
+
+        Returns a summary with the number of stubbed outputs, dropped turns and token totals.
+        """
+        report = {"stubbed": 0, "dropped_turns": 0, "tokens_before": self.total_tokens(messages)}
+        report["tokens_after"] = report["tokens_before"]
+
+        over_budget = self.token_budget and report["tokens_before"] > self.token_budget
+        if not (force or over_budget):
+            self._forget_missing(messages)
+            return report
+
+        turn_starts = _turn_starts(messages)
+        if len(turn_starts) <= self.keep_recent_turns:
+            return report
+        protected_from = turn_starts[-self.keep_recent_turns] if self.keep_recent_turns else len(messages)
+        from google.genai import types
+
+        # First pass: replace large tool outputs in old turns with stubs, oldest first
+        calls = _pending_calls(messages)
+        for index in range(protected_from):
+            content = messages[index]
+            if not content.parts or not any(part.function_response for part in content.parts):
+                continue
+
+            new_parts = []
+            changed = False
+            for part in content.parts:
+                function_response = part.function_response
+                function_call = calls.get((index, id(part)))
+                if function_response and _response_size(function_response) >= self.stub_min_chars:
+                    new_parts.append(
+                        types.Part.from_function_response(
+                            name=function_response.name,
+                            response={"result": _stub_text(function_response.name, function_call)},
+                        )
+                    )
+                    report["stubbed"] += 1
+                    changed = True
+                else:
+                    new_parts.append(part)
+
+            if changed:
+                messages[index] = types.Content(role=content.role, parts=new_parts)
+                if not force and self.total_tokens(messages) <= self.token_budget:
+                    break
+
+        # Second pass: drop whole turns from the start until we fit in the budget
+        if self.token_budget:
+            while self.total_tokens(messages) > self.token_budget:
+                turn_starts = _turn_starts(messages)
+                if len(turn_starts) <= max(self.keep_recent_turns, 1):
+                    break
+                del messages[: turn_starts[1]]
+                report["dropped_turns"] += 1
+
+        # Outputs the model no longer sees must be returned in full if it reads them again
+        if report["stubbed"] or report["dropped_turns"]:
+            file_cache.forget_served()
+
+        self._forget_missing(messages)
+        report["tokens_after"] = self.total_tokens(messages)
+        return report
+
+    def _forget_missing(self, messages: list):
+        """Drop cached estimates for messages that are no longer in the conversation"""
+        alive = {id(content) for content in messages}
+        for key in [key for key in self._estimates if key not in alive]:
+            del self._estimates[key]
+
+
+def _to_json(value) -> str:
+    try:
+        return json.dumps(value, default=str)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _response_size(function_response) -> int:
+    return len(_to_json(function_response.response))
+
+
+def _is_user_text(content: "types.Content") -> bool:
+    return content.role == "user" and bool(content.parts) and any(part.text for part in content.parts)
+
+
+def _turn_starts(messages: list) -> list:
+    """Indexes of the user text messages that start each turn"""
+    return [index for index, content in enumerate(messages) if _is_user_text(content)]
+
+
+def _pending_calls(messages: list) -> dict:
+    """Map each function response part to the function call that produced it"""
+    pending = []
+    matches = {}
+    for index, content in enumerate(messages):
+        for part in content.parts or []:
+            if part.function_call:
+                pending.append(part.function_call)
+            elif part.function_response:
+                for position, function_call in enumerate(pending):
+                    if function_call.name == part.function_response.name:
+                        matches[(index, id(part))] = pending.pop(position)
+                        break
+    return matches
+
+
+def _stub_text(name: str, function_call) -> str:
+    args = dict(function_call.args or {}) if function_call else {}
+    call = f"{name}({', '.join(f'{key}={value!r}' for key, value in args.items())})"
+    if name in REFETCHABLE_FUNCTIONS:
+        return f"[Output of {call} removed to save context. Call {name} again if you need it.]"
+    return f"[Output of {call} removed to save context.]"
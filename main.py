@@ -1,14 +1,33 @@
 import argparse
-import os
 import sys
-
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-from functions.get_files_info import schema_get_files_info, get_files_info
-from functions.get_file_content import schema_get_file_content, get_file_content
-from functions.run_python_file import schema_run_python_file, run_python_file
-from functions.write_file import schema_write_file, write_file
+import time
+from typing import TYPE_CHECKING
+
+from config import (
+    BATCH_PARALLELISM,
+    HISTORY_TOKEN_BUDGET,
+    MAX_PARALLEL_TOOL_CALLS,
+    MODEL_NAME,
+    MODEL_REQUESTS_PER_MINUTE,
+    SERVER_ALLOWED_ROOTS,
+    USE_WARM_WORKERS,
+    WARM_PRELOAD_MODULES,
+    WARM_WORKER_POOL_SIZE,
+    WORKING_DIRECTORY,
+)
+from dispatcher import ToolDispatcher
+from functions.file_cache import file_cache
+from functions.run_cache import run_cache
+from history import HistoryManager
+from tools import ToolRegistry
+from tracing import EXPORTERS, tracer, usage_attributes
+
+# The genai SDK and everything built on it (backends, batch, server) take most of the
+# startup time, they are imported where they are first needed instead of here
+if TYPE_CHECKING:
+    from google.genai import types
+
+    from backends import ModelBackend
 
 
 def parse_arguments():
@@ -21,17 +40,139 @@ def parse_arguments():
     parser.add_argument(
         "-i", "--interactive", action="store_true", help="start interactive REPL mode"
     )
+    parser.add_argument(
+        "--max-parallel-tools",
+        type=int,
+        default=MAX_PARALLEL_TOOL_CALLS,
+        help=f"maximum number of read-only tool calls to run concurrently (default: {MAX_PARALLEL_TOOL_CALLS})",
+    )
+    parser.add_argument(
+        "--stream", action="store_true", help="stream responses and start tool calls as soon as they arrive"
+    )
+    parser.add_argument(
+        "--history-budget",
+        type=int,
+        default=HISTORY_TOKEN_BUDGET,
+        help=f"compact old tool outputs once the conversation exceeds this many tokens, 0 disables (default: {HISTORY_TOKEN_BUDGET})",
+    )
+    parser.add_argument(
+        "--warm-workers",
+        action="store_true",
+        default=USE_WARM_WORKERS,
+        help="run Python files in pre-started worker interpreters to skip startup cost",
+    )
+    parser.add_argument(
+        "--no-run-cache", action="store_true", help="always run Python files instead of reusing unchanged results"
+    )
+    parser.add_argument(
+        "--live-output", action="store_true", help="show the output of Python files while they run"
+    )
+    parser.add_argument(
+        "--record", metavar="PATH", help="save every model response to a JSONL file for later replay"
+    )
+    parser.add_argument(
+        "--replay", metavar="PATH", help="replay model responses from a recorded JSONL file instead of calling the API"
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="ADDRESS",
+        help='host many concurrent sessions over JSON lines on "port" (127.0.0.1), "host:port" or "unix:/path/to.sock"',
+    )
+    parser.add_argument(
+        "--allow-dir",
+        metavar="DIR",
+        action="append",
+        default=[],
+        help="let server clients open sessions in DIR or below it instead of a scratch copy, can be repeated",
+    )
+    parser.add_argument(
+        "--context-cache",
+        action="store_true",
+        help="keep the system prompt and tool declarations in a Gemini context cache instead of resending them",
+    )
+    parser.add_argument(
+        "--response-cache",
+        metavar="PATH",
+        help="answer requests identical to earlier ones from this JSONL file instead of calling the model",
+    )
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        default=MODEL_REQUESTS_PER_MINUTE,
+        help="maximum model requests per minute across all sessions, 0 for no limit (default: %(default)g)",
+    )
+    parser.add_argument(
+        "--inject-faults",
+        type=float,
+        default=0.0,
+        metavar="RATE",
+        help="with --replay, fail this fraction of model calls with 429/5xx errors to test retries",
+    )
+    parser.add_argument(
+        "--batch", metavar="PATH", help='run every {"prompt": ...} line of a JSONL file and exit'
+    )
+    parser.add_argument(
+        "--batch-output",
+        metavar="PATH",
+        help="where --batch writes one JSON result per prompt (default: the input path with .results.jsonl)",
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=BATCH_PARALLELISM,
+        help=f"number of --batch prompts to run at once (default: {BATCH_PARALLELISM})",
+    )
+    parser.add_argument(
+        "--keep-workdirs",
+        metavar="DIR",
+        help="keep each --batch prompt's copy of the working directory under DIR instead of deleting it",
+    )
+    parser.add_argument(
+        "--trace", metavar="PATH", help="write a span for every iteration, model call and tool call to a file"
+    )
+    parser.add_argument(
+        "--trace-format",
+        choices=sorted(EXPORTERS),
+        default="jsonl",
+        help="format of the --trace file: plain JSONL spans or OTLP/JSON for an OpenTelemetry collector (default: jsonl)",
+    )
+    parser.add_argument(
+        "--trace-summary", action="store_true", help="print where the session spent its time and tokens on exit"
+    )
 
     return parser.parse_args()
 
 
-def print_verbose(prompt: str, response: types.GenerateContentResponse):
+def print_verbose(prompt: str, response: "types.GenerateContentResponse", stats: dict = None):
     print("\n" + "="*50)
     print("📊 VERBOSE OUTPUT")
     print("="*50)
     print(f"💬 User prompt: {prompt}")
-    print(f"📥 Prompt tokens: {response.usage_metadata.prompt_token_count}")
-    print(f"📤 Response tokens: {response.usage_metadata.candidates_token_count}")
+    if response.usage_metadata:
+        print(f"📥 Prompt tokens: {response.usage_metadata.prompt_token_count}")
+        print(f"📤 Response tokens: {response.usage_metadata.candidates_token_count}")
+    if stats:
+        if "time_to_first_token" in stats:
+            print(f"⏱️ Time to first token: {stats['time_to_first_token'] * 1000:.0f} ms")
+        if "time_to_first_tool" in stats:
+            print(f"⏱️ Time to first tool call: {stats['time_to_first_tool'] * 1000:.0f} ms")
+        if "history_tokens" in stats:
+            print(f"🗂️ History: ~{stats['history_tokens']} tokens in {stats['history_messages']} messages")
+        if stats.get("compacted_outputs") or stats.get("dropped_turns"):
+            print(f"🧹 Compacted: {stats.get('compacted_outputs', 0)} tool outputs stubbed, {stats.get('dropped_turns', 0)} turns dropped")
+    cache_stats = file_cache.stats()
+    if cache_stats["hits"] or cache_stats["misses"]:
+        print(f"🗃️ File cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%}), {cache_stats['unchanged']} unchanged reads skipped")
+    run_stats = run_cache.stats()
+    if run_stats["hits"] or run_stats["misses"]:
+        print(f"🗃️ Run cache: {run_stats['hits']} hits, {run_stats['misses']} misses ({run_stats['hit_rate']:.0%})")
+    for layer in (stats or {}).get("backend_stats", []):
+        if layer["name"] == "context_cache":
+            print(f"🗃️ Context cache: {layer['hits']} hits, {layer['created']} created, {layer['failures']} refused, ~{layer['tokens_saved']} prompt tokens saved")
+        elif layer["name"] == "retry" and (layer["retries"] or layer["rate_limited_seconds"]):
+            print(f"🔁 Model retries: {layer['retries']} ({layer['backoff_seconds']:.1f}s backoff, {layer['gave_up']} gave up), {layer['rate_limited_seconds']:.1f}s waiting for the rate limit")
+        elif layer["name"] == "response_cache":
+            print(f"🗃️ Response cache: {layer['hits']} hits, {layer['misses']} misses ({layer['hit_rate']:.0%}), {layer['tokens_saved']} prompt tokens saved")
     print("="*50)
 
 
@@ -51,6 +192,7 @@ def print_welcome():
     print("  • Type your message and press Enter")
     print("  • Type 'exit', 'quit', or 'bye' to leave")
     print("  • Type 'clear' to clear conversation history")
+    print("  • Type 'compact' to shrink old tool outputs in the history")
     print("  • Type 'help' to see this message again")
     print("=" * 60)
     print()
@@ -61,11 +203,19 @@ def print_help():
     print("\n📋 Available Commands:")
     print("  • exit, quit, bye - Exit the REPL")
     print("  • clear - Clear conversation history")
+    print("  • compact - Replace old tool outputs with short stubs to save tokens")
     print("  • help - Show this help message")
     print("  • Any other text - Send message to AI agent")
     print()
 
 
+def print_live_output(stream: str, text: str):
+    """Echo output of a running Python file as it is produced"""
+    target = sys.stderr if stream == "stderr" else sys.stdout
+    target.write(text)
+    target.flush()
+
+
 def get_user_input():
     """Get user input with a nice prompt"""
     try:
@@ -75,179 +225,320 @@ def get_user_input():
         sys.exit(0)
 
 
-def call_function(function_call_part, verbose=False):
-    """Handle calling one of the functions based on the function call from the LLM"""
-    
-    # Dictionary mapping function names to actual functions
-    available_functions = {
-        "get_files_info": get_files_info,
-        "get_file_content": get_file_content,
-        "run_python_file": run_python_file,
-        "write_file": write_file,
-    }
+# System prompt for conversations, the REPL and every server session use it
+CHAT_SYSTEM_PROMPT = """
+You are a helpful AI coding agent in an interactive chat session.
+
+When a user asks a question or makes a request, make a function call plan. You can perform the following operations:
+
+- List files and directories
+- Read file contents, several files at once (a list of paths or a glob) when exploring a module
+- Outline the classes and functions of Python files with their line ranges, then read only the lines you need
+- Search the code for a string or regular expression, to find where something is defined or used
+- Execute Python files with optional arguments
+- Write or overwrite files
+- Edit part of an existing file with search/replace blocks or a unified diff, prefer this over rewriting the whole file
+
+All paths you provide should be relative to the working directory. You do not need to specify the working directory in your function calls as it is automatically injected for security reasons.
+
+Keep your responses conversational and helpful. Remember that this is an ongoing conversation, so you can reference previous interactions and maintain context.
+"""
+
+# System prompt for one-off tasks, single command and batch mode use it
+TASK_SYSTEM_PROMPT = """
+You are a helpful AI coding agent.
+
+When a user asks a question or makes a request, make a function call plan. You can perform the following operations:
+
+- List files and directories
+- Read file contents, several files at once (a list of paths or a glob) when exploring a module
+- Outline the classes and functions of Python files with their line ranges, then read only the lines you need
+- Search the code for a string or regular expression, to find where something is defined or used
+- Execute Python files with optional arguments
+- Write or overwrite files
+- Edit part of an existing file with search/replace blocks or a unified diff, prefer this over rewriting the whole file
+
+All paths you provide should be relative to the working directory. You do not need to specify the working directory in your function calls as it is automatically injected for security reasons.
+"""
+
+
+# Mapping of function names to actual functions, tool modules are imported on first call
+AVAILABLE_FUNCTIONS = ToolRegistry()
+
+
+def build_tool() -> "types.Tool":
+    """The function declarations the model may call"""
+    return AVAILABLE_FUNCTIONS.build_tool()
+
+
+def call_function(function_call_part, verbose=False, working_directory=WORKING_DIRECTORY, output=None):
+    """Handle calling one of the functions based on the function call from the LLM, progress is printed to `output` (stdout by default)"""
+    from google.genai import types
     
     function_name = function_call_part.name
-    function_args = dict(function_call_part.args)
+    function_args = dict(function_call_part.args or {})
     
     # Print function call info with prettier formatting
     if verbose:
-        print(f"🔧 Calling function: {function_name}({function_args})")
+        print(f"🔧 Calling function: {function_name}({function_args})", file=output)
     else:
-        print(f"🔧 {function_name}...")
-    
-    # Check if function exists
-    if function_name not in available_functions:
-        return types.Content(
-            role="user",
-            parts=[
-                types.Part.from_function_response(
-                    name=function_name,
-                    response={"error": f"Unknown function: {function_name}"},
-                )
-            ],
-        )
-    
-    # Add working directory to arguments
-    function_args["working_directory"] = "./calculator"
+        print(f"🔧 {function_name}...", file=output)
     
-    # Call the function
-    try:
-        function_result = available_functions[function_name](**function_args)
-        if not verbose:
-            print(f"   ✅ Completed\n")
-        return types.Content(
-            role="user",
-            parts=[
-                types.Part.from_function_response(
-                    name=function_name,
-                    response={"result": function_result},
-                )
-            ],
-        )
-    except Exception as e:
-        if not verbose:
-            print(f"   ❌ Error: {str(e)}")
-        return types.Content(
-            role="user",
-            parts=[
-                types.Part.from_function_response(
-                    name=function_name,
-                    response={"error": f"Error calling {function_name}: {str(e)}"},
-                )
-            ],
-        )
-
-
-def process_user_message(user_message: str, messages: list, client, available_functions, system_prompt: str, verbose: bool = False):
-    """Process a single user message and return the response"""
+    with tracer.span("tool.call", tool=function_name, bytes_in=len(str(function_args).encode("utf-8"))) as span:
+        # Check if function exists
+        if function_name not in AVAILABLE_FUNCTIONS:
+            span.record_error(f"Unknown function: {function_name}")
+            return types.Content(
+                role="user",
+                parts=[
+                    types.Part.from_function_response(
+                        name=function_name,
+                        response={"error": f"Unknown function: {function_name}"},
+                    )
+                ],
+            )
+        
+        # Add working directory to arguments
+        function_args["working_directory"] = working_directory
+        
+        # Call the function
+        try:
+            function_result = AVAILABLE_FUNCTIONS[function_name](**function_args)
+            # Tools report problems as "Error: ..." strings rather than raising
+            span.set(bytes_out=len(str(function_result).encode("utf-8")))
+            if isinstance(function_result, str) and function_result.startswith("Error"):
+                span.record_error(function_result.splitlines()[0])
+            if not verbose:
+                print(f"   ✅ Completed\n", file=output)
+            return types.Content(
+                role="user",
+                parts=[
+                    types.Part.from_function_response(
+                        name=function_name,
+                        response={"result": function_result},
+                    )
+                ],
+            )
+        except Exception as e:
+            span.record_error(e)
+            if not verbose:
+                print(f"   ❌ Error: {str(e)}", file=output)
+            return types.Content(
+                role="user",
+                parts=[
+                    types.Part.from_function_response(
+                        name=function_name,
+                        response={"error": f"Error calling {function_name}: {str(e)}"},
+                    )
+                ],
+            )
+
+
+def stream_model_response(backend: "ModelBackend", messages: list, config, dispatcher, verbose: bool = False, stats: dict = None, working_directory: str = WORKING_DIRECTORY, output=None):
+    """Stream one model response, printing text as it arrives and dispatching each function call as soon as it is received.
+
+    Returns a GenerateContentResponse aggregating the streamed chunks, so the caller can handle it like a regular response.
+    """
+    from google.genai import types
+
+    request_started = time.perf_counter()
+    parts = []
+    usage_metadata = None
+    finish_reason = None
+    printing_text = False
+
+    for chunk in backend.generate_content_stream(model=MODEL_NAME, contents=messages, config=config):
+        if chunk.usage_metadata:
+            usage_metadata = chunk.usage_metadata
+        if not chunk.candidates:
+            continue
+
+        candidate = chunk.candidates[0]
+        if candidate.finish_reason:
+            finish_reason = candidate.finish_reason
+        if not candidate.content or not candidate.content.parts:
+            continue
+
+        for part in candidate.content.parts:
+            if part.text:
+                if stats is not None:
+                    stats.setdefault("time_to_first_token", time.perf_counter() - request_started)
+                if not printing_text:
+                    print("🤖 Agent: ", end="", file=output)
+                    printing_text = True
+                print(part.text, end="", flush=True, file=output)
+
+                # Merge consecutive text chunks into a single part for the conversation history
+                if parts and parts[-1].text and not parts[-1].thought and not part.thought:
+                    parts[-1] = types.Part(text=parts[-1].text + part.text)
+                else:
+                    parts.append(part)
+            elif part.function_call:
+                if printing_text:
+                    print(file=output)
+                    printing_text = False
+                if stats is not None:
+                    stats.setdefault("time_to_first_tool", time.perf_counter() - request_started)
+                dispatcher.submit(part.function_call, verbose=verbose, working_directory=working_directory, output=output)
+                parts.append(part)
+            else:
+                parts.append(part)
+
+    if printing_text:
+        print(file=output)
+
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(
+                content=types.Content(role="model", parts=parts),
+                finish_reason=finish_reason,
+            )
+        ],
+        usage_metadata=usage_metadata,
+    )
+
+
+def process_user_message(user_message: str, messages: list, backend: "ModelBackend", available_functions, system_prompt: str, verbose: bool = False, max_parallel_tools: int = MAX_PARALLEL_TOOL_CALLS, stream: bool = False, stats: dict = None, history: HistoryManager = None, working_directory: str = WORKING_DIRECTORY, tool_executor=None, output=None):
+    """Process a single user message and return the response
+
+    In streaming mode, text is printed as it arrives and function calls start running while the rest of the
+    response is still being received. Timing numbers are recorded in `stats` when a dict is passed.
+    When a HistoryManager is given, the conversation is compacted before each model call if it is over budget.
+    Tool calls run on `tool_executor` when given (e.g. a pool shared by server sessions), otherwise on a private pool.
+    Agent output is printed to `output`, stdout by default; concurrent callers should each pass their own.
+    """
+    from google.genai import types
+
     # Add user message to conversation
     messages.append(types.Content(role="user", parts=[types.Part(text=user_message)]))
     
+    config = types.GenerateContentConfig(
+        tools=[available_functions], system_instruction=system_prompt
+    )
+    response = None
+    message_span = tracer.span("agent.message", stream=stream)
+    
     # Main feedback loop for this message
     max_iterations = 20
     
     for iteration in range(max_iterations):
+        iteration_span = tracer.span("agent.iteration", iteration=iteration + 1, messages=len(messages))
         try:
-            response = client.models.generate_content(
-                model="gemini-2.0-flash-001",
-                contents=messages,
-                config=types.GenerateContentConfig(
-                    tools=[available_functions], system_instruction=system_prompt
-                ),
-            )
-            
-            # Check if we have a final text response (agent is done)
-            # Only check response.text if there are no function calls to avoid warnings
-            has_function_calls = False
-            if response.candidates:
-                for candidate in response.candidates:
-                    if candidate.content.parts:
-                        for part in candidate.content.parts:
-                            if hasattr(part, 'function_call') and part.function_call:
-                                has_function_calls = True
-                                break
-                    if has_function_calls:
-                        break
+            if history:
+                with tracer.span("history.compact") as compact_span:
+                    report = history.compact(messages)
+                    compact_span.set(stubbed=report["stubbed"], dropped_turns=report["dropped_turns"], tokens_after=report["tokens_after"])
+                if stats is not None:
+                    stats["compacted_outputs"] = stats.get("compacted_outputs", 0) + report["stubbed"]
+                    stats["dropped_turns"] = stats.get("dropped_turns", 0) + report["dropped_turns"]
             
-            # If no function calls, check for final text response
-            if not has_function_calls and response.text:
-                print(f"🤖 Agent: {response.text}")
-                return response
-            
-            # Process each candidate response
-            if response.candidates:
-                for candidate in response.candidates:
-                    # Add the model's response to the conversation
-                    messages.append(candidate.content)
-                    
-                    # Process all parts in the response (text and function calls)
-                    if candidate.content.parts:
+            with ToolDispatcher(call_function, max_workers=max_parallel_tools, executor=tool_executor) as dispatcher:
+                with tracer.span("model.generate_content", model=MODEL_NAME, stream=stream, contents=len(messages)) as model_span:
+                    if stream:
+                        # Text is printed and function calls are dispatched while streaming
+                        response = stream_model_response(backend, messages, config, dispatcher, verbose, stats, working_directory, output)
+                    else:
+                        response = backend.generate_content(
+                            model=MODEL_NAME,
+                            contents=messages,
+                            config=config,
+                        )
+                    model_span.set(**usage_attributes(response.usage_metadata))
+                if stats is not None:
+                    stats["model_calls"] = stats.get("model_calls", 0) + 1
+                    if response.usage_metadata:
+                        stats["prompt_tokens"] = stats.get("prompt_tokens", 0) + (response.usage_metadata.prompt_token_count or 0)
+                        stats["response_tokens"] = stats.get("response_tokens", 0) + (response.usage_metadata.candidates_token_count or 0)
+                
+                # Calibrate the history token estimate against what was actually sent
+                if history:
+                    history.record_usage(messages, response.usage_metadata)
+                    if stats is not None:
+                        stats["history_tokens"] = history.total_tokens(messages)
+                        stats["history_messages"] = len(messages)
+                
+                # Check if we have a final text response (agent is done)
+                # Only check response.text if there are no function calls to avoid warnings
+                has_function_calls = False
+                if response.candidates:
+                    for candidate in response.candidates:
+                        if candidate.content.parts:
+                            for part in candidate.content.parts:
+                                if hasattr(part, 'function_call') and part.function_call:
+                                    has_function_calls = True
+                                    break
+                        if has_function_calls:
+                            break
+                
+                # If no function calls, check for final text response
+                if not has_function_calls and response.text:
+                    if not stream:
+                        print(f"🤖 Agent: {response.text}", file=output)
+                    break
+                
+                # Process each candidate response
+                if response.candidates:
+                    for candidate in response.candidates:
+                        # Add the model's response to the conversation
+                        messages.append(candidate.content)
+                        
+                        # Streamed parts were already printed and dispatched
+                        if stream or not candidate.content.parts:
+                            continue
+                        
+                        # Process all parts in the response (text and function calls)
                         for part in candidate.content.parts:
                             # Handle text parts (agent commentary)
                             if hasattr(part, 'text') and part.text:
-                                print(f"🤖 Agent: {part.text}")
+                                print(f"🤖 Agent: {part.text}", file=output)
                             
-                            # Handle function calls
+                            # Schedule function calls, read-only ones run concurrently
                             elif hasattr(part, 'function_call') and part.function_call:
-                                # Call the function
-                                function_call_result = call_function(part.function_call, verbose=verbose)
-                                
-                                # Add the function result to the conversation
-                                messages.append(function_call_result)
-                                
-                                # Print result if verbose
-                                if verbose:
-                                    print(f"✅ Result: {function_call_result.parts[0].function_response.response}\n")
+                                dispatcher.submit(part.function_call, verbose=verbose, working_directory=working_directory, output=output)
+                
+                # Add the function results to the conversation in the original call order
+                function_call_results = dispatcher.results()
+                if stats is not None:
+                    stats["tool_calls"] = stats.get("tool_calls", 0) + len(function_call_results)
+                for function_call_result in function_call_results:
+                    messages.append(function_call_result)
+                    
+                    # Print result if verbose
+                    if verbose:
+                        print(f"✅ Result: {function_call_result.parts[0].function_response.response}\n", file=output)
             
         except Exception as e:
-            print(f"❌ Error in iteration {iteration + 1}: {str(e)}")
+            iteration_span.record_error(e)
+            print(f"❌ Error in iteration {iteration + 1}: {str(e)}", file=output)
+            if stats is not None:
+                stats["error"] = str(e)
             break
+        finally:
+            iteration_span.end()
     
     else:
-        print("⚠️ Maximum iterations reached (20). Agent may not have completed the task.")
+        print("⚠️ Maximum iterations reached (20). Agent may not have completed the task.", file=output)
+        message_span.record_error("Maximum iterations reached")
     
+    message_span.set(iterations=iteration + 1)
+    message_span.end()
     return response
 
 
-def run_repl_mode(verbose: bool = False):
+def run_repl_mode(verbose: bool = False, max_parallel_tools: int = MAX_PARALLEL_TOOL_CALLS, stream: bool = False, history_budget: int = HISTORY_TOKEN_BUDGET, backend_options: dict = None):
     """Run the interactive REPL mode"""
     print_welcome()
     
     # Initialize the conversation
     messages = []
+    history = HistoryManager(token_budget=history_budget)
     
-    # Setup API client
-    load_dotenv()
-    api_key: str = os.environ.get("GEMINI_API_KEY")
-    
-    if not api_key:
-        raise Exception("No API key found")
+    # The model backend is set up with the first message, leaving right away never loads the SDK
+    backend = None
     
-    client = genai.Client(api_key=api_key)
-    
-    system_prompt = """
-You are a helpful AI coding agent in an interactive chat session.
+    system_prompt = CHAT_SYSTEM_PROMPT
 
-When a user asks a question or makes a request, make a function call plan. You can perform the following operations:
-
-- List files and directories
-- Read file contents
-- Execute Python files with optional arguments
-- Write or overwrite files
-
-All paths you provide should be relative to the working directory. You do not need to specify the working directory in your function calls as it is automatically injected for security reasons.
-
-Keep your responses conversational and helpful. Remember that this is an ongoing conversation, so you can reference previous interactions and maintain context.
-"""
-
-    available_functions = types.Tool(
-        function_declarations=[
-            schema_get_files_info,
-            schema_get_file_content,
-            schema_run_python_file,
-            schema_write_file,
-        ]
-    )
+    available_functions = None
     
     # Main REPL loop
     while True:
@@ -259,8 +550,13 @@ Keep your responses conversational and helpful. Remember that this is an ongoing
             break
         elif user_input.lower() == 'clear':
             messages = []
+            file_cache.forget_served()
             print("🧹 Conversation history cleared!")
             continue
+        elif user_input.lower() == 'compact':
+            report = history.compact(messages, force=True)
+            print(f"🧹 Compacted history: {report['stubbed']} tool outputs stubbed, ~{report['tokens_before']} → ~{report['tokens_after']} tokens")
+            continue
         elif user_input.lower() == 'help':
             print_help()
             continue
@@ -269,10 +565,19 @@ Keep your responses conversational and helpful. Remember that this is an ongoing
         
         # Process the user message
         try:
-            response = process_user_message(user_input, messages, client, available_functions, system_prompt, verbose)
+            if backend is None:
+                from backends import create_backend
+
+                backend = create_backend(**(backend_options or {}))
+                available_functions = build_tool()
+            stats = {}
+            response = process_user_message(user_input, messages, backend, available_functions, system_prompt, verbose, max_parallel_tools, stream, stats, history)
             
             if verbose and response:
-                print_verbose(user_input, response)
+                from backends import backend_stats
+
+                stats["backend_stats"] = backend_stats(backend)
+                print_verbose(user_input, response, stats)
                 
         except Exception as e:
             print(f"❌ Error: {str(e)}")
@@ -280,59 +585,112 @@ Keep your responses conversational and helpful. Remember that this is an ongoing
         print()  # Add spacing between interactions
 
 
-def run_single_command_mode(user_prompt: str, verbose: bool = False):
+def run_single_command_mode(user_prompt: str, verbose: bool = False, max_parallel_tools: int = MAX_PARALLEL_TOOL_CALLS, stream: bool = False, backend_options: dict = None):
     """Run single command mode (original behavior)"""
+    from google.genai import types
+
+    from backends import backend_stats, create_backend
+
     messages = [
         types.Content(role="user", parts=[types.Part(text=user_prompt)]),
     ]
 
-    load_dotenv()
-
-    api_key: str = os.environ.get("GEMINI_API_KEY")
-
-    if not api_key:
-        raise Exception("No API key found")
+    backend = create_backend(**(backend_options or {}))
 
-    client = genai.Client(api_key=api_key)
+    system_prompt = TASK_SYSTEM_PROMPT
 
-    system_prompt = """
-You are a helpful AI coding agent.
+    available_functions = build_tool()
 
-When a user asks a question or makes a request, make a function call plan. You can perform the following operations:
+    stats = {}
+    response = process_user_message(user_prompt, messages, backend, available_functions, system_prompt, verbose, max_parallel_tools, stream, stats)
+    
+    if verbose and response:
+        stats["backend_stats"] = backend_stats(backend)
+        print_verbose(user_prompt, response, stats)
 
-- List files and directories
-- Read file contents
-- Execute Python files with optional arguments
-- Write or overwrite files
 
-All paths you provide should be relative to the working directory. You do not need to specify the working directory in your function calls as it is automatically injected for security reasons.
-"""
+def run_batch_mode(input_path: str, output_path: str = None, parallelism: int = BATCH_PARALLELISM, max_parallel_tools: int = MAX_PARALLEL_TOOL_CALLS, keep_workdirs: str = None, backend_options: dict = None):
+    """Run many prompts from a JSONL file in one process, each in its own copy of the working directory"""
+    from backends import create_backend
+    from batch import load_prompts, run_batch
 
-    available_functions = types.Tool(
-        function_declarations=[
-            schema_get_files_info,
-            schema_get_file_content,
-            schema_run_python_file,
-            schema_write_file,
-        ]
+    try:
+        prompts = load_prompts(input_path)
+    except (OSError, ValueError) as e:
+        print(f"❌ Cannot read batch file: {e}", file=sys.stderr)
+        sys.exit(1)
+    if output_path is None:
+        output_path = (input_path[: -len(".jsonl")] if input_path.endswith(".jsonl") else input_path) + ".results.jsonl"
+    backend = create_backend(**(backend_options or {}))
+    run_batch(prompts, output_path, backend, build_tool(), TASK_SYSTEM_PROMPT, parallelism, max_parallel_tools, keep_workdirs)
+
+
+def run_server_mode(address: str, verbose: bool = False, backend_options: dict = None, allowed_roots: list = SERVER_ALLOWED_ROOTS):
+    """Serve many sessions from one process, sharing the model client and tool workers"""
+    import asyncio
+
+    from backends import create_backend
+    from server import AgentServer
+
+    server = AgentServer(
+        create_backend(**(backend_options or {})),
+        build_tool(),
+        CHAT_SYSTEM_PROMPT,
+        process_user_message,
+        verbose,
+        allowed_roots=allowed_roots,
     )
-
-    response = process_user_message(user_prompt, messages, client, available_functions, system_prompt, verbose)
-    
-    if verbose and response:
-        print_verbose(user_prompt, response)
+    try:
+        asyncio.run(server.serve(address))
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped")
+    finally:
+        server.close()
 
 
 def main():
     args = parse_arguments()
     
-    # Determine which mode to run
-    if args.interactive or (not args.user_prompt):
-        # Run REPL mode if -i flag is used or no prompt is provided
-        run_repl_mode(verbose=args.verbose)
-    else:
-        # Run single command mode if prompt is provided
-        run_single_command_mode(args.user_prompt, verbose=args.verbose)
+    if args.warm_workers:
+        from functions import python_worker
+
+        python_worker.start_pool(WARM_WORKER_POOL_SIZE, preload=WARM_PRELOAD_MODULES)
+    if args.no_run_cache:
+        run_cache.enabled = False
+    if args.live_output:
+        from functions import run_python_file as run_python_file_module
+
+        run_python_file_module.output_listener = print_live_output
+    if args.trace or args.trace_summary:
+        tracer.enable(EXPORTERS[args.trace_format](args.trace) if args.trace else None)
+    
+    # How every mode builds its model backend
+    backend_options = {
+        "record_path": args.record,
+        "replay_path": args.replay,
+        "context_cache": args.context_cache,
+        "response_cache_path": args.response_cache,
+        "requests_per_minute": args.rpm,
+        "fault_rate": args.inject_faults,
+    }
+    
+    try:
+        # Determine which mode to run
+        if args.batch:
+            run_batch_mode(args.batch, args.batch_output, args.parallel, args.max_parallel_tools, args.keep_workdirs, backend_options=backend_options)
+        elif args.serve:
+            run_server_mode(args.serve, verbose=args.verbose, backend_options=backend_options, allowed_roots=SERVER_ALLOWED_ROOTS + args.allow_dir)
+        elif args.interactive or (not args.user_prompt):
+            # Run REPL mode if -i flag is used or no prompt is provided
+            run_repl_mode(verbose=args.verbose, max_parallel_tools=args.max_parallel_tools, stream=args.stream, history_budget=args.history_budget, backend_options=backend_options)
+        else:
+            # Run single command mode if prompt is provided
+            run_single_command_mode(args.user_prompt, verbose=args.verbose, max_parallel_tools=args.max_parallel_tools, stream=args.stream, backend_options=backend_options)
+    finally:
+        if tracer.enabled:
+            if args.trace_summary:
+                print(tracer.format_summary())
+            tracer.close()
 
 
 if __name__ == "__main__":
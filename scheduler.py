@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+
+class FairExecutor:
+    """Thread pool shared by many sessions that serves them round-robin
+
+    Every session has its own FIFO queue and at most `per_session_limit` running tasks.
+    An idle worker takes the next task from the first session in rotation that has
+    one and is under its limit, and then moves that session to the back. A session
+    with a long backlog therefore cannot starve the others. Tasks of one session start
+    in submission order, which ToolDispatcher relies on for its barriers.
+    """
+
+    def __init__(self, max_workers: int, per_session_limit: int, thread_name_prefix: str = "fair"):
+        self.per_session_limit = max(1, per_session_limit)
+        self._queues = OrderedDict()
+        self._running = {}
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._threads = [
+            threading.Thread(target=self._work, name=f"{thread_name_prefix}-{index}", daemon=True)
+            for index in range(max(1, max_workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, session, fn, *args, **kwargs) -> Future:
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new tasks after shutdown")
+            self._queues.setdefault(session, deque()).append((future, fn, args, kwargs))
+            self._running.setdefault(session, 0)
+            self._condition.notify()
+        return future
+
+    def session(self, session) -> "SessionExecutor":
+        """An executor-like view that submits everything on behalf of `session`"""
+        return SessionExecutor(self, session)
+
+    def pending(self, session) -> int:
+        """Queued plus running tasks of `session`"""
+        with self._condition:
+            return len(self._queues.get(session, ())) + self._running.get(session, 0)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "sessions": len(self._queues),
+                "queued": sum(len(queue) for queue in self._queues.values()),
+                "running": sum(self._running.values()),
+            }
+
+    def _next_task(self):
+        for session, queue in self._queues.items():
+            if queue and self._running[session] < self.per_session_limit:
+                self._queues.move_to_end(session)
+                return session, queue.popleft()
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                task = self._next_task()
+                while task is None:
+                    if self._shutdown and not any(self._queues.values()):
+                        return
+                    self._condition.wait()
+                    task = self._next_task()
+                session, (future, fn, args, kwargs) = task
+                self._running[session] += 1
+
+            run = future.set_running_or_notify_cancel()
+            if run:
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    error = e
+                else:
+                    error = None
+
+            with self._condition:
+                self._running[session] -= 1
+                if not self._running[session] and not self._queues[session]:
+                    del self._running[session]
+                    del self._queues[session]
+                # A slot of this session freed up, a worker waiting on its limit may proceed
+                self._condition.notify_all()
+
+            # Resolved only now, so whoever waits on the future never sees the task as pending
+            if run:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    def shutdown(self, wait: bool = True):
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+class SessionExecutor:
+    """Submits to a FairExecutor under one session, usable as ToolDispatcher's executor"""
+
+    def __init__(self, executor: FairExecutor, session):
+        self._executor = executor
+        self._session = session
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        return self._executor.submit(self._session, fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True):
+        # The pool is shared, it is shut down by its owner
+        pass
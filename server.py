@@ -0,0 +1,226 @@
+import asyncio
+import contextvars
+import json
+import os
+import shutil
+import tempfile
+import uuid
+
+from backends import response_text
+from config import (
+    SERVER_ALLOWED_ROOTS,
+    SERVER_MAX_ACTIVE_TURNS,
+    SERVER_MAX_QUEUED_MESSAGES,
+    SERVER_SESSION_TOOL_LIMIT,
+    SERVER_TOOL_WORKERS,
+    WORKING_DIRECTORY,
+)
+from functions.code_index import code_indexes
+from functions.file_cache import file_cache, served_scope
+from history import HistoryManager
+from scheduler import FairExecutor
+
+# Requests can carry whole files for write_file, allow lines well beyond asyncio's 64 KiB default
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+
+class Session:
+    """One conversation: its messages, history budget and working directory"""
+
+    def __init__(self, session_id: str, working_directory: str, owns_directory: bool):
+        self.id = session_id
+        self.working_directory = working_directory
+        self.owns_directory = owns_directory
+        self.messages = []
+        self.history = HistoryManager()
+
+
+class AgentServer:
+    """Hosts many agent sessions in one process
+
+    All sessions share one model backend (and so one pooled API client), one bounded
+    pool for agent turns and one for tool calls. Both pools are FairExecutors: a session
+    runs one turn at a time and at most SERVER_SESSION_TOOL_LIMIT tool calls at once,
+    and free workers rotate between sessions so a heavy one cannot starve the rest.
+
+    Clients talk JSON lines over TCP or a Unix socket, one request per line:
+
+        {"id": 1, "op": "open"}                                  -> {"id": 1, "ok": true, "session": "..."}
+        {"id": 2, "op": "message", "session": "...", "message": "run the tests"}
+                                                                 -> {"id": 2, "ok": true, "text": "..."}
+        {"id": 3, "op": "close", "session": "..."}
+        {"id": 4, "op": "stats"}
+
+    Requests on one connection are handled concurrently, replies echo the request id.
+    """
+
+    def __init__(
+        self,
+        backend,
+        tool,
+        system_prompt: str,
+        process_message,
+        verbose: bool = False,
+        max_active_turns: int = SERVER_MAX_ACTIVE_TURNS,
+        tool_workers: int = SERVER_TOOL_WORKERS,
+        session_tool_limit: int = SERVER_SESSION_TOOL_LIMIT,
+        max_queued_messages: int = SERVER_MAX_QUEUED_MESSAGES,
+        allowed_roots: list = SERVER_ALLOWED_ROOTS,
+    ):
+        self.backend = backend
+        self.tool = tool
+        self.system_prompt = system_prompt
+        # main.process_user_message, passed in because importing main from here would load
+        # a second copy of it next to __main__ under `python main.py --serve`
+        self.process_message = process_message
+        self.verbose = verbose
+        self.max_queued_messages = max_queued_messages
+        # Symlinks resolved, so a link inside an allowed root cannot lead out of it
+        self.allowed_roots = [os.path.realpath(root) for root in allowed_roots]
+        self.turns = FairExecutor(max_active_turns, 1, thread_name_prefix="turn")
+        self.tools = FairExecutor(tool_workers, session_tool_limit, thread_name_prefix="tool")
+        self.sessions = {}
+
+    def open_session(self, working_directory: str = None) -> Session:
+        """Start a session, by default in a private copy of WORKING_DIRECTORY
+
+        A client-chosen `working_directory` must be one of `allowed_roots` or below one,
+        it gets every tool, including writing files and running code.
+        """
+        session_id = uuid.uuid4().hex[:12]
+        if working_directory:
+            working_directory = os.path.realpath(working_directory)
+            if not any(working_directory == root or working_directory.startswith(root + os.sep) for root in self.allowed_roots):
+                raise ValueError(f'"{working_directory}" is not below a directory the server allows sessions in (--allow-dir)')
+            if not os.path.isdir(working_directory):
+                raise ValueError(f'"{working_directory}" is not a directory')
+            session = Session(session_id, working_directory, owns_directory=False)
+        else:
+            copy = os.path.join(tempfile.mkdtemp(prefix=f"agent-{session_id}-"), os.path.basename(os.path.abspath(WORKING_DIRECTORY)))
+            shutil.copytree(WORKING_DIRECTORY, copy, ignore=shutil.ignore_patterns("__pycache__"))
+            session = Session(session_id, copy, owns_directory=True)
+        self.sessions[session_id] = session
+        return session
+
+    def close_session(self, session_id: str):
+        session = self._session(session_id)
+        if self.turns.pending(session_id):
+            raise ValueError(f"Session {session_id} still has messages in progress")
+        del self.sessions[session_id]
+        file_cache.forget_served(session_id)
+        code_indexes.forget(session.working_directory)
+        if session.owns_directory:
+            shutil.rmtree(os.path.dirname(session.working_directory), ignore_errors=True)
+
+    async def send(self, session_id: str, message: str) -> dict:
+        session = self._session(session_id)
+        if self.turns.pending(session_id) >= self.max_queued_messages:
+            raise ValueError(f"Session {session_id} already has {self.max_queued_messages} messages queued")
+        future = self.turns.submit(session_id, self._run_turn, session, message)
+        return await asyncio.wrap_future(future)
+
+    def _run_turn(self, session: Session, message: str) -> dict:
+        # Turn workers are reused across sessions, start each turn from a clean context
+        return contextvars.Context().run(self._process, session, message)
+
+    def _process(self, session: Session, message: str) -> dict:
+        served_scope.set(session.id)
+        response = self.process_message(
+            message,
+            session.messages,
+            self.backend,
+            self.tool,
+            self.system_prompt,
+            verbose=self.verbose,
+            history=session.history,
+            working_directory=session.working_directory,
+            tool_executor=self.tools.session(session.id),
+        )
+        return {"text": response_text(response), "messages": len(session.messages)}
+
+    def _session(self, session_id: str) -> Session:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise ValueError(f"Unknown session: {session_id}")
+        return session
+
+    async def handle(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "open":
+            session = await asyncio.to_thread(self.open_session, request.get("working_directory"))
+            return {"session": session.id, "working_directory": session.working_directory}
+        if op == "message":
+            return await self.send(request.get("session"), str(request.get("message", "")))
+        if op == "close":
+            await asyncio.to_thread(self.close_session, request.get("session"))
+            return {}
+        if op == "stats":
+            return {"sessions": len(self.sessions), "turns": self.turns.stats(), "tools": self.tools.stats()}
+        raise ValueError(f"Unknown op: {op}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self._respond(line, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, ValueError):
+            # Client went away, or sent a line over MAX_REQUEST_BYTES
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        request = {}
+        try:
+            request = json.loads(line)
+            reply = {"ok": True, **(await self.handle(request))}
+        except Exception as e:
+            reply = {"ok": False, "error": str(e)}
+        if isinstance(request, dict) and "id" in request:
+            reply["id"] = request["id"]
+        async with write_lock:
+            writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+            await writer.drain()
+
+    async def serve(self, address: str):
+        """Listen on "unix:/path/to.sock", "host:port" or "port" (127.0.0.1) until cancelled"""
+        socket_path = None
+        if address.startswith("unix:"):
+            socket_path = address[len("unix:") :]
+            server = await asyncio.start_unix_server(self.handle_connection, socket_path, limit=MAX_REQUEST_BYTES)
+        else:
+            host, _, port = address.rpartition(":")
+            server = await asyncio.start_server(self.handle_connection, host or "127.0.0.1", int(port), limit=MAX_REQUEST_BYTES)
+        print(f"🛰️ Agent server listening on {address}")
+        if not address.startswith("unix:") and host not in ("", "127.0.0.1", "localhost", "::1"):
+            print("⚠️ Listening beyond this machine: anyone who can connect can run code in the sessions' directories")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            # Otherwise the socket file is left behind for the next --serve on the same path
+            if socket_path:
+                try:
+                    os.unlink(socket_path)
+                except FileNotFoundError:
+                    pass
+
+    def close(self):
+        for session_id, session in list(self.sessions.items()):
+            file_cache.forget_served(session_id)
+            code_indexes.forget(session.working_directory)
+            if session.owns_directory:
+                shutil.rmtree(os.path.dirname(session.working_directory), ignore_errors=True)
+        self.sessions.clear()
+        self.turns.shutdown(wait=False)
+        self.tools.shutdown(wait=False)
+
@@ -0,0 +1,149 @@
+import os
+import tempfile
+import unittest
+
+import httpx
+from google.genai import errors
+
+from backends import (
+    FaultInjectingBackend,
+    RetryingBackend,
+    ScriptedBackend,
+    TokenBucket,
+    create_backend,
+    response_text,
+    retry_after,
+    text_part,
+)
+
+
+class FakeClock:
+    """Stands in for time.monotonic and time.sleep, sleeping only moves the clock forward"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def generate(backend) -> str:
+    return response_text(backend.generate_content(model="test", contents=[], config=None))
+
+
+class TestRetryingBackend(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.model = ScriptedBackend([[text_part("ok")]])
+
+    def retrying(self, faults, **options) -> RetryingBackend:
+        self.faults = FaultInjectingBackend(self.model, faults=faults, retry_after=options.pop("retry_after", None))
+        return RetryingBackend(self.faults, sleep=self.clock.sleep, **options)
+
+    def test_retries_transient_errors(self):
+        backend = self.retrying([503, 429, 500], base_delay=1.0, max_delay=60.0)
+        self.assertEqual(generate(backend), "ok")
+        self.assertEqual(self.faults.injected, 3)
+        self.assertEqual(self.model.calls, 1)
+        self.assertEqual(backend.retries, 3)
+        self.assertEqual(backend.gave_up, 0)
+
+    def test_backoff_is_bounded_and_accounted(self):
+        backend = self.retrying([503] * 5, base_delay=1.0, max_delay=3.0)
+        generate(backend)
+        self.assertEqual(len(self.clock.sleeps), 5)
+        for attempt, delay in enumerate(self.clock.sleeps):
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(3.0, 1.0 * 2**attempt))
+        self.assertAlmostEqual(backend.backoff_seconds, sum(self.clock.sleeps))
+
+    def test_gives_up_after_max_retries(self):
+        backend = self.retrying([500] * 4, max_retries=2)
+        with self.assertRaises(errors.ServerError):
+            generate(backend)
+        self.assertEqual(self.faults.injected, 3)
+        self.assertEqual(self.model.calls, 0)
+        self.assertEqual(backend.retries, 2)
+        self.assertEqual(backend.gave_up, 1)
+
+    def test_does_not_retry_client_errors(self):
+        backend = self.retrying([400])
+        with self.assertRaises(errors.ClientError):
+            generate(backend)
+        self.assertEqual(backend.retries, 0)
+        self.assertEqual(backend.gave_up, 0)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_retry_after_pauses_the_shared_limiter(self):
+        limiter = TokenBucket(rate=100.0, clock=self.clock, sleep=self.clock.sleep)
+        backend = self.retrying([429], retry_after=7.0, base_delay=0.1, limiter=limiter)
+        self.assertEqual(generate(backend), "ok")
+        self.assertGreaterEqual(self.clock.sleeps[0], 7.0)
+        # A second session waits for the pause too, even with tokens left
+        limiter.pause(5.0)
+        started = self.clock.now
+        limiter.acquire()
+        self.assertAlmostEqual(self.clock.now - started, 5.0)
+
+    def test_stream_is_retried_before_the_first_chunk(self):
+        backend = self.retrying([503])
+        chunks = list(backend.generate_content_stream(model="test", contents=[], config=None))
+        self.assertEqual("".join(response_text(chunk) for chunk in chunks), "ok")
+        self.assertEqual(backend.retries, 1)
+
+    def test_malformed_retry_after_falls_back_to_backoff(self):
+        body = {"error": {"code": 429, "message": "slow down", "status": "RESOURCE_EXHAUSTED"}}
+        response = httpx.Response(429, headers={"retry-after": "whenever you like"}, json=body)
+        error = errors.ClientError(429, body, response)
+        self.assertIsNone(retry_after(error))
+
+        failed = []
+
+        def fail_once(contents):
+            if not failed:
+                failed.append(error)
+                raise error
+            return [text_part("ok")]
+
+        backend = RetryingBackend(ScriptedBackend([fail_once]), base_delay=1.0, sleep=self.clock.sleep)
+        self.assertEqual(generate(backend), "ok")
+        self.assertEqual(backend.retries, 1)
+        self.assertLessEqual(self.clock.sleeps[0], 1.0)
+
+
+class TestCreateBackend(unittest.TestCase):
+    def test_replay_is_rate_limited_without_faults(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "replay.jsonl")
+            open(path, "w").close()
+            backend = create_backend(replay_path=path, requests_per_minute=60)
+        self.assertIsInstance(backend, RetryingBackend)
+        self.assertIsNotNone(backend.limiter)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_waits_for_refills(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2.0, capacity=2.0, clock=clock, sleep=clock.sleep)
+        for _ in range(4):
+            bucket.acquire()
+        # The first two requests use the initial tokens, each later one waits half a second
+        self.assertAlmostEqual(clock.now, 1.0)
+        self.assertAlmostEqual(bucket.waited, 1.0)
+
+    def test_refills_up_to_capacity(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1.0, capacity=2.0, clock=clock, sleep=clock.sleep)
+        clock.now += 100
+        for _ in range(3):
+            bucket.acquire()
+        self.assertAlmostEqual(bucket.waited, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
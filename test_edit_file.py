@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from functions.edit_file import edit_file
+
+
+class TestPatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def patch(self, content: str, patch: str) -> str:
+        path = os.path.join(self.directory, "file.py")
+        with open(path, "w", newline="") as f:
+            f.write(content)
+        result = edit_file(self.directory, "file.py", patch=patch)
+        self.assertTrue(result.startswith("Successfully"), result)
+        with open(path, "r", newline="") as f:
+            return f.read()
+
+    def test_separators_inside_lines_are_kept(self):
+        content = 'a = "x\x0cy"\nb = " \x85\x1c"\nc = 1\n'
+        patch = "@@ -3,1 +3,1 @@\n-c = 1\n+c = 2\n"
+        self.assertEqual(self.patch(content, patch), 'a = "x\x0cy"\nb = " \x85\x1c"\nc = 2\n')
+
+    def test_mixed_line_endings_are_kept(self):
+        content = "one\r\ntwo\nthree\r\n"
+        patch = "@@ -2,2 +2,3 @@\n two\n+inserted\n-three\n+THREE\n"
+        self.assertEqual(self.patch(content, patch), "one\r\ntwo\ninserted\nTHREE\r\n")
+
+    def test_crlf_file_stays_crlf(self):
+        content = "one\r\ntwo\r\n"
+        patch = "@@ -1,2 +1,3 @@\n one\n+between\n two\n"
+        self.assertEqual(self.patch(content, patch), "one\r\nbetween\r\ntwo\r\n")
+
+    def test_missing_final_newline_is_kept(self):
+        self.assertEqual(self.patch("a\nb", "@@ -2,1 +2,2 @@\n b\n+c\n"), "a\nb\nc")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from functions.file_cache import file_cache
+from functions.get_files_info import _gitignore_regex, get_files_info
+
+
+class TestGetFilesInfo(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = self.directory.name
+        for name in ("a.txt", "b.txt", "c.txt"):
+            with open(os.path.join(self.path, name), "w") as f:
+                f.write("x")
+        file_cache.forget_served()
+
+    def test_rejects_bad_pages(self):
+        self.assertEqual(get_files_info(self.path, limit=0), "Error: limit must be at least 1")
+        self.assertEqual(get_files_info(self.path, limit=-2), "Error: limit must be at least 1")
+        self.assertEqual(get_files_info(self.path, offset=-1), "Error: offset must not be negative")
+
+    def test_pages(self):
+        result = get_files_info(self.path, offset=1, limit=1)
+        self.assertIn("- b.txt: file_size=1 bytes", result)
+        self.assertNotIn("a.txt", result)
+        self.assertIn("[Showing entries 2-2 of 3. Use offset=2 to see more.]", result)
+
+    def test_sizes_follow_in_place_rewrites(self):
+        self.assertIn("- a.txt: file_size=1 bytes", get_files_info(self.path))
+        directory_mtime = os.stat(self.path).st_mtime_ns
+        with open(os.path.join(self.path, "a.txt"), "w") as f:
+            f.write("x" * 100)
+        # Rewriting an existing file leaves the directory's mtime alone
+        self.assertEqual(os.stat(self.path).st_mtime_ns, directory_mtime)
+        self.assertIn("- a.txt: file_size=100 bytes", get_files_info(self.path))
+
+    def test_only_the_page_is_stated(self):
+        for name in ("d.txt", "e.txt", "f.txt"):
+            with open(os.path.join(self.path, name), "w") as f:
+                f.write("x")
+        get_files_info(self.path)
+        stat = os.stat
+        with mock.patch("os.stat", side_effect=stat) as stats:
+            result = get_files_info(self.path, offset=2, limit=2)
+        self.assertIn("- c.txt", result)
+        self.assertIn("- d.txt", result)
+        # Besides the directory itself, only the two listed files
+        stated = [call.args[0] for call in stats.call_args_list if call.args[0] != self.path]
+        self.assertEqual(stated, [os.path.join(self.path, "c.txt"), os.path.join(self.path, "d.txt")])
+
+
+class TestGitIgnore(unittest.TestCase):
+    def test_character_classes(self):
+        self.assertTrue(_gitignore_regex("[!a]b", True).fullmatch("cb"))
+        self.assertFalse(_gitignore_regex("[!a]b", True).fullmatch("ab"))
+        # "!" after the start of a class is a literal
+        regex = _gitignore_regex("[a!b].txt", True)
+        for name in ("a.txt", "!.txt", "b.txt"):
+            self.assertTrue(regex.fullmatch(name), name)
+        self.assertFalse(regex.fullmatch("c.txt"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from types import SimpleNamespace
+
+from google.genai import types
+
+from history import MAX_TOKEN_SCALE, HistoryManager
+
+
+def user_text(text: str) -> types.Content:
+    return types.Content(role="user", parts=[types.Part(text=text)])
+
+
+def tool_output(name: str, result: str) -> types.Content:
+    return types.Content(role="tool", parts=[types.Part.from_function_response(name=name, response={"result": result})])
+
+
+def model_call(name: str) -> types.Content:
+    return types.Content(role="model", parts=[types.Part.from_function_call(name=name, args={})])
+
+
+def usage(prompt_token_count: int):
+    return SimpleNamespace(prompt_token_count=prompt_token_count)
+
+
+class TestCalibration(unittest.TestCase):
+    def test_fixed_prefix_does_not_inflate_the_scale(self):
+        # The system prompt and tool declarations make up most of a short conversation's prompt
+        history = HistoryManager(token_budget=4000)
+        messages = [user_text("hi")]
+        history.record_usage(messages, usage(1800))
+        self.assertEqual(history.scale, 1.0)
+
+        messages += [model_call("get_file_content"), tool_output("get_file_content", "x" * 3000)]
+        self.assertLess(history.total_tokens(messages), 1000)
+
+    def test_scale_follows_the_change_between_requests(self):
+        history = HistoryManager()
+        messages = [user_text("hi")]
+        history.record_usage(messages, usage(2300))
+        messages += [model_call("get_file_content"), tool_output("get_file_content", "x" * 4000)]
+        added = history.total_tokens(messages[1:])
+        history.record_usage(messages, usage(2300 + 2 * added))
+        self.assertAlmostEqual(history.scale, 2.0, places=1)
+
+    def test_scale_is_clamped(self):
+        history = HistoryManager()
+        messages = [user_text("hi")]
+        history.record_usage(messages, usage(100))
+        messages.append(tool_output("get_file_content", "x" * 4000))
+        history.record_usage(messages, usage(1000000))
+        self.assertEqual(history.scale, MAX_TOKEN_SCALE)
+
+    def test_short_chat_is_not_compacted(self):
+        history = HistoryManager(token_budget=4000, keep_recent_turns=2)
+        messages = []
+        for turn in range(3):
+            messages += [user_text(f"question {turn}"), model_call("get_file_content"), tool_output("get_file_content", "x" * 3000)]
+            history.record_usage(messages, usage(1800 + 800 * turn))
+        report = history.compact(messages)
+        self.assertEqual(report["dropped_turns"], 0)
+        self.assertEqual(len(messages), 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+from functions.code_index import code_indexes
+from functions.search_code import search_code
+
+SOURCE = '''"""Module docstring"""
+import math
+
+
+class Shape:
+    def area(self):
+        return math.pi
+'''
+
+
+class TestSearchCode(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = self.directory.name
+        self.addCleanup(code_indexes.forget, self.path)
+        with open(os.path.join(self.path, "shape.py"), "w") as f:
+            f.write(SOURCE)
+
+    def test_literal(self):
+        result = search_code(self.path, "math.pi")
+        self.assertIn("7: ", result)
+
+    def test_anchors_match_at_every_line(self):
+        for query, line in (("^class", 5), ("^    def", 6), (r"\):$", 6), ("^import", 2)):
+            with self.subTest(query=query):
+                result = search_code(self.path, query, regex=True, context_lines=0)
+                self.assertIn("Found 1 matches", result)
+                self.assertIn(f"\n{line}: ", result)
+
+    def test_anchors_do_not_match_mid_line(self):
+        result = search_code(self.path, "^def", regex=True)
+        self.assertTrue(result.startswith("No matches"), result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from backends import ScriptedBackend, text_part
+from server import AgentServer
+
+
+def reply(message, messages, backend, tool, system_prompt, **options):
+    return backend.generate_content(model="test", contents=[], config=None)
+
+
+class TestAgentServer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.realpath(self.directory.name)
+        backend = ScriptedBackend([[text_part("done")]])
+        self.server = AgentServer(backend, None, "", reply, allowed_roots=[self.path])
+        self.addCleanup(self.server.close)
+
+    def test_close_right_after_the_reply(self):
+        async def run():
+            for _ in range(50):
+                session = self.server.open_session(self.path)
+                result = await self.server.send(session.id, "hi")
+                self.assertEqual(result["text"], "done")
+                self.server.close_session(session.id)
+
+        asyncio.run(run())
+        self.assertEqual(self.server.sessions, {})
+
+    def test_rejects_directories_outside_the_allowed_roots(self):
+        with self.assertRaises(ValueError):
+            self.server.open_session(os.path.dirname(self.path))
+
+    def test_unix_socket_is_removed_on_shutdown(self):
+        socket_path = os.path.join(self.path, "agent.sock")
+
+        async def run():
+            serving = asyncio.create_task(self.server.serve(f"unix:{socket_path}"))
+            while not os.path.exists(socket_path):
+                await asyncio.sleep(0.01)
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+            writer.write(json.dumps({"id": 1, "op": "stats"}).encode("utf-8") + b"\n")
+            response = json.loads(await reader.readline())
+            writer.close()
+            serving.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await serving
+            return response
+
+        with mock.patch("builtins.print"):
+            response = asyncio.run(run())
+        self.assertEqual(response["id"], 1)
+        self.assertTrue(response["ok"])
+        self.assertFalse(os.path.exists(socket_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
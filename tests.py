@@ -8,6 +8,8 @@ def main():
     print("==========================")
     print(run_python_file("calculator", "tests.py"))
     print("==========================")
+    print(run_python_file("calculator", "main.py", ["3 + 5"], profile_memory=True))
+    print("==========================")
     print(run_python_file("calculator", "../main.py"))
     print("==========================")
     print(run_python_file("calculator", "nonexistent.py"))
@@ -0,0 +1,72 @@
+import importlib
+import threading
+from collections.abc import MutableMapping
+
+# Every tool the model can call, mapped to the module in functions/ that defines the
+# function of that name and a schema_<name>() building its declaration
+TOOL_MODULES = {
+    "get_files_info": "functions.get_files_info",
+    "get_file_content": "functions.get_file_content",
+    "get_files_content": "functions.get_files_content",
+    "run_python_file": "functions.run_python_file",
+    "write_file": "functions.write_file",
+    "edit_file": "functions.edit_file",
+    "search_code": "functions.search_code",
+    "get_outline": "functions.get_outline",
+}
+
+
+class ToolRegistry(MutableMapping):
+    """Tool name -> function, importing each tool module on first use
+
+    Nothing is imported when the registry is created, and declarations are only built
+    by `build_tool`, the first thing that needs the genai SDK. That keeps the SDK (most
+    of the CLI's startup time) out of `--help` and of a REPL that exits right away.
+    Functions can be replaced like dict entries, e.g. wrapped by a benchmark.
+    """
+
+    def __init__(self, modules: dict = TOOL_MODULES):
+        self._modules = dict(modules)
+        self._functions = {}
+        self._tool = None
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str):
+        function = self._functions.get(name)
+        if function is None:
+            function = getattr(importlib.import_module(self._modules[name]), name)
+            self._functions[name] = function
+        return function
+
+    def __setitem__(self, name: str, function):
+        self._functions[name] = function
+
+    def __delitem__(self, name: str):
+        if name not in self:
+            raise KeyError(name)
+        self._modules.pop(name, None)
+        self._functions.pop(name, None)
+
+    def __contains__(self, name) -> bool:
+        # Checked before every call, must not import anything
+        return name in self._modules or name in self._functions
+
+    def __iter__(self):
+        return iter(dict.fromkeys([*self._modules, *self._functions]))
+
+    def __len__(self) -> int:
+        return len(self._modules.keys() | self._functions.keys())
+
+    def build_tool(self):
+        """The types.Tool declaring every registered tool, built once"""
+        with self._lock:
+            if self._tool is None:
+                from google.genai import types
+
+                self._tool = types.Tool(
+                    function_declarations=[
+                        getattr(importlib.import_module(module), f"schema_{name}")()
+                        for name, module in self._modules.items()
+                    ]
+                )
+            return self._tool
@@ -0,0 +1,274 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+# The span new spans are nested under, copied into tool worker threads by the dispatcher
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation, with attributes such as token usage or bytes in and out"""
+
+    def __init__(self, tracer, name: str, parent, attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.error = None
+        self.start_time_ns = time.time_ns()
+        self._started = time.perf_counter()
+        self._token = _current_span.set(self)
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record_error(self, error):
+        self.error = str(error) if isinstance(error, Exception) else error
+
+    def end(self):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Ended from another context, it is no longer anybody's parent anyway
+            pass
+        self.tracer._finish(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time_ns": self.start_time_ns,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_error(exc)
+        self.end()
+
+
+class _NoopSpan:
+    """Returned while tracing is off, so instrumented code costs next to nothing"""
+
+    def set(self, **attributes):
+        pass
+
+    def record_error(self, error):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class JsonlExporter:
+    """Writes each finished span as one JSON object per line"""
+
+    def __init__(self, path: str):
+        self.file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict())
+        with self._lock:
+            self.file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self.file.close()
+
+
+class OtlpJsonExporter(JsonlExporter):
+    """Writes spans in the OTLP/JSON format, one ExportTraceServiceRequest per line
+
+    The OpenTelemetry Collector's otlpjsonfile receiver can read these files and forward
+    them to Jaeger, Tempo or any other tracing backend.
+    """
+
+    def export(self, span: Span):
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_time_ns),
+            "endTimeUnixNano": str(span.start_time_ns + int(span.duration * 1e9)),
+            "attributes": [_otlp_attribute(key, value) for key, value in span.attributes.items() if value is not None],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [_otlp_attribute("service.name", "ai-agent")]},
+                    "scopeSpans": [{"scope": {"name": "ai-agent"}, "spans": [otlp_span]}],
+                }
+            ]
+        }
+        line = json.dumps(request)
+        with self._lock:
+            self.file.write(line + "\n")
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+EXPORTERS = {"jsonl": JsonlExporter, "otlp": OtlpJsonExporter}
+
+
+class Tracer:
+    """Records spans for agent iterations, model calls and tool calls
+
+    Tracing is off until `enable` is called. While on, every finished span goes to the
+    exporter (if any) and into running totals that `summary` turns into a per-session
+    breakdown: tokens used, where the time went and which tools were slowest.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.exporter = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self, exporter=None):
+        self.enabled = True
+        self.exporter = exporter
+
+    def reset(self):
+        with self._lock:
+            self._durations = defaultdict(float)
+            self._counts = defaultdict(int)
+            self._errors = defaultdict(int)
+            self._tokens = defaultdict(int)
+            self._tools = {}
+
+    def span(self, name: str, **attributes):
+        """Start a span nested under the current one, use it as a context manager or call `end`"""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, _current_span.get(), attributes)
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self._durations[span.name] += span.duration
+            self._counts[span.name] += 1
+            if span.error:
+                self._errors[span.name] += 1
+            for key in ("prompt_tokens", "response_tokens", "total_tokens"):
+                self._tokens[key] += span.attributes.get(key) or 0
+            if span.name == "tool.call":
+                tool = self._tools.setdefault(
+                    span.attributes.get("tool"), {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "bytes_out": 0}
+                )
+                tool["calls"] += 1
+                tool["seconds"] += span.duration
+                tool["max_seconds"] = max(tool["max_seconds"], span.duration)
+                tool["bytes_out"] += span.attributes.get("bytes_out") or 0
+        if self.exporter:
+            self.exporter.export(span)
+
+    def summary(self) -> dict:
+        with self._lock:
+            total = self._durations["agent.message"]
+            model = self._durations["model.generate_content"]
+            compaction = self._durations["history.compact"]
+            tools = self._durations["tool.call"]
+            return {
+                "messages": self._counts["agent.message"],
+                "iterations": self._counts["agent.iteration"],
+                "model_calls": self._counts["model.generate_content"],
+                "tool_calls": self._counts["tool.call"],
+                "errors": sum(self._errors.values()),
+                "tokens": dict(self._tokens),
+                "seconds": {
+                    "total": total,
+                    "model": model,
+                    "tools": tools,
+                    "history_compaction": compaction,
+                    # Tool calls can overlap, so this is a lower bound on the rest of the loop
+                    "other": max(total - model - tools - compaction, 0.0),
+                },
+                "tools": {name: dict(stats) for name, stats in self._tools.items()},
+            }
+
+    def format_summary(self, slowest: int = 5) -> str:
+        summary = self.summary()
+        seconds = summary["seconds"]
+        tokens = summary["tokens"]
+        lines = [
+            "📈 Session trace summary",
+            f"   {summary['messages']} messages, {summary['iterations']} iterations, "
+            f"{summary['model_calls']} model calls, {summary['tool_calls']} tool calls, {summary['errors']} errors",
+            f"   Tokens: {tokens.get('prompt_tokens', 0)} prompt, {tokens.get('response_tokens', 0)} response, "
+            f"{tokens.get('total_tokens', 0)} total",
+        ]
+        if seconds["total"]:
+            split = ", ".join(
+                f"{name} {seconds[name]:.2f}s ({seconds[name] / seconds['total']:.0%})"
+                for name in ("model", "tools", "history_compaction", "other")
+            )
+            lines.append(f"   Time: {seconds['total']:.2f}s total, {split}")
+        tools = sorted(summary["tools"].items(), key=lambda item: -item[1]["seconds"])[:slowest]
+        if tools:
+            lines.append("   Slowest tools:")
+            for name, stats in tools:
+                lines.append(
+                    f"     {name}: {stats['seconds']:.3f}s over {stats['calls']} calls "
+                    f"(max {stats['max_seconds']:.3f}s, {stats['bytes_out']} bytes returned)"
+                )
+        return "\n".join(lines)
+
+    def close(self):
+        if self.exporter:
+            self.exporter.close()
+            self.exporter = None
+
+
+def usage_attributes(usage_metadata) -> dict:
+    """Token counts of a response as span attributes"""
+    if not usage_metadata:
+        return {}
+    return {
+        "prompt_tokens": usage_metadata.prompt_token_count,
+        "response_tokens": usage_metadata.candidates_token_count,
+        "total_tokens": usage_metadata.total_token_count,
+    }
+
+
+# Shared by the agent loop and the tools
+tracer = Tracer()